@@ -0,0 +1,179 @@
+# app/api/admin_routes.py
+import os
+import secrets
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Query
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import datetime
+
+from ..schemas.schemas import ProfilerStart
+from ..database import get_db, get_read_db, replica_router
+from ..core.profiler import profiler, PROFILE_MAX_DURATION, PROFILE_OUTPUT_DIR
+from ..core import signer
+from ..core.analytics import rebuild_counters, summarize
+from ..core.export import EXPORT_FORMATS, document_export_query, stream_export, verification_export_query
+
+# 创建路由器
+router = APIRouter()
+
+# 管理接口令牌，未设置时管理接口不可用
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+def is_valid_admin_token(token: Optional[str]) -> bool:
+    """校验管理令牌"""
+    return bool(ADMIN_TOKEN) and bool(token) and secrets.compare_digest(token, ADMIN_TOKEN)
+
+
+def verify_admin_token(admin_token: str = Header(None)):
+    """通过请求头中的管理令牌校验管理员"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="管理接口未启用"
+        )
+    if not is_valid_admin_token(admin_token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="无效的管理令牌"
+        )
+    return True
+
+
+@router.get("/profiler")
+async def get_profiler_status(_: bool = Depends(verify_admin_token)):
+    """查看采样器状态和可采样的路由"""
+    return profiler.status()
+
+
+@router.post("/profiler/start")
+async def start_profiler(request: ProfilerStart, _: bool = Depends(verify_admin_token)):
+    """对指定路由开启采样，到时自动关闭"""
+    duration = min(request.duration_seconds or PROFILE_MAX_DURATION, PROFILE_MAX_DURATION)
+    try:
+        profiler.enable(request.routes, duration=duration)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return profiler.status()
+
+
+@router.post("/profiler/stop")
+async def stop_profiler(routes: Optional[List[str]] = Query(None), _: bool = Depends(verify_admin_token)):
+    """关闭指定路由的采样，不指定时全部关闭；已采集的数据保留"""
+    profiler.disable(routes)
+    return profiler.status()
+
+
+@router.get("/profiler/{route_name}", response_class=PlainTextResponse)
+async def get_profile(route_name: str, reset: bool = False, _: bool = Depends(verify_admin_token)):
+    """返回路由的折叠栈，可直接用于生成火焰图"""
+    if route_name not in profiler.available_endpoints():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="路由不存在"
+        )
+    content = profiler.collapsed(route_name)
+    if reset:
+        profiler.reset([route_name])
+    return PlainTextResponse(content)
+
+
+@router.post("/profiler/dump")
+async def dump_profiles(
+    routes: Optional[List[str]] = Query(None),
+    reset: bool = False,
+    _: bool = Depends(verify_admin_token)
+):
+    """把各路由的折叠栈写入火焰图文件"""
+    paths = profiler.write_flamegraphs(PROFILE_OUTPUT_DIR, routes)
+    if reset:
+        profiler.reset(routes)
+    return {"files": paths}
+
+
+@router.get("/replicas")
+async def get_replica_status(_: bool = Depends(verify_admin_token)):
+    """查看只读副本的复制延迟、健康状态和读请求路由统计"""
+    return replica_router.status()
+
+
+@router.get("/signer")
+async def get_signer_status(_: bool = Depends(verify_admin_token)):
+    """查看签名租约的持有者和待执行的链上写请求"""
+    if signer.coordinator is None:
+        return {"enabled": False}
+    return signer.coordinator.status()
+
+
+@router.get("/analytics/verifications")
+async def get_verification_analytics(
+    days: int = Query(30, ge=1, le=366),
+    verifier_id: Optional[str] = None,
+    _: bool = Depends(verify_admin_token),
+    db: Session = Depends(get_read_db)
+):
+    """按状态、类型、验证者统计的验证数量和每日吞吐，只读取计数表"""
+    return summarize(db, days=days, verifier_id=verifier_id)
+
+
+@router.post("/analytics/rebuild")
+async def rebuild_verification_analytics(_: bool = Depends(verify_admin_token), db: Session = Depends(get_db)):
+    """从验证表和归档表重新计算统计计数（全表扫描）"""
+    return {"verifications": rebuild_counters(db)}
+
+
+def _export_response(db, name, query, format, compress):
+    """以流式响应输出导出文件"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"无效的导出格式，必须是: {', '.join(EXPORT_FORMATS)}"
+        )
+    filename = f"{name}-{datetime.utcnow():%Y%m%dT%H%M%S}.{format}" + (".gz" if compress else "")
+    return StreamingResponse(
+        stream_export(db.get_bind(), query, fmt=format, compress=compress),
+        media_type="application/gzip" if compress else EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+def _check_range(start, end):
+    if start and end and end <= start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="结束时间必须晚于开始时间"
+        )
+
+
+@router.get("/exports/verifications")
+async def export_verifications(
+    verifier_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    format: str = "ndjson",
+    compress: bool = False,
+    _: bool = Depends(verify_admin_token),
+    db: Session = Depends(get_read_db)
+):
+    """按验证者和验证日期范围流式导出验证记录（NDJSON或CSV，可gzip压缩）"""
+    _check_range(start, end)
+    return _export_response(db, "verifications", verification_export_query(verifier_id, start, end), format, compress)
+
+
+@router.get("/exports/documents")
+async def export_documents(
+    verifier_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    format: str = "ndjson",
+    compress: bool = False,
+    _: bool = Depends(verify_admin_token),
+    db: Session = Depends(get_read_db)
+):
+    """按上传时间范围流式导出文档记录；指定验证者时只包含其验证过的用户"""
+    _check_range(start, end)
+    return _export_response(db, "documents", document_export_query(verifier_id, start, end), format, compress)
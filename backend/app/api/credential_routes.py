@@ -0,0 +1,79 @@
+# app/api/credential_routes.py
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..database import get_db, get_read_db
+from ..models.models import CredentialStatusList, Verifier
+from ..schemas.schemas import CredentialVerifyRequest, CredentialVerifyResponse
+from ..core.credentials import CREDENTIAL_VERIFY_MAX_BATCH, issuer_keys, verify_credentials
+from ..core.http_cache import make_etag, check_not_modified, set_cache_headers
+from ..core.status_list import STATUS_LIST_ID, STATUS_LIST_PUBLISH_INTERVAL, publish_status_list
+from .verification_routes import get_verifier_by_api_key
+
+# 创建路由器
+router = APIRouter()
+
+
+@router.get("/status-list")
+async def get_status_list(request: Request, db: Session = Depends(get_db)):
+    """下载gzip压缩的凭证状态位图
+
+    每个已签发的凭证对应验证记录中的 status_index 一位，1 表示凭证已撤销、过期或不再有效，
+    第0位是第一个字节的最高位。位图的sha256摘要定期写入链上，通过响应头返回，
+    依赖方下载一次即可离线检查任意数量的凭证。公共资源，不需要认证，可被共享缓存。
+    """
+    status_list = db.get(CredentialStatusList, STATUS_LIST_ID)
+    if status_list is None or status_list.encoded is None:
+        # 发布线程尚未运行过，先生成一次
+        status_list = publish_status_list(db)
+
+    etag = make_etag("status-list", status_list.digest)
+    not_modified = check_not_modified(
+        request, etag, status_list.published_at, private=False, max_age=STATUS_LIST_PUBLISH_INTERVAL
+    )
+    if not_modified:
+        return not_modified
+
+    response = Response(content=status_list.encoded, media_type="application/gzip")
+    set_cache_headers(
+        response, etag, status_list.published_at, private=False, max_age=STATUS_LIST_PUBLISH_INTERVAL
+    )
+    response.headers["X-Status-List-Size"] = str(status_list.size)
+    response.headers["X-Status-List-Digest"] = status_list.digest
+    if status_list.anchored_digest == status_list.digest and status_list.anchor_tx_hash:
+        response.headers["X-Status-List-Anchor-Tx"] = status_list.anchor_tx_hash
+    return response
+
+
+@router.get("/jwks.json")
+async def get_issuer_keys(request: Request, db: Session = Depends(get_read_db)):
+    """签发链下凭证的公钥集合（JWKS），依赖方可缓存后离线验证签名"""
+    jwks = issuer_keys.jwks(db)
+    etag = make_etag("jwks", *(key["kid"] for key in jwks["keys"]))
+    not_modified = check_not_modified(request, etag, private=False, max_age=STATUS_LIST_PUBLISH_INTERVAL)
+    if not_modified:
+        return not_modified
+    response = Response(content=json.dumps(jwks), media_type="application/jwk-set+json")
+    set_cache_headers(response, etag, private=False, max_age=STATUS_LIST_PUBLISH_INTERVAL)
+    return response
+
+
+@router.post("/verify", response_model=CredentialVerifyResponse)
+async def verify_credential_batch(
+    request: CredentialVerifyRequest,
+    verifier: Verifier = Depends(get_verifier_by_api_key),
+    db: Session = Depends(get_read_db)
+):
+    """批量验证链下凭证的签名、有效期和撤销状态，不访问区块链"""
+    if len(request.credentials) > CREDENTIAL_VERIFY_MAX_BATCH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"单次最多验证 {CREDENTIAL_VERIFY_MAX_BATCH} 个凭证"
+        )
+    # 签名验证是CPU密集的，在线程池中执行，不阻塞事件循环
+    results = await run_in_threadpool(verify_credentials, db, request.credentials, request.check_status)
+    valid = sum(1 for result in results if result["valid"])
+    return {"results": results, "valid": valid, "invalid": len(results) - valid}
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 import bcrypt
 import jwt
 from datetime import datetime, timedelta
@@ -9,8 +11,15 @@ from fastapi.security import OAuth2PasswordBearer
 
 from ..models.models import User, Document
 from ..schemas.schemas import UserCreate, UserResponse, UserLogin, DocumentCreate, DocumentResponse, Token,UserUpdate
-from ..database import get_db
-from ..core.blockchain import BlockchainManager
+from ..database import get_db, get_read_db
+from ..core.blockchain import BlockchainManager, PRIORITY_BULK, PRIORITY_NORMAL
+from ..core.metrics import crypto_duration
+from ..core.bloom import availability_index
+from ..core.logger import get_logger
+from ..core.tracing import start_span
+from ..core.http_cache import make_etag, check_not_modified, set_cache_headers
+from ..core.document_store import document_store, receive_multipart_upload, UploadError, DocumentTooLarge
+from multipart.multipart import MultipartParseError
 
 # 创建路由器
 router = APIRouter()
@@ -18,12 +27,16 @@ router = APIRouter()
 # 实例化区块链管理器
 blockchain = BlockchainManager()
 
+logger = get_logger(__name__)
+
 # JWT配置
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/users/login")
+# 令牌可选的认证方案，用于同时支持其他认证方式的端点
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/users/login", auto_error=False)
 # 工具函数
 def is_valid_ethereum_address(address: str) -> bool:
     """验证以太坊地址是否有效"""
@@ -36,13 +49,15 @@ def is_valid_ethereum_address(address: str) -> bool:
     
 def hash_password(password: str) -> str:
     """对密码进行哈希处理"""
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
+    with start_span("bcrypt.hash"), crypto_duration.time("bcrypt_hash"):
+        salt = bcrypt.gensalt()
+        hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """验证密码是否匹配哈希值"""
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    with start_span("bcrypt.verify"), crypto_duration.time("bcrypt_verify"):
+        return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     """创建JWT访问令牌"""
@@ -76,19 +91,16 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
 
 
 # 路由定义
+def _log_registration(user_id, future):
+    """记录排队的链上注册结果"""
+    if future.exception():
+        logger.error("区块链注册失败: %s", future.exception(), extra={"user_id": user_id})
+    else:
+        logger.info("用户在区块链上注册", extra={"user_id": user_id, "transaction_hash": future.result()})
+
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def register_user(user: UserCreate, db: Session = Depends(get_db)):
     """注册新用户并在区块链上创建身份"""
-    # 检查用户名或邮箱是否已存在
-    db_user = db.query(User).filter(
-        (User.username == user.username) | (User.email == user.email)
-    ).first()
-    if db_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="用户名或邮箱已存在"
-        )
-    
     # 验证区块链地址（如果提供）
     if user.blockchain_address:
         if not is_valid_ethereum_address(user.blockchain_address):
@@ -97,6 +109,14 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
                 detail="无效的以太坊地址"
             )
     
+    # 在计算密码哈希之前检查用户名或邮箱是否已存在；过滤器未命中时不查询数据库
+    available = availability_index.check(db, username=user.username, email=user.email)
+    if not all(available.values()):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="用户名或邮箱已存在"
+        )
+    
     # 创建新用户
     hashed_password = hash_password(user.password)
     new_user = User(
@@ -108,18 +128,29 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
         id_number=user.id_number
     )
     
-    # 保存到数据库
+    # 保存到数据库；并发注册或其他副本刚注册的用户由唯一约束拦截
     db.add(new_user)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        taken = db.query(User.id).filter(
+            (User.username == user.username) | (User.email == user.email)
+        ).first()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="用户名或邮箱已存在" if taken else "区块链地址或证件号已被使用"
+        )
     db.refresh(new_user)
+    availability_index.add(new_user.username, new_user.email)
     
-    # 在区块链上注册身份
-    try:
-        if new_user.blockchain_address:
-            tx_hash = blockchain.register_identity(new_user.id, new_user.blockchain_address)
-            print(f"用户 {new_user.id} 在区块链上注册，交易哈希: {tx_hash}")
-    except Exception as e:
-        print(f"区块链注册失败: {e}")
+    # 在区块链上注册身份（低优先级排队，不阻塞注册响应）
+    if new_user.blockchain_address:
+        user_id = new_user.id
+        future = blockchain.submit_transaction(
+            PRIORITY_BULK, "register_identity", user_id, new_user.blockchain_address
+        )
+        future.add_done_callback(lambda f: _log_registration(user_id, f))
     
     return new_user
 
@@ -157,19 +188,53 @@ async def login_user(user_credentials: UserLogin, db: Session = Depends(get_db))
     }
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user)
+):
     """获取当前登录用户信息"""
+    etag = make_etag("user", current_user.id, current_user.version_id)
+    not_modified = check_not_modified(request, etag, current_user.updated_at)
+    if not_modified:
+        return not_modified
+    set_cache_headers(response, etag, current_user.updated_at)
     return current_user
 
+@router.get("/availability")
+async def check_availability(
+    username: Optional[str] = None,
+    email: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """检查用户名和邮箱是否可以注册
+
+    结果只作提示，注册时仍会再次校验。
+    """
+    if username is None and email is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="需要提供用户名或邮箱"
+        )
+    return availability_index.check(db, username=username, email=email)
+
 @router.get("/{user_id}", response_model=UserResponse)
-async def get_user_by_id(user_id: str, db: Session = Depends(get_db)):
+async def get_user_by_id(user_id: str, request: Request, response: Response, db: Session = Depends(get_read_db)):
     """通过ID获取用户信息"""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+    # 先只查询版本号，资源未修改时不加载完整的用户记录
+    stamp = db.query(User.version_id, User.updated_at).filter(User.id == user_id).first()
+    if not stamp:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="用户不存在"
         )
+    etag = make_etag("user", user_id, stamp.version_id)
+    not_modified = check_not_modified(request, etag, stamp.updated_at, private=False)
+    if not_modified:
+        return not_modified
+    set_cache_headers(response, etag, stamp.updated_at, private=False)
+    
+    user = db.query(User).filter(User.id == user_id).first()
     return user
 
 @router.post("/documents", response_model=DocumentResponse)
@@ -201,11 +266,67 @@ async def upload_document(
     
     return new_document
 
+@router.post("/documents/upload", response_model=DocumentResponse, status_code=status.HTTP_201_CREATED)
+async def upload_document_file(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """流式上传身份文档文件
+
+    multipart表单包含 document_type 字段和 file 文件。服务端边接收边计算SHA-256
+    并写入内容寻址存储，相同内容只保存一份；文档记录的哈希由服务端计算。
+    """
+    try:
+        fields, (document_hash, size_bytes, _) = await receive_multipart_upload(request, document_store)
+    except DocumentTooLarge as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    except (UploadError, MultipartParseError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"文档上传失败: {str(e)}"
+        )
+    
+    document_type = fields.get("document_type")
+    if not document_type:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="缺少document_type字段"
+        )
+    
+    # 同一用户重复上传相同内容时返回已有记录
+    existing_document = db.query(Document).filter(
+        Document.user_id == current_user.id,
+        Document.document_hash == document_hash,
+        Document.document_type == document_type
+    ).first()
+    if existing_document:
+        response.status_code = status.HTTP_200_OK
+        return existing_document
+    
+    new_document = Document(
+        user_id=current_user.id,
+        document_type=document_type,
+        document_hash=document_hash,
+        size_bytes=size_bytes,
+        status="pending"
+    )
+    
+    db.add(new_document)
+    db.commit()
+    db.refresh(new_document)
+    
+    return new_document
+
 @router.get("/documents/{user_id}", response_model=List[DocumentResponse])
 async def get_user_documents(
     user_id: str, 
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """获取用户的所有文档"""
     # 验证权限（只能查看自己的文档）
@@ -222,7 +343,7 @@ async def get_user_documents(
 async def get_blockchain_identity(
     user_id: str, 
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """从区块链获取用户身份信息"""
     # 验证用户存在
@@ -276,7 +397,9 @@ async def update_blockchain_address(
         db.commit()
         
         # 在区块链上重新注册身份
-        tx_hash = blockchain.register_identity(current_user.id, blockchain_address)
+        tx_hash = await asyncio.wrap_future(blockchain.submit_transaction(
+            PRIORITY_NORMAL, "register_identity", current_user.id, blockchain_address
+        ))
         
         return {
             "message": "区块链地址更新成功",
@@ -1,13 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Header
+import asyncio
+import secrets
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Query, BackgroundTasks, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import bindparam, func, update
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
 from ..models.models import Verification, User, Verifier
-from ..schemas.schemas import VerificationCreate, VerificationResponse, VerificationUpdate
-from ..database import get_db
-from ..core.blockchain import BlockchainManager
-from .user_routes import get_current_user, is_valid_ethereum_address
+from ..schemas.schemas import (
+    VerificationCreate, VerificationResponse, VerificationUpdate, VerificationClaimResponse,
+    VerificationBatchUpdate, VerificationBatchResponse, WebhookRegistration, WebhookRegistrationResponse,
+    ReusableVerificationResponse, VerificationStatusBatchRequest
+)
+from ..database import get_db, get_read_db
+from ..core.blockchain import BlockchainManager, CREDENTIAL_VALIDITY_DAYS, PRIORITY_CRITICAL, ISSUE_CREDENTIAL_GAS
+from ..core.assignment import assigner
+from ..core.events import event_bus, publish_verification_event
+from ..core.http_cache import make_etag, check_not_modified, set_cache_headers
+from ..core.webhooks import enqueue_assignment
+from ..core.reuse import find_reusable_for_user, find_reusable_by_document_hash, expires_at
+from ..core.analytics import CounterDeltas, record_created, record_status_change
+from ..core.archive import find_archived_verification, find_archived_verifications_for_user
+from ..core.status_list import assign_status_indexes
+from ..core.credentials import issue_credential
+from ..core.status_batch import STATUS_BATCH_MAX_PAIRS, stream_status
+from ..core.logger import get_logger
+from ..core.work_queue import DEFAULT_LEASE_SECONDS, MAX_CLAIM_BATCH, claim_verifications, release_lease, is_leased_by_other, clear_lease
+from .user_routes import get_current_user, is_valid_ethereum_address, optional_oauth2_scheme
 
 # 创建路由器
 router = APIRouter()
@@ -15,6 +35,17 @@ router = APIRouter()
 # 实例化区块链管理器
 blockchain = BlockchainManager()
 
+logger = get_logger(__name__)
+
+# 有效的验证状态
+VALID_STATUSES = ["pending", "approved", "rejected"]
+
+# 单次批量更新最多包含的决定数量
+MAX_BATCH_DECISIONS = 1000
+
+# 事件流心跳间隔（秒），防止代理断开空闲连接
+EVENT_STREAM_HEARTBEAT_SECONDS = 15
+
 # 验证者API密钥认证依赖
 async def get_verifier_by_api_key(api_key: str = Header(...), db: Session = Depends(get_db)):
     """通过API密钥获取验证者"""
@@ -26,12 +57,22 @@ async def get_verifier_by_api_key(api_key: str = Header(...), db: Session = Depe
         )
     return verifier
 
+def verification_stamp(db, *criteria):
+    """返回匹配验证记录的数量、版本号之和与最后更新时间，用于生成ETag"""
+    return db.query(
+        func.count(Verification.id),
+        func.coalesce(func.sum(Verification.version_id), 0),
+        func.max(Verification.updated_at)
+    ).filter(*criteria).one()
+
 # 新增 - 身份状态端点
 @router.get("/identity-status/{user_id}")
 async def get_identity_status(
     user_id: str, 
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """获取用户在区块链上的身份状态"""
     # 验证权限
@@ -41,6 +82,15 @@ async def get_identity_status(
             detail="不允许查看其他用户的身份状态"
         )
     
+    # 用聚合查询计算ETag，资源未修改时不执行完整查询
+    count, version_sum, last_updated = verification_stamp(db, Verification.user_id == user_id)
+    etag = make_etag("identity-status", user_id, current_user.version_id, count, version_sum)
+    last_modified = max(filter(None, [current_user.updated_at, last_updated]), default=None)
+    not_modified = check_not_modified(request, etag, last_modified)
+    if not_modified:
+        return not_modified
+    set_cache_headers(response, etag, last_modified)
+    
     try:
         # 从数据库获取用户
         user = db.query(User).filter(User.id == user_id).first()
@@ -79,8 +129,8 @@ async def get_identity_status(
             "status": status_value,
             "blockchain_address": blockchain_address,
             "identity_hash": identity_hash,
-            "created_at": user.created_at.isoformat() if hasattr(user, 'created_at') else datetime.now().isoformat(),
-            "updated_at": user.updated_at.isoformat() if hasattr(user, 'updated_at') else datetime.now().isoformat(),
+            "created_at": user.created_at.isoformat() if getattr(user, 'created_at', None) else datetime.now().isoformat(),
+            "updated_at": user.updated_at.isoformat() if getattr(user, 'updated_at', None) else datetime.now().isoformat(),
             "blockchain_info": {
                 "contract_address": blockchain.contract_address if hasattr(blockchain, "contract_address") else None,
                 "transaction_hash": latest_verification.transaction_hash if latest_verification else None,
@@ -98,7 +148,7 @@ async def get_identity_status(
 @router.get("/list")
 async def get_verification_list(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """获取当前用户的验证请求列表"""
     try:
@@ -113,6 +163,67 @@ async def get_verification_list(
             detail=f"获取验证请求列表失败: {str(e)}"
         )
 
+# 新增 - 验证状态事件流端点
+@router.get("/events")
+async def stream_verification_events(
+    last_event_id: Optional[int] = Query(None),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    api_key: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """以Server-Sent Events推送验证状态变更
+
+    用户通过Bearer令牌订阅自己的验证事件，验证者通过API密钥订阅分配给自己的验证事件。
+    断线后可以通过Last-Event-ID请求头或last_event_id参数续传。
+    """
+    if token:
+        user = get_current_user(token, db)
+        user_id = user.id
+        matcher = lambda event: event.user_id == user_id
+    elif api_key:
+        verifier = await get_verifier_by_api_key(api_key, db)
+        verifier_id = verifier.id
+        matcher = lambda event: event.verifier_id == verifier_id
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="需要Bearer令牌或API密钥",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    # 认证完成后立即归还数据库连接，长连接期间不占用连接池
+    db.close()
+    
+    if last_event_id is None and last_event_id_header and last_event_id_header.isdigit():
+        last_event_id = int(last_event_id_header)
+    subscription, backlog, gap = event_bus.subscribe(matcher, last_event_id)
+    
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            if gap:
+                # 部分事件已不可续传，客户端需要重新拉取完整状态
+                yield f"event: stream.reset\ndata: {{\"last_event_id\": {event_bus.last_event_id}}}\n\n"
+            for event in backlog:
+                yield event.to_sse()
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=EVENT_STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    break
+                yield event.to_sse()
+        finally:
+            event_bus.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # 路由定义
 @router.post("/request", response_model=VerificationResponse, status_code=status.HTTP_201_CREATED)
 async def request_verification(
@@ -141,9 +252,9 @@ async def request_verification(
             detail=f"已存在待处理的{verification.verification_type}验证请求"
         )
     
-    # 分配给默认验证者（这里可以改进为基于验证类型分配）
-    default_verifier = db.query(Verifier).filter(Verifier.is_active == True).first()
-    if not default_verifier:
+    # 按验证类型能力和负载分配验证者
+    assigned_verifier = assigner.assign(db, verification.verification_type)
+    if not assigned_verifier:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="没有可用的验证者"
@@ -152,22 +263,141 @@ async def request_verification(
     # 创建验证请求
     new_verification = Verification(
         user_id=verification.user_id,
-        verifier_id=default_verifier.id,
+        verifier_id=assigned_verifier.id,
         verification_type=verification.verification_type,
         status="pending",
         notes=verification.notes
     )
     
-    db.add(new_verification)
-    db.commit()
+    try:
+        db.add(new_verification)
+        db.flush()
+        # 通知事件和统计计数与验证请求在同一事务中写入
+        enqueue_assignment(db, assigned_verifier, new_verification)
+        record_created(db, new_verification)
+        db.commit()
+    except Exception:
+        db.rollback()
+        assigner.release(assigned_verifier.id)
+        raise
     db.refresh(new_verification)
+    publish_verification_event("verification.created", new_verification)
     
     return new_verification
 
+@router.get("/reuse", response_model=List[ReusableVerificationResponse])
+async def find_reusable_verifications(
+    user_id: Optional[str] = Query(None),
+    verification_type: Optional[str] = Query(None),
+    document_hash: Optional[str] = Query(None),
+    verifier: Verifier = Depends(get_verifier_by_api_key),
+    db: Session = Depends(get_read_db)
+):
+    """查找其他机构已批准且未过期的验证，供本机构直接采信
+
+    按 (user_id, verification_type) 或按文档哈希查询。
+    """
+    if user_id and verification_type:
+        verifications = find_reusable_for_user(db, user_id, verification_type, exclude_verifier_id=verifier.id)
+    elif document_hash:
+        verifications = find_reusable_by_document_hash(
+            db, document_hash, verification_type, exclude_verifier_id=verifier.id
+        )
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="需要提供user_id和verification_type，或document_hash"
+        )
+    
+    return [
+        {
+            "id": v.id,
+            "user_id": v.user_id,
+            "verifier_id": v.verifier_id,
+            "verification_type": v.verification_type,
+            "verification_date": v.verification_date,
+            "expires_at": expires_at(v),
+            "transaction_hash": v.transaction_hash
+        }
+        for v in verifications
+    ]
+
+@router.post("/reuse/{source_verification_id}/accept", response_model=VerificationResponse)
+async def accept_reusable_verification(
+    source_verification_id: str,
+    verifier: Verifier = Depends(get_verifier_by_api_key),
+    db: Session = Depends(get_db)
+):
+    """采信其他机构的已批准验证
+
+    本机构对该用户同类型的待处理请求直接批准，没有待处理请求时新建一条已批准记录。
+    沿用原验证的链上交易，不重复审核也不重复上链。
+    """
+    source = db.query(Verification).filter(Verification.id == source_verification_id).first()
+    if not source:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="验证记录不存在"
+        )
+    if source.verifier_id == verifier.id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="不能采信本机构自己的验证"
+        )
+    
+    # 确认源验证仍然有效
+    reusable_ids = {
+        v.id for v in find_reusable_for_user(db, source.user_id, source.verification_type)
+    }
+    if source.id not in reusable_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="源验证未批准或已过期，不能复用"
+        )
+    
+    notes = f"采信验证 {source.id}"
+    verification = db.query(Verification).filter(
+        Verification.user_id == source.user_id,
+        Verification.verifier_id == verifier.id,
+        Verification.verification_type == source.verification_type,
+        Verification.status == "pending"
+    ).first()
+    previous_status = verification.status if verification else None
+    if verification:
+        verification.status = "approved"
+        verification.transaction_hash = source.transaction_hash
+        verification.expires_at = expires_at(source)
+        verification.notes = notes
+        clear_lease(verification)
+        record_status_change(db, verification, previous_status)
+    else:
+        verification = Verification(
+            user_id=source.user_id,
+            verifier_id=verifier.id,
+            verification_type=source.verification_type,
+            status="approved",
+            transaction_hash=source.transaction_hash,
+            expires_at=expires_at(source),
+            notes=notes
+        )
+        db.add(verification)
+        record_created(db, verification)
+    
+    db.flush()
+    assign_status_indexes(db, [verification])
+    issue_credential(db, verification)
+    db.commit()
+    db.refresh(verification)
+    if previous_status:
+        assigner.on_status_change(verification.verifier_id, previous_status, verification.status)
+    publish_verification_event("verification.updated", verification)
+    
+    return verification
+
 @router.get("/pending", response_model=List[VerificationResponse])
 async def get_pending_verifications(
     verifier: Verifier = Depends(get_verifier_by_api_key),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """获取验证者的待处理验证请求"""
     verifications = db.query(Verification).filter(
@@ -177,17 +407,296 @@ async def get_pending_verifications(
     
     return verifications
 
+@router.post("/claim", response_model=VerificationClaimResponse)
+async def claim_pending_verifications(
+    limit: int = Query(10, ge=1, le=MAX_CLAIM_BATCH),
+    lease_seconds: int = Query(DEFAULT_LEASE_SECONDS, ge=10, le=3600),
+    worker_id: Optional[str] = Header(None),
+    verifier: Verifier = Depends(get_verifier_by_api_key),
+    db: Session = Depends(get_db)
+):
+    """为审核工作进程领取一批互不重叠的待处理验证请求"""
+    lease_id, lease_expires_at, verifications = claim_verifications(
+        db, verifier.id, worker_id=worker_id, limit=limit, lease_seconds=lease_seconds
+    )
+    return {
+        "lease_id": lease_id,
+        "lease_expires_at": lease_expires_at,
+        "verifications": verifications
+    }
+
+@router.delete("/claim/{lease_id}")
+async def release_claimed_verifications(
+    lease_id: str,
+    verifier: Verifier = Depends(get_verifier_by_api_key),
+    db: Session = Depends(get_db)
+):
+    """归还租约中尚未处理的验证请求"""
+    released = release_lease(db, verifier.id, lease_id)
+    return {"lease_id": lease_id, "released": released}
+
+@router.put("/webhook", response_model=WebhookRegistrationResponse)
+async def register_webhook(
+    registration: WebhookRegistration,
+    verifier: Verifier = Depends(get_verifier_by_api_key),
+    db: Session = Depends(get_db)
+):
+    """注册或更新验证者的新任务通知地址"""
+    if not registration.url.startswith(("http://", "https://")):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="通知地址必须是http或https URL"
+        )
+    
+    verifier.webhook_url = registration.url
+    verifier.webhook_secret = registration.secret or verifier.webhook_secret or secrets.token_hex(32)
+    db.commit()
+    
+    return {"url": verifier.webhook_url, "secret": verifier.webhook_secret}
+
+@router.delete("/webhook")
+async def delete_webhook(
+    verifier: Verifier = Depends(get_verifier_by_api_key),
+    db: Session = Depends(get_db)
+):
+    """取消验证者的通知地址，之后的新任务不再通知"""
+    verifier.webhook_url = None
+    db.commit()
+    return {"message": "通知地址已取消"}
+
+def _submit_batch_approvals(bind, approvals):
+    """在后台将批量批准作为一次批量提交写入区块链，并回写交易哈希"""
+    try:
+        # 批准属于时间敏感的写入，按最高优先级排队，交易数计入每区块预算
+        results = blockchain.submit_transaction(
+            PRIORITY_CRITICAL, "issue_credentials_batch",
+            [approval["credential"] for approval in approvals],
+            gas=ISSUE_CREDENTIAL_GAS * len(approvals), tx_count=len(approvals)
+        ).result()
+    except Exception as e:
+        logger.error("批量区块链验证失败: %s", e, extra={"count": len(approvals)})
+        return
+    
+    updates = []
+    for approval, result in zip(approvals, results):
+        if result["transaction_hash"]:
+            updates.append({"verification_id": approval["verification_id"], "tx_hash": result["transaction_hash"]})
+        else:
+            logger.error("验证链上写入失败: %s", result["error"], extra={"verification_id": approval["verification_id"]})
+    if not updates:
+        return
+    
+    table = Verification.__table__
+    db = Session(bind=bind)
+    try:
+        # 同时递增行版本号，使缓存的ETag失效
+        db.execute(
+            update(table).where(
+                table.c.id == bindparam("verification_id")
+            ).values(
+                transaction_hash=bindparam("tx_hash"),
+                version_id=table.c.version_id + 1
+            ),
+            updates
+        )
+        db.commit()
+    finally:
+        db.close()
+    
+    # 链上确认后推送事件
+    confirmed = {item["verification_id"]: item["tx_hash"] for item in updates}
+    for approval in approvals:
+        if approval["verification_id"] in confirmed:
+            event_bus.publish(
+                "verification.confirmed",
+                {
+                    "verification_id": approval["verification_id"],
+                    "user_id": approval["credential"]["user_id"],
+                    "verifier_id": approval["verifier_id"],
+                    "verification_type": approval["credential"]["verification_type"],
+                    "status": "approved",
+                    "transaction_hash": confirmed[approval["verification_id"]]
+                },
+                user_id=approval["credential"]["user_id"],
+                verifier_id=approval["verifier_id"]
+            )
+
+@router.put("/batch", response_model=VerificationBatchResponse)
+async def batch_update_verification_status(
+    batch: VerificationBatchUpdate,
+    background_tasks: BackgroundTasks,
+    lease_id: Optional[str] = Header(None),
+    verifier: Verifier = Depends(get_verifier_by_api_key),
+    db: Session = Depends(get_db)
+):
+    """批量更新验证状态
+
+    一次查询校验所有权，一个事务内应用所有决定，链上批准在响应返回后作为一次批量提交发送。
+    每个决定单独返回处理结果，单个决定失败不影响其他决定。提供 lease_id 时，
+    与单个更新相同，被其他工作进程领取的验证请求返回409。
+    """
+    if not batch.decisions:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="决定列表不能为空"
+        )
+    if len(batch.decisions) > MAX_BATCH_DECISIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"单次最多提交{MAX_BATCH_DECISIONS}个决定"
+        )
+    
+    # 一次查询获取所有相关验证请求
+    ids = {decision.verification_id for decision in batch.decisions}
+    verifications = {
+        v.id: v for v in db.query(Verification).filter(Verification.id.in_(ids)).all()
+    }
+    
+    # 需要上链的批准所涉及的用户同样一次查询获取
+    approving_user_ids = {
+        verifications[d.verification_id].user_id
+        for d in batch.decisions
+        if d.status == "approved"
+        and d.verification_id in verifications
+        and verifications[d.verification_id].status != "approved"
+    }
+    users = {}
+    if approving_user_ids:
+        users = {u.id: u for u in db.query(User).filter(User.id.in_(approving_user_ids)).all()}
+    
+    results = []
+    applied = []
+    approvals = []
+    deltas = CounterDeltas()
+    seen = set()
+    expiry = datetime.utcnow() + timedelta(days=CREDENTIAL_VALIDITY_DAYS)
+    expires_at = int(expiry.replace(tzinfo=timezone.utc).timestamp())
+    for decision in batch.decisions:
+        verification = verifications.get(decision.verification_id)
+        error = None
+        if decision.verification_id in seen:
+            error = (status.HTTP_400_BAD_REQUEST, "同一验证请求在批量中重复出现")
+        elif not verification:
+            error = (status.HTTP_404_NOT_FOUND, "验证请求不存在")
+        elif verification.verifier_id != verifier.id:
+            error = (status.HTTP_403_FORBIDDEN, "不允许更新其他验证者的验证请求")
+        elif lease_id and is_leased_by_other(verification, lease_id):
+            error = (status.HTTP_409_CONFLICT, "该验证请求已被其他工作进程领取")
+        elif decision.status not in VALID_STATUSES:
+            error = (status.HTTP_400_BAD_REQUEST, f"无效的状态，必须是: {', '.join(VALID_STATUSES)}")
+        elif decision.status == "approved" and verification.status != "approved" and verification.user_id not in users:
+            error = (status.HTTP_404_NOT_FOUND, "用户不存在")
+        seen.add(decision.verification_id)
+        
+        if error:
+            results.append({
+                "verification_id": decision.verification_id,
+                "success": False,
+                "status_code": error[0],
+                "detail": error[1]
+            })
+            continue
+        
+        previous_status = verification.status
+        if decision.status == "approved" and previous_status != "approved":
+            user = users[verification.user_id]
+            user.is_verified = True
+            verification.expires_at = expiry
+            if user.blockchain_address and not decision.transaction_hash:
+                approvals.append({
+                    "verification_id": verification.id,
+                    "verifier_id": verifier.id,
+                    "credential": {
+                        "owner": user.blockchain_address,
+                        "user_id": user.id,
+                        "verification_type": verification.verification_type,
+                        "credential_hash": blockchain.get_credential_hash(
+                            verification.id, user.id, verification.verification_type, verifier.id
+                        ),
+                        "expires_at": expires_at
+                    }
+                })
+        
+        verification.status = decision.status
+        verification.notes = decision.notes or verification.notes
+        if decision.transaction_hash:
+            verification.transaction_hash = decision.transaction_hash
+        if verification.status != "pending":
+            clear_lease(verification)
+        deltas.status_changed(verification, previous_status)
+        applied.append((verification, previous_status))
+        results.append({
+            "verification_id": decision.verification_id,
+            "success": True,
+            "status_code": status.HTTP_200_OK,
+            "verification": verification
+        })
+    
+    # 所有有效决定、状态列表位置、签发的凭证和统计计数在同一个事务中提交
+    newly_approved = [v for v, previous in applied if v.status == "approved" and previous != "approved"]
+    assign_status_indexes(db, newly_approved)
+    for verification in newly_approved:
+        issue_credential(db, verification)
+    if deltas:
+        deltas.apply(db)
+    db.commit()
+    if applied:
+        # 提交后对象已过期，用一次查询重新加载，避免序列化时逐条刷新
+        db.query(Verification).filter(Verification.id.in_([v.id for v, _ in applied])).all()
+    for verification, previous_status in applied:
+        assigner.on_status_change(verification.verifier_id, previous_status, verification.status)
+        publish_verification_event("verification.updated", verification)
+    
+    if approvals:
+        background_tasks.add_task(_submit_batch_approvals, db.get_bind(), approvals)
+    
+    return {
+        "results": results,
+        "succeeded": len(applied),
+        "failed": len(results) - len(applied),
+        "queued_chain_writes": len(approvals)
+    }
+
+@router.post("/status:batch")
+async def check_verification_status_batch(
+    batch: VerificationStatusBatchRequest,
+    verifier: Verifier = Depends(get_verifier_by_api_key),
+    db: Session = Depends(get_read_db)
+):
+    """批量查询 (用户, 验证类型) 的验证状态，供依赖方核对
+    
+    从数据库按验证类型用少量集合查询得到结果，不逐条调用区块链；
+    结果按请求顺序以NDJSON流式返回。include_proofs 为真时附带交易哈希和
+    状态列表位置，依赖方可自行对照链上记录；本机构签发的验证另附签名凭证。
+    """
+    if len(batch.queries) > STATUS_BATCH_MAX_PAIRS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"单次最多查询 {STATUS_BATCH_MAX_PAIRS} 项"
+        )
+    pairs = [(query.user_id, query.verification_type) for query in batch.queries]
+    return StreamingResponse(
+        stream_status(db.get_bind(), pairs, include_proofs=batch.include_proofs, verifier_id=verifier.id),
+        media_type="application/x-ndjson"
+    )
+
 @router.put("/{verification_id}", response_model=VerificationResponse)
 async def update_verification_status(
     verification_id: str,
     verification_update: VerificationUpdate,
+    lease_id: Optional[str] = Header(None),
     verifier: Verifier = Depends(get_verifier_by_api_key),
     db: Session = Depends(get_db)
 ):
     """更新验证状态"""
-    # 获取验证请求
-    verification = db.query(Verification).filter(Verification.id == verification_id).first()
+    # 获取验证请求并锁定到提交：同一请求的并发批准在这里等待，读到已批准后不会重复上链
+    verification = db.query(Verification).filter(Verification.id == verification_id).with_for_update().first()
     if not verification:
+        if find_archived_verification(db, verification_id):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="验证请求已归档，不能修改"
+            )
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="验证请求不存在"
@@ -200,47 +709,73 @@ async def update_verification_status(
             detail="不允许更新其他验证者的验证请求"
         )
     
+    # 检查是否被其他工作进程领取
+    if lease_id and is_leased_by_other(verification, lease_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="该验证请求已被其他工作进程领取"
+        )
+    
     # 检查状态是否有效
-    valid_statuses = ["pending", "approved", "rejected"]
-    if verification_update.status not in valid_statuses:
+    if verification_update.status not in VALID_STATUSES:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"无效的状态，必须是: {', '.join(valid_statuses)}"
+            detail=f"无效的状态，必须是: {', '.join(VALID_STATUSES)}"
         )
     
     # 如果状态变为已批准，则在区块链上记录
     transaction_hash = None
+    expiry = None
     if verification_update.status == "approved" and verification.status != "approved":
-        try:
-            # 获取用户
-            user = db.query(User).filter(User.id == verification.user_id).first()
-            if not user:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="用户不存在"
-                )
-            
-            # 在区块链上验证身份
-            transaction_hash = blockchain.verify_identity(
-                user.id, 
-                verifier.blockchain_address,
-                verification.verification_type
-            )
-            
-            # 更新用户验证状态
-            user.is_verified = True
-            db.add(user)
-            
-        except Exception as e:
-            print(f"区块链验证失败: {e}")
+        # 获取用户，在提交链上交易之前锁定
+        user = db.query(User).filter(User.id == verification.user_id).with_for_update().first()
+        if not user:
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"区块链验证失败: {str(e)}"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="用户不存在"
             )
+        
+        # 链上凭证与数据库记录使用同一个过期时间
+        expiry = datetime.utcnow() + timedelta(days=CREDENTIAL_VALIDITY_DAYS)
+        # 客户端已提供交易哈希时说明已自行上链，不再重复写入
+        if user.blockchain_address and not verification_update.transaction_hash:
+            try:
+                # 与批量批准相同，作为只含一个凭证的批量提交写入区块链
+                results = await asyncio.wrap_future(blockchain.submit_transaction(
+                    PRIORITY_CRITICAL, "issue_credentials_batch",
+                    [{
+                        "owner": user.blockchain_address,
+                        "user_id": user.id,
+                        "verification_type": verification.verification_type,
+                        "credential_hash": blockchain.get_credential_hash(
+                            verification.id, user.id, verification.verification_type, verifier.id
+                        ),
+                        "expires_at": int(expiry.replace(tzinfo=timezone.utc).timestamp())
+                    }],
+                    gas=ISSUE_CREDENTIAL_GAS, tx_count=1
+                ))
+                if not results[0]["transaction_hash"]:
+                    raise Exception(results[0]["error"])
+                transaction_hash = results[0]["transaction_hash"]
+            except Exception as e:
+                logger.error("区块链验证失败: %s", e, extra={"verification_id": verification_id})
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"区块链验证失败: {str(e)}"
+                )
+        
+        # 更新用户验证状态
+        user.is_verified = True
+        db.add(user)
     
     # 更新验证记录
+    previous_status = verification.status
     verification.status = verification_update.status
     verification.notes = verification_update.notes or verification.notes
+    if expiry:
+        verification.expires_at = expiry
+    if verification.status != "pending":
+        clear_lease(verification)
     
     # 如果提供了交易哈希或从区块链操作获取了哈希
     if verification_update.transaction_hash:
@@ -249,18 +784,26 @@ async def update_verification_status(
         verification.transaction_hash = transaction_hash
     
     db.add(verification)
+    if verification.status == "approved" and previous_status != "approved":
+        # 分配状态列表位置并签发链下凭证，依赖方无需读取区块链即可验证
+        assign_status_indexes(db, [verification])
+        issue_credential(db, verification)
+    record_status_change(db, verification, previous_status)
     db.commit()
     db.refresh(verification)
+    assigner.on_status_change(verification.verifier_id, previous_status, verification.status)
+    publish_verification_event("verification.updated", verification)
     
     return verification
 
 @router.get("/user/{user_id}", response_model=List[VerificationResponse])
 async def get_user_verifications(
     user_id: str,
+    include_archived: bool = False,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """获取用户的所有验证记录"""
+    """获取用户的所有验证记录，include_archived 为真时包含已归档的记录"""
     # 检查权限（只能查看自己的验证记录）
     if user_id != current_user.id:
         raise HTTPException(
@@ -269,17 +812,22 @@ async def get_user_verifications(
         )
     
     verifications = db.query(Verification).filter(Verification.user_id == user_id).all()
+    if include_archived:
+        verifications = find_archived_verifications_for_user(db, user_id) + verifications
     return verifications
 
 @router.get("/{verification_id}", response_model=VerificationResponse)
 async def get_verification_by_id(
     verification_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """通过ID获取验证记录详情"""
     # 获取验证记录
+    # 热表中没有时再查归档表，已归档的记录对调用方透明
     verification = db.query(Verification).filter(Verification.id == verification_id).first()
+    if not verification:
+        verification = find_archived_verification(db, verification_id)
     if not verification:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -299,8 +847,10 @@ async def get_verification_by_id(
 async def check_blockchain_verification_status(
     user_id: str,
     verification_type: str,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """从区块链检查用户的验证状态"""
     # 检查权限
@@ -310,6 +860,19 @@ async def check_blockchain_verification_status(
             detail="不允许查看其他用户的验证状态"
         )
     
+    # 链上状态只在批准写入时变化，批准会更新对应验证记录的版本号，
+    # 因此用数据库中的验证记录计算ETag，未修改时省去RPC调用
+    count, version_sum, last_updated = verification_stamp(
+        db,
+        Verification.user_id == user_id,
+        Verification.verification_type == verification_type
+    )
+    etag = make_etag("chain-status", user_id, verification_type, count, version_sum)
+    not_modified = check_not_modified(request, etag, last_updated)
+    if not_modified:
+        return not_modified
+    set_cache_headers(response, etag, last_updated)
+    
     try:
         is_verified = blockchain.check_verification_status(user_id, verification_type)
         return {"user_id": user_id, "verification_type": verification_type, "is_verified": is_verified}
@@ -0,0 +1,214 @@
+# app/core/analytics.py
+import os
+import random
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from ..models.models import Verification, VerificationArchive, VerificationCounter, VerificationDailyCount
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# 每个计数分散的行数；PostgreSQL 上并发事务更新同一计数时只竞争其中一行
+ANALYTICS_COUNTER_SHARDS = int(os.getenv("ANALYTICS_COUNTER_SHARDS", "8"))
+
+# 按天统计的事件，待处理状态的变更不计入
+DAILY_EVENTS = ("requested", "approved", "rejected", "expired")
+
+
+def _upsert(db, table, keys, amount):
+    """计数加上 amount，行不存在时插入"""
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert(table).values(**keys, count=amount)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={"count": table.c.count + stmt.excluded.count}
+        ))
+        return
+    result = db.execute(
+        table.update().where(*(table.c[name] == value for name, value in keys.items())).values(count=table.c.count + amount)
+    )
+    if result.rowcount == 0:
+        db.execute(table.insert().values(**keys, count=amount))
+
+
+class CounterDeltas:
+    """一个事务内累积的计数变化，提交前一次写入"""
+
+    def __init__(self, now=None):
+        self.day = (now or datetime.utcnow()).date()
+        self.totals = Counter()  # (状态, 类型, 验证者) -> 变化量
+        self.daily = Counter()  # (事件, 类型, 验证者) -> 变化量
+
+    def __bool__(self):
+        return any(self.totals.values()) or any(self.daily.values())
+
+    def created(self, verification):
+        key = (verification.verification_type or "", verification.verifier_id or "")
+        self.totals[(verification.status,) + key] += 1
+        self.daily[("requested",) + key] += 1
+        if verification.status in DAILY_EVENTS:
+            self.daily[(verification.status,) + key] += 1
+
+    def status_changed(self, verification, previous_status):
+        if previous_status == verification.status:
+            return
+        key = (verification.verification_type or "", verification.verifier_id or "")
+        self.totals[(previous_status,) + key] -= 1
+        self.totals[(verification.status,) + key] += 1
+        if verification.status in DAILY_EVENTS:
+            self.daily[(verification.status,) + key] += 1
+
+    def apply(self, db):
+        """在当前事务中写入计数变化
+
+        按主键顺序更新，使并发事务以相同顺序加锁，避免死锁。
+        """
+        shard = random.randrange(ANALYTICS_COUNTER_SHARDS)
+        totals = VerificationCounter.__table__
+        for (status, verification_type, verifier_id), amount in sorted(self.totals.items()):
+            if amount:
+                _upsert(db, totals, {
+                    "status": status, "verification_type": verification_type,
+                    "verifier_id": verifier_id, "shard": shard
+                }, amount)
+        daily = VerificationDailyCount.__table__
+        for (event, verification_type, verifier_id), amount in sorted(self.daily.items()):
+            if amount:
+                _upsert(db, daily, {
+                    "day": self.day, "event": event, "verification_type": verification_type,
+                    "verifier_id": verifier_id, "shard": shard
+                }, amount)
+        self.totals.clear()
+        self.daily.clear()
+
+
+def record_created(db, verification):
+    """记录新建的验证，需在提交验证的同一事务中调用"""
+    deltas = CounterDeltas()
+    deltas.created(verification)
+    deltas.apply(db)
+
+
+def record_status_change(db, verification, previous_status):
+    """记录验证的状态变更，需在提交验证的同一事务中调用"""
+    deltas = CounterDeltas()
+    deltas.status_changed(verification, previous_status)
+    deltas.apply(db)
+
+
+def summarize(db, days=30, verifier_id=None, now=None):
+    """读取计数表汇总验证数量
+
+    只读取计数表的各个分桶，不扫描验证表；计数包含已归档的验证。
+
+    Args:
+        db: 数据库会话
+        days: 按天统计包含的天数（含今天）
+        verifier_id: 只统计该验证者
+        now: 当前时间（UTC），便于测试
+
+    Returns:
+        dict: 总数、按状态/类型/验证者的数量和每日吞吐
+    """
+    totals = db.query(
+        VerificationCounter.status,
+        VerificationCounter.verification_type,
+        VerificationCounter.verifier_id,
+        func.sum(VerificationCounter.count)
+    )
+    if verifier_id:
+        totals = totals.filter(VerificationCounter.verifier_id == verifier_id)
+    totals = totals.group_by(
+        VerificationCounter.status, VerificationCounter.verification_type, VerificationCounter.verifier_id
+    ).all()
+
+    by_status = Counter()
+    by_type = defaultdict(Counter)
+    by_verifier = defaultdict(Counter)
+    for status, verification_type, verifier, count in totals:
+        if not count:
+            continue
+        by_status[status] += count
+        by_type[verification_type][status] += count
+        by_verifier[verifier][status] += count
+
+    since = (now or datetime.utcnow()).date() - timedelta(days=max(days, 1) - 1)
+    daily_rows = db.query(
+        VerificationDailyCount.day,
+        VerificationDailyCount.event,
+        func.sum(VerificationDailyCount.count)
+    ).filter(VerificationDailyCount.day >= since)
+    if verifier_id:
+        daily_rows = daily_rows.filter(VerificationDailyCount.verifier_id == verifier_id)
+    daily = defaultdict(lambda: {event: 0 for event in DAILY_EVENTS})
+    for day, event, count in daily_rows.group_by(VerificationDailyCount.day, VerificationDailyCount.event):
+        daily[day][event] = count
+
+    return {
+        "total": sum(by_status.values()),
+        "by_status": dict(by_status),
+        "by_type": {key: dict(value) for key, value in by_type.items()},
+        "by_verifier": {key: dict(value) for key, value in by_verifier.items()},
+        "daily": [dict(day=day.isoformat(), **daily[day]) for day in sorted(daily)],
+    }
+
+
+def rebuild_counters(db):
+    """从验证表和归档表重新计算所有计数
+
+    用于首次启用或批量导入数据之后；需要全表扫描，应在维护窗口内运行。
+    历史的处理日期按验证的最后更新时间估算（归档记录按验证日期）。
+
+    Returns:
+        int: 计入的验证数
+    """
+    db.query(VerificationCounter).delete()
+    db.query(VerificationDailyCount).delete()
+    counter_table = VerificationCounter.__table__
+    daily_table = VerificationDailyCount.__table__
+
+    total = 0
+    sources = (
+        (Verification, Verification.updated_at),
+        (VerificationArchive, VerificationArchive.verification_date),
+    )
+    for model, closed_at in sources:
+        rows = db.query(
+            model.status, model.verification_type, model.verifier_id, func.count(model.id)
+        ).group_by(model.status, model.verification_type, model.verifier_id).all()
+        for status, verification_type, verifier_id, count in rows:
+            _upsert(db, counter_table, {
+                "status": status, "verification_type": verification_type or "",
+                "verifier_id": verifier_id or "", "shard": 0
+            }, count)
+            total += count
+
+        requested = db.query(
+            func.date(model.verification_date), model.verification_type, model.verifier_id, func.count(model.id)
+        ).group_by(func.date(model.verification_date), model.verification_type, model.verifier_id)
+        closed = db.query(
+            func.date(closed_at), model.status, model.verification_type, model.verifier_id, func.count(model.id)
+        ).filter(model.status.in_(DAILY_EVENTS[1:])).group_by(
+            func.date(closed_at), model.status, model.verification_type, model.verifier_id
+        )
+        events = [(day, "requested", t, v, c) for day, t, v, c in requested] + list(closed)
+        for day, event, verification_type, verifier_id, count in events:
+            if day is None:
+                continue
+            if isinstance(day, str):
+                day = datetime.strptime(day, "%Y-%m-%d").date()
+            elif isinstance(day, datetime):
+                day = day.date()
+            _upsert(db, daily_table, {
+                "day": day, "event": event, "verification_type": verification_type or "",
+                "verifier_id": verifier_id or "", "shard": 0
+            }, count)
+    db.commit()
+    logger.info("重建验证统计计数", extra={"verifications": total})
+    return total
@@ -0,0 +1,246 @@
+# app/core/archive.py
+import json
+import os
+import zlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import DateTime, or_, select, text
+from sqlalchemy.schema import CreateIndex
+
+from ..models.models import Verification, VerificationArchive
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# 已处理的验证在热表中保留的天数，超过后归档
+ARCHIVE_RETENTION_DAYS = int(os.getenv("ARCHIVE_RETENTION_DAYS", "365"))
+# 每批归档的行数，每批一个事务
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+
+# 可以归档的状态，待处理的验证始终留在热表
+CLOSED_STATUSES = ("approved", "rejected", "expired")
+
+_DATETIME_COLUMNS = {c.name for c in Verification.__table__.columns if isinstance(c.type, DateTime)}
+
+
+def archive_cutoff(now=None, retention_days=None):
+    """早于该时间处理完的验证可以归档"""
+    now = now or datetime.utcnow()
+    days = ARCHIVE_RETENTION_DAYS if retention_days is None else retention_days
+    return now - timedelta(days=days)
+
+
+def _naive(value):
+    return value.replace(tzinfo=None) if value is not None and value.tzinfo else value
+
+
+def pack_verification(row):
+    """把验证记录的行数据压缩为归档内容"""
+    data = {
+        name: value.isoformat() if isinstance(value, datetime) else value
+        for name, value in row.items()
+    }
+    return zlib.compress(json.dumps(data, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def unpack_verification(payload):
+    """从归档内容还原验证记录
+
+    Returns:
+        Verification: 未加入会话的对象，只用于读取
+    """
+    data = json.loads(zlib.decompress(payload).decode("utf-8"))
+    for name in _DATETIME_COLUMNS:
+        if data.get(name):
+            data[name] = datetime.fromisoformat(data[name])
+    return Verification(**data)
+
+
+def archive_closed_verifications(db, before=None, batch_size=ARCHIVE_BATCH_SIZE, max_batches=None):
+    """把早于截止时间的已处理验证移入归档表
+
+    已批准且凭证尚未过期的验证仍可被查询和复用，即使早于截止时间也留在热表，
+    过期后由过期清理改为 expired 再归档。每批在一个事务中写入归档表并从热表删除。PostgreSQL 上用 SKIP LOCKED 锁定本批的行，
+    与正在修改这些行的请求互不等待；被锁住的行留到下次运行。
+
+    Args:
+        db: 数据库会话
+        before: 截止时间，默认为 ARCHIVE_RETENTION_DAYS 天前
+        batch_size: 每批行数
+        max_batches: 最多处理的批数，None 表示直到没有可归档的行
+
+    Returns:
+        int: 归档的行数
+    """
+    table = Verification.__table__
+    cutoff = before or archive_cutoff()
+    now = datetime.utcnow()
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        rows = db.execute(
+            select(table).where(
+                table.c.status.in_(CLOSED_STATUSES),
+                table.c.verification_date < cutoff,
+                or_(table.c.status != "approved", table.c.expires_at.is_(None), table.c.expires_at <= now)
+            ).limit(batch_size).with_for_update(skip_locked=True)
+        ).mappings().all()
+        if not rows:
+            break
+        db.execute(VerificationArchive.__table__.insert(), [
+            {
+                "id": row["id"],
+                "user_id": row["user_id"],
+                "verifier_id": row["verifier_id"],
+                "verification_type": row["verification_type"],
+                "status": row["status"],
+                "verification_date": _naive(row["verification_date"]),
+                "archived_at": datetime.utcnow(),
+                "payload": pack_verification(row),
+            }
+            for row in rows
+        ])
+        db.execute(table.delete().where(table.c.id.in_([row["id"] for row in rows])))
+        db.commit()
+        total += len(rows)
+        batches += 1
+        if len(rows) < batch_size:
+            break
+    if total:
+        logger.info("归档验证记录", extra={"archived": total, "cutoff": cutoff.isoformat()})
+    return total
+
+
+def find_archived_verification(db, verification_id):
+    """按ID在归档表中查找验证记录，不存在时返回 None"""
+    archived = db.query(VerificationArchive).filter(VerificationArchive.id == verification_id).first()
+    return unpack_verification(archived.payload) if archived else None
+
+
+def find_archived_verifications_for_user(db, user_id):
+    """查找用户的所有已归档验证记录"""
+    archived = db.query(VerificationArchive).filter(
+        VerificationArchive.user_id == user_id
+    ).order_by(VerificationArchive.verification_date).all()
+    return [unpack_verification(a.payload) for a in archived]
+
+
+# PostgreSQL 按 verification_date 的月度范围分区。列表和待处理查询只涉及近期分区，
+# 归档清空的旧分区可以整体删除，热表的索引随之保持较小。
+
+def _month_start(value):
+    return datetime(value.year, value.month, 1)
+
+
+def _next_month(value):
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"verifications_y{month.year:04d}m{month.month:02d}"
+
+
+def _create_partition_sql(month):
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF verifications "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+    )
+
+
+def is_partitioned(conn):
+    return bool(conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = 'verifications'"
+    )).scalar())
+
+
+def partition_verifications(conn, months_ahead=3):
+    """把 verifications 表转换为按月范围分区的表
+
+    在一个事务中重建表并复制数据，期间表被锁定，应在维护窗口内运行。
+    分区表的主键必须包含分区键，因此主键变为 (id, verification_date)；
+    id 为UUID，跨分区的唯一性由生成方式保证。
+
+    Args:
+        conn: PostgreSQL 连接（调用方负责提交）
+        months_ahead: 预先创建的未来月份分区数
+
+    Returns:
+        int: 创建的月度分区数
+    """
+    if conn.dialect.name != "postgresql":
+        raise RuntimeError("只有 PostgreSQL 支持分区")
+    if is_partitioned(conn):
+        return ensure_partitions(conn, months_ahead)
+
+    # 分区键不能为空
+    conn.execute(text("UPDATE verifications SET verification_date = now() WHERE verification_date IS NULL"))
+    oldest = conn.execute(text("SELECT min(verification_date) FROM verifications")).scalar()
+    conn.execute(text("ALTER TABLE verifications RENAME TO verifications_unpartitioned"))
+    conn.execute(text(
+        "CREATE TABLE verifications (LIKE verifications_unpartitioned INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (verification_date)"
+    ))
+    conn.execute(text("ALTER TABLE verifications ALTER COLUMN verification_date SET NOT NULL"))
+    conn.execute(text("ALTER TABLE verifications ADD PRIMARY KEY (id, verification_date)"))
+    conn.execute(text("ALTER TABLE verifications ADD FOREIGN KEY (user_id) REFERENCES users (id)"))
+    conn.execute(text("ALTER TABLE verifications ADD FOREIGN KEY (verifier_id) REFERENCES verifiers (id)"))
+    # 范围外的行（例如时钟异常）进入默认分区，不会写入失败
+    conn.execute(text("CREATE TABLE verifications_default PARTITION OF verifications DEFAULT"))
+
+    created = ensure_partitions(conn, months_ahead, start=oldest)
+    conn.execute(text("INSERT INTO verifications SELECT * FROM verifications_unpartitioned"))
+    conn.execute(text("DROP TABLE verifications_unpartitioned"))
+    # 旧表的索引随表删除后再按模型定义在父表上创建，各分区自动继承
+    for index in Verification.__table__.indexes:
+        conn.execute(CreateIndex(index))
+    logger.info("verifications 表已转换为分区表", extra={"partitions": created})
+    return created
+
+
+def ensure_partitions(conn, months_ahead=3, start=None, now=None):
+    """创建从 start 所在月份到未来 months_ahead 个月的分区，已存在的跳过
+
+    应定期运行，保证新写入的行不会落入默认分区。
+
+    Returns:
+        int: 涉及的月度分区数
+    """
+    now = now or datetime.utcnow()
+    month = _month_start(_naive(start) or now)
+    end = _month_start(now)
+    for _ in range(months_ahead):
+        end = _next_month(end)
+    count = 0
+    while month <= end:
+        conn.execute(text(_create_partition_sql(month)))
+        month = _next_month(month)
+        count += 1
+    return count
+
+
+def drop_empty_partitions(conn, before):
+    """删除上界早于 before 且已被归档清空的月度分区
+
+    Returns:
+        list: 删除的分区名
+    """
+    dropped = []
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'verifications' AND c.relname LIKE 'verifications_y%'"
+    )).scalars().all()
+    for name in sorted(rows):
+        month = datetime.strptime(name, "verifications_y%Ym%m")
+        if _next_month(month) > before:
+            continue
+        if conn.execute(text(f"SELECT 1 FROM {name} LIMIT 1")).first():
+            continue
+        conn.execute(text(f"ALTER TABLE verifications DETACH PARTITION {name}"))
+        conn.execute(text(f"DROP TABLE {name}"))
+        dropped.append(name)
+    if dropped:
+        logger.info("删除已清空的分区", extra={"partitions": dropped})
+    return dropped
@@ -0,0 +1,178 @@
+# app/core/assignment.py
+import os
+import threading
+from sqlalchemy import func
+
+from ..models.models import Verification, Verifier
+
+
+def supports_type(verifier, verification_type):
+    """判断验证者是否支持指定的验证类型
+
+    supported_types 为空表示该验证者可处理所有类型
+    """
+    supported = getattr(verifier, "supported_types", None)
+    if not supported:
+        return True
+    types = {t.strip().upper() for t in supported.split(",") if t.strip()}
+    return verification_type.upper() in types
+
+
+class VerifierQueueDepths:
+    """增量维护的每个验证者待处理队列深度
+
+    首次使用时通过一次 GROUP BY 查询预热，此后在分配和状态变更时
+    增减计数，避免每次分配都执行 COUNT 查询。
+    计数只在当前进程内有效，多进程部署时各进程各自预热。
+    """
+
+    def __init__(self):
+        self._depths = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def ensure_loaded(self, db):
+        """从数据库加载初始队列深度（只执行一次）"""
+        if self._loaded:
+            return
+        rows = db.query(
+            Verification.verifier_id, func.count(Verification.id)
+        ).filter(
+            Verification.status == "pending"
+        ).group_by(Verification.verifier_id).all()
+        with self._lock:
+            if not self._loaded:
+                self._depths = {verifier_id: count for verifier_id, count in rows if verifier_id}
+                self._loaded = True
+
+    def get(self, verifier_id):
+        return self._depths.get(verifier_id, 0)
+
+    def adjust(self, verifier_id, delta):
+        """调整验证者的队列深度，结果不小于0"""
+        with self._lock:
+            self._depths[verifier_id] = max(0, self._depths.get(verifier_id, 0) + delta)
+
+    def snapshot(self):
+        """返回当前队列深度的副本"""
+        with self._lock:
+            return dict(self._depths)
+
+    def reset(self):
+        """清空计数，下次使用时重新预热"""
+        with self._lock:
+            self._depths = {}
+            self._loaded = False
+
+
+class AssignmentStrategy:
+    """验证者分配策略基类"""
+    name = None
+
+    def select(self, candidates, depths):
+        """从候选验证者中选择一个
+
+        Args:
+            candidates: 已按能力过滤的候选验证者列表（非空）
+            depths: VerifierQueueDepths 实例
+
+        Returns:
+            被选中的验证者
+        """
+        raise NotImplementedError
+
+
+class LeastPendingStrategy(AssignmentStrategy):
+    """选择待处理队列最短的验证者，队列相同时优先权重大的"""
+    name = "least_pending"
+
+    def select(self, candidates, depths):
+        return min(
+            candidates,
+            key=lambda v: (depths.get(v.id), -(v.weight or 1), v.id)
+        )
+
+
+class WeightedRoundRobinStrategy(AssignmentStrategy):
+    """平滑加权轮询，按验证者权重比例分配请求"""
+    name = "weighted_round_robin"
+
+    def __init__(self):
+        self._current = {}
+        self._lock = threading.Lock()
+
+    def select(self, candidates, depths):
+        with self._lock:
+            total = 0
+            best = None
+            for verifier in candidates:
+                weight = max(verifier.weight or 1, 1)
+                total += weight
+                self._current[verifier.id] = self._current.get(verifier.id, 0) + weight
+                if best is None or self._current[verifier.id] > self._current[best.id]:
+                    best = verifier
+            self._current[best.id] -= total
+            return best
+
+
+STRATEGIES = {
+    LeastPendingStrategy.name: LeastPendingStrategy,
+    WeightedRoundRobinStrategy.name: WeightedRoundRobinStrategy,
+}
+
+
+class VerifierAssigner:
+    """验证者分配引擎：按验证类型能力路由，再由可插拔策略选择验证者"""
+
+    def __init__(self, strategy=None, depths=None):
+        self.strategy = strategy or LeastPendingStrategy()
+        self.depths = depths or VerifierQueueDepths()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """根据 VERIFIER_ASSIGNMENT_STRATEGY 环境变量创建分配器"""
+        name = os.getenv("VERIFIER_ASSIGNMENT_STRATEGY", LeastPendingStrategy.name)
+        if name not in STRATEGIES:
+            raise ValueError(f"未知的验证者分配策略: {name}，可选: {', '.join(STRATEGIES)}")
+        return cls(strategy=STRATEGIES[name]())
+
+    def choose(self, verifiers, verification_type):
+        """从给定验证者中选择一个并预占队列位置
+
+        Returns:
+            被选中的验证者，没有支持该类型的验证者时返回 None
+        """
+        candidates = [v for v in verifiers if supports_type(v, verification_type)]
+        if not candidates:
+            return None
+        with self._lock:
+            chosen = self.strategy.select(candidates, self.depths)
+            self.depths.adjust(chosen.id, 1)
+        return chosen
+
+    def assign(self, db, verification_type):
+        """为新的验证请求分配验证者
+
+        被选中验证者的队列深度会立即加一；如果随后保存失败，
+        调用方需要调用 release() 归还。
+        """
+        self.depths.ensure_loaded(db)
+        verifiers = db.query(Verifier).filter(Verifier.is_active == True).all()
+        return self.choose(verifiers, verification_type)
+
+    def release(self, verifier_id):
+        """归还一个队列位置（请求已处理或保存失败）"""
+        if verifier_id:
+            self.depths.adjust(verifier_id, -1)
+
+    def on_status_change(self, verifier_id, old_status, new_status):
+        """验证状态变更时维护队列深度"""
+        if old_status == "pending" and new_status != "pending":
+            self.release(verifier_id)
+        elif old_status != "pending" and new_status == "pending" and verifier_id:
+            self.depths.adjust(verifier_id, 1)
+
+
+# 进程内共享的分配器
+assigner = VerifierAssigner.from_env()
@@ -1,17 +1,53 @@
 # app/core/blockchain.py
+import contextvars
 import json
 import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from web3 import Web3
 from web3.middleware import geth_poa_middleware
 from dotenv import load_dotenv
 import hashlib
+from .metrics import web3_metrics_middleware
+from .logger import get_logger
+from .tracing import start_span, trace_public_methods, web3_tracing_middleware
 
 # 加载环境变量
 load_dotenv()
 
+logger = get_logger(__name__)
+
+# 链上凭证默认有效期（天）
+CREDENTIAL_VALIDITY_DAYS = int(os.getenv("CREDENTIAL_VALIDITY_DAYS", "365"))
+
+# 链上写操作的优先级
+PRIORITY_CRITICAL = "critical"  # KYC批准等时间敏感的写入
+PRIORITY_NORMAL = "normal"  # 地址更新等用户触发的写入
+PRIORITY_BULK = "bulk"  # 注册、批量导入等可延后的写入
+
+# 各类写操作的默认gas上限
+REGISTER_IDENTITY_GAS = 2000000
+ISSUE_CREDENTIAL_GAS = 300000
+REVOKE_CREDENTIAL_GAS = 100000
+ANCHOR_DIGEST_GAS = 30000  # 21000 基础费用加32字节数据
+
+# 出块间隔（秒），无法读取区块高度时用于估算区块
+CHAIN_BLOCK_TIME = float(os.getenv("CHAIN_BLOCK_TIME", "2"))
+# 每个区块内所有调度交易的gas总上限
+CHAIN_GAS_CEILING_PER_BLOCK = int(os.getenv("CHAIN_GAS_CEILING_PER_BLOCK", "15000000"))
+# 同时执行（发送后等待回执）的写操作数
+CHAIN_SCHEDULER_CONCURRENCY = int(os.getenv("CHAIN_SCHEDULER_CONCURRENCY", "16"))
+
+@trace_public_methods("blockchain")
 class BlockchainManager:
     """管理与以太坊区块链的交互"""
     
+    # 同一进程的写操作共用一个发送账户：取nonce到交易发出之间互斥，
+    # 等待回执不持有该锁，调度器可以并发执行多个写操作
+    _nonce_lock = threading.Lock()
+    
     def __init__(self):
         """初始化区块链连接和合约"""
         # 连接到区块链节点 - 使用WEB3_PROVIDER_URI而不是BLOCKCHAIN_NODE_URL
@@ -19,6 +55,10 @@ class BlockchainManager:
         
         # 为POA网络添加中间件（如Rinkeby, Ganache等）
         self.web3.middleware_onion.inject(geth_poa_middleware, layer=0)
+        # 记录每次节点RPC调用的耗时
+        self.web3.middleware_onion.add(web3_metrics_middleware, name="metrics")
+        # 在当前请求的链路中为每次RPC调用创建span
+        self.web3.middleware_onion.add(web3_tracing_middleware, name="tracing")
         
         # 检查连接
         if not self.web3.isConnected():
@@ -51,18 +91,18 @@ class BlockchainManager:
                 # 从私钥生成账户
                 account = self.web3.eth.account.from_key(admin_private_key)
                 self.web3.eth.default_account = account.address
-                print(f"使用私钥生成的账户地址: {account.address}")
+                logger.info("使用私钥生成的账户地址: %s", account.address)
             else:
                 # 尝试使用第一个可用账户
                 accounts = self.web3.eth.accounts
                 if accounts:
                     self.web3.eth.default_account = accounts[0]
-                    print(f"使用区块链第一个账户: {accounts[0]}")
+                    logger.info("使用区块链第一个账户: %s", accounts[0])
                 else:
                     raise Exception("没有可用的以太坊账户，请设置ADMIN_PRIVATE_KEY环境变量")
             
         except Exception as e:
-            print(f"初始化区块链合约时出错: {e}")
+            logger.error("初始化区块链合约时出错: %s", e)
             raise
     
     def get_identity_hash(self, user_id):
@@ -80,7 +120,7 @@ class BlockchainManager:
             identity_hash = hashlib.sha256(str(user_id).encode('utf-8')).hexdigest()
             return f'0x{identity_hash}'
         except Exception as e:
-            print(f"生成身份哈希时出错: {e}")
+            logger.error("生成身份哈希时出错: %s", e)
             return None
     
     def register_identity(self, user_id, user_address):
@@ -101,7 +141,7 @@ class BlockchainManager:
             if identity_hash.startswith("0x"):
                 identity_hash = identity_hash[2:]
             
-            print(f"准备调用registerIdentity，参数: {identity_hash}")
+            logger.debug("准备调用registerIdentity，参数: %s", identity_hash)
             
             # 确保我们有有效的发送地址
             from_address = self.web3.eth.default_account
@@ -111,44 +151,205 @@ class BlockchainManager:
                 if not from_address:
                     raise Exception("没有可用的发送地址，请设置ADMIN_PRIVATE_KEY环境变量或提供有效的user_address")
             
-            print(f"交易发送地址: {from_address}")
-            
-            # 准备交易
-            tx = self.contract.functions.registerIdentity(
-                identity_hash
-            ).buildTransaction({
-                'from': from_address,
-                'gas': 2000000,
-                'gasPrice': self.web3.eth.gas_price,
-                'nonce': self.web3.eth.get_transaction_count(from_address)
-            })
+            logger.debug("交易发送地址: %s", from_address)
             
             # 签名交易 - 使用ADMIN_PRIVATE_KEY而不是PRIVATE_KEY
-            admin_private_key = os.getenv("ADMIN_PRIVATE_KEY")
-            if not admin_private_key:
-                raise Exception("ADMIN_PRIVATE_KEY 环境变量未设置")
+            admin_private_key = self._admin_private_key()
+            
+            with self._nonce_lock:
+                # 准备交易
+                tx = self.contract.functions.registerIdentity(
+                    identity_hash
+                ).buildTransaction({
+                    'from': from_address,
+                    'gas': REGISTER_IDENTITY_GAS,
+                    'gasPrice': self.web3.eth.gas_price,
+                    'nonce': self.web3.eth.get_transaction_count(from_address, "pending")
+                })
                 
-            # 确保私钥格式正确
-            if not admin_private_key.startswith("0x"):
-                admin_private_key = "0x" + admin_private_key
+                with start_span("blockchain.sign_transaction"):
+                    signed_tx = self.web3.eth.account.sign_transaction(tx, admin_private_key)
                 
-            signed_tx = self.web3.eth.account.sign_transaction(tx, admin_private_key)
-            
-            # 发送交易
-            tx_hash = self.web3.eth.send_raw_transaction(signed_tx.rawTransaction)
+                # 发送交易
+                tx_hash = self.web3.eth.send_raw_transaction(signed_tx.rawTransaction)
             
             # 等待交易确认
             tx_receipt = self.web3.eth.wait_for_transaction_receipt(tx_hash)
             
-            print(f"身份注册成功，交易哈希: {tx_receipt.transactionHash.hex()}")
+            logger.info("身份注册成功", extra={"user_id": user_id, "transaction_hash": tx_receipt.transactionHash.hex()})
             return tx_receipt.transactionHash.hex()
         
         except Exception as e:
-            print(f"注册身份时出错: {e}")
-            import traceback
-            print(traceback.format_exc())
+            logger.exception("注册身份时出错", extra={"user_id": user_id})
             raise
     
+    def submit_transaction(self, priority, method, *args, gas=REGISTER_IDENTITY_GAS, tx_count=1):
+        """通过交易调度器提交链上写操作
+        
+        Args:
+            priority: 优先级（PRIORITY_CRITICAL、PRIORITY_NORMAL、PRIORITY_BULK）
+            method: 要执行的 BlockchainManager 方法名
+            *args: 方法参数
+            gas: 预计消耗的gas，用于gas预算
+            tx_count: 该操作包含的交易数，用于每区块交易预算
+            
+        Returns:
+            Future: 完成后得到方法的返回值
+        """
+        if _write_coordinator is not None:
+            # 多副本部署时交给持有签名租约的副本执行
+            return _write_coordinator.submit(priority, method, args, gas=gas, tx_count=tx_count)
+        return get_transaction_scheduler(self).submit(priority, method, args, gas=gas, tx_count=tx_count, target=self)
+    
+    def _admin_private_key(self):
+        """读取并规范化管理员私钥"""
+        admin_private_key = os.getenv("ADMIN_PRIVATE_KEY")
+        if not admin_private_key:
+            raise Exception("ADMIN_PRIVATE_KEY 环境变量未设置")
+        if not admin_private_key.startswith("0x"):
+            admin_private_key = "0x" + admin_private_key
+        return admin_private_key
+    
+    def get_credential_id(self, user_id, verification_type):
+        """计算用户某一验证类型凭证的链上ID
+        
+        Args:
+            user_id: 用户唯一标识符
+            verification_type: 验证类型
+            
+        Returns:
+            str: 0x开头的bytes32十六进制字符串
+        """
+        digest = hashlib.sha256(f"{user_id}:{verification_type}".encode('utf-8')).hexdigest()
+        return f'0x{digest}'
+    
+    def get_credential_hash(self, verification_id, user_id, verification_type, verifier_id):
+        """计算凭证内容的哈希值，作为链上凭证哈希"""
+        payload = json.dumps({
+            "verification_id": verification_id,
+            "user_id": user_id,
+            "verification_type": verification_type,
+            "verifier_id": verifier_id
+        }, sort_keys=True, separators=(",", ":"))
+        return f'0x{hashlib.sha256(payload.encode("utf-8")).hexdigest()}'
+    
+    def issue_credentials_batch(self, credentials):
+        """批量在区块链上颁发凭证
+        
+        所有交易使用连续的nonce一次性签名发送，然后统一等待回执，
+        避免逐笔发送、逐笔等待确认。
+        
+        Args:
+            credentials: 凭证列表，每项包含 owner、user_id、verification_type、
+                credential_hash 和 expires_at（Unix时间戳）
+                
+        Returns:
+            list: 与输入顺序一致的结果，每项包含 transaction_hash 和 error
+        """
+        return self._send_batch(
+            credentials,
+            lambda credential: self.contract.functions.issueCredential(
+                Web3.to_checksum_address(credential["owner"]),
+                bytes.fromhex(self.get_credential_id(credential["user_id"], credential["verification_type"])[2:]),
+                bytes.fromhex(credential["credential_hash"][2:]),
+                int(credential["expires_at"])
+            ),
+            ISSUE_CREDENTIAL_GAS
+        )
+    
+    def revoke_credentials_batch(self, credentials):
+        """批量撤销链上凭证，发送方式与 issue_credentials_batch 相同
+        
+        Args:
+            credentials: 凭证列表，每项包含 owner、user_id 和 verification_type
+                
+        Returns:
+            list: 与输入顺序一致的结果，每项包含 transaction_hash 和 error
+        """
+        return self._send_batch(
+            credentials,
+            lambda credential: self.contract.functions.revokeCredential(
+                Web3.to_checksum_address(credential["owner"]),
+                bytes.fromhex(self.get_credential_id(credential["user_id"], credential["verification_type"])[2:])
+            ),
+            REVOKE_CREDENTIAL_GAS
+        )
+    
+    def anchor_digest(self, digest):
+        """把32字节摘要写入链上
+        
+        合约没有对应的存证方法，因此发送一笔以摘要为data、发给自己的零值交易，
+        任何人都可以按交易哈希读取交易数据核对摘要。
+        
+        Args:
+            digest: 0x开头的32字节十六进制摘要
+            
+        Returns:
+            str: 交易哈希
+        """
+        from_address = self.web3.eth.default_account
+        with self._nonce_lock:
+            tx = {
+                'from': from_address,
+                'to': from_address,
+                'value': 0,
+                'data': digest,
+                'gas': ANCHOR_DIGEST_GAS,
+                'gasPrice': self.web3.eth.gas_price,
+                'nonce': self.web3.eth.get_transaction_count(from_address, "pending"),
+                'chainId': self.web3.eth.chain_id
+            }
+            with start_span("blockchain.sign_transaction"):
+                signed_tx = self.web3.eth.account.sign_transaction(tx, self._admin_private_key())
+            tx_hash = self.web3.eth.send_raw_transaction(signed_tx.rawTransaction)
+        tx_receipt = self.web3.eth.wait_for_transaction_receipt(tx_hash)
+        if tx_receipt.status != 1:
+            raise Exception("交易执行失败")
+        return tx_receipt.transactionHash.hex()
+    
+    def _send_batch(self, items, build_call, gas):
+        """用连续的nonce签名发送一批合约调用，然后统一等待回执"""
+        if not items:
+            return []
+        
+        from_address = self.web3.eth.default_account
+        private_key = self._admin_private_key()
+        
+        results = []
+        sent = []
+        with self._nonce_lock:
+            gas_price = self.web3.eth.gas_price
+            nonce = self.web3.eth.get_transaction_count(from_address, "pending")
+            for item in items:
+                try:
+                    tx = build_call(item).build_transaction({
+                        'from': from_address,
+                        'gas': gas,
+                        'gasPrice': gas_price,
+                        'nonce': nonce
+                    })
+                    with start_span("blockchain.sign_transaction"):
+                        signed_tx = self.web3.eth.account.sign_transaction(tx, private_key)
+                    tx_hash = self.web3.eth.send_raw_transaction(signed_tx.rawTransaction)
+                    nonce += 1
+                    results.append({"transaction_hash": None, "error": None})
+                    sent.append((len(results) - 1, tx_hash))
+                except Exception as e:
+                    results.append({"transaction_hash": None, "error": str(e)})
+        
+        # 统一等待回执
+        for index, tx_hash in sent:
+            try:
+                tx_receipt = self.web3.eth.wait_for_transaction_receipt(tx_hash)
+                if tx_receipt.status == 1:
+                    results[index]["transaction_hash"] = tx_receipt.transactionHash.hex()
+                else:
+                    results[index]["error"] = "交易执行失败"
+            except Exception as e:
+                results[index]["error"] = str(e)
+        
+        return results
+    
     # 其他方法保持不变...
     
     def check_verification_status(self, user_id, verification_type):
@@ -167,7 +368,7 @@ class BlockchainManager:
                 verification_type
             ).call()
         except Exception as e:
-            print(f"检查验证状态时出错: {e}")
+            logger.warning("检查验证状态时出错: %s", e)
             return False
     
     def get_identity_details(self, user_id):
@@ -203,5 +404,284 @@ class BlockchainManager:
             return details
             
         except Exception as e:
-            print(f"获取身份详情时出错: {e}")
-            raise
\ No newline at end of file
+            logger.error("获取身份详情时出错: %s", e)
+            raise
+
+
+class PriorityClass:
+    """交易优先级类别及其每区块预算"""
+
+    def __init__(self, name, weight, max_tx_per_block, max_gas_per_block):
+        self.name = name
+        self.weight = weight  # 公平排队中的权重
+        self.max_tx_per_block = max_tx_per_block
+        self.max_gas_per_block = max_gas_per_block
+
+
+def default_priority_classes():
+    """默认的优先级类别，预算可通过环境变量调整"""
+    return [
+        PriorityClass(
+            PRIORITY_CRITICAL, weight=6,
+            max_tx_per_block=int(os.getenv("CHAIN_CRITICAL_TX_PER_BLOCK", "50")),
+            max_gas_per_block=int(os.getenv("CHAIN_CRITICAL_GAS_PER_BLOCK", str(CHAIN_GAS_CEILING_PER_BLOCK)))
+        ),
+        PriorityClass(
+            PRIORITY_NORMAL, weight=3,
+            max_tx_per_block=int(os.getenv("CHAIN_NORMAL_TX_PER_BLOCK", "20")),
+            max_gas_per_block=int(os.getenv("CHAIN_NORMAL_GAS_PER_BLOCK", "8000000"))
+        ),
+        PriorityClass(
+            PRIORITY_BULK, weight=1,
+            max_tx_per_block=int(os.getenv("CHAIN_BULK_TX_PER_BLOCK", "5")),
+            max_gas_per_block=int(os.getenv("CHAIN_BULK_GAS_PER_BLOCK", "4000000"))
+        ),
+    ]
+
+
+class ChainJob:
+    """排队中的链上写操作"""
+
+    def __init__(self, target, priority, method, args, gas, tx_count):
+        self.target = target
+        self.priority = priority
+        self.method = method
+        self.args = args
+        self.gas = gas
+        self.tx_count = tx_count
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+        # 在提交方的上下文中执行，使链上调用归入提交请求的链路
+        self.context = contextvars.copy_context()
+
+
+class ClassStats:
+    """单个优先级类别的统计"""
+
+    def __init__(self):
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.waits = deque(maxlen=1000)  # 最近的排队等待时间（秒）
+        self.max_wait = 0.0
+        self.tx_in_block = 0
+        self.gas_in_block = 0
+
+    def snapshot(self, depth):
+        waits = sorted(self.waits)
+
+        def percentile(p):
+            if not waits:
+                return 0.0
+            return waits[min(len(waits) - 1, int(p * len(waits)))]
+
+        return {
+            "queue_depth": depth,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "tx_in_current_block": self.tx_in_block,
+            "gas_in_current_block": self.gas_in_block,
+            "wait_seconds": {
+                "avg": sum(waits) / len(waits) if waits else 0.0,
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": self.max_wait,
+            },
+        }
+
+
+class ChainTransactionScheduler:
+    """链上交易调度器
+
+    所有写操作按优先级类别排队，由单个后台线程按加权公平排队（虚拟时间）选出，
+    交给线程池执行：调度线程不等待交易回执，同一区块内可以发出预算允许的全部交易，
+    正在等待回执的批量作业也不会推迟关键作业。交易的发送由 BlockchainManager 的nonce锁串行化。
+    每个类别在每个区块内有交易数和gas预算，所有类别共享一个gas总上限，
+    避免批量导入挤占时间敏感的KYC批准。
+    """
+
+    def __init__(self, manager, classes=None, gas_ceiling=CHAIN_GAS_CEILING_PER_BLOCK, block_time=CHAIN_BLOCK_TIME,
+                 autostart=True, concurrency=CHAIN_SCHEDULER_CONCURRENCY):
+        self.manager = manager
+        self.autostart = autostart
+        self.classes = classes or default_priority_classes()
+        self.gas_ceiling = gas_ceiling
+        self.block_time = block_time
+        self._by_name = {c.name: c for c in self.classes}
+        self._queues = {c.name: deque() for c in self.classes}
+        self._stats = {c.name: ClassStats() for c in self.classes}
+        self._virtual_time = {c.name: 0.0 for c in self.classes}
+        self._block = None
+        self._block_checked_at = 0.0
+        self._gas_in_block = 0
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="chain-tx")
+        self._thread = None
+        self._running = False
+
+    def submit(self, priority, method, args=(), gas=REGISTER_IDENTITY_GAS, tx_count=1, target=None):
+        """提交写操作，返回Future
+
+        target 为执行方法的区块链管理器，默认使用创建调度器时的管理器。
+        """
+        if priority not in self._by_name:
+            raise ValueError(f"未知的交易优先级: {priority}")
+        job = ChainJob(target or self.manager, priority, method, tuple(args), gas, tx_count)
+        with self._condition:
+            queue = self._queues[priority]
+            if not queue:
+                # 空闲类别重新变为活跃时不积累额度，避免突发占满区块
+                active = [self._virtual_time[name] for name, q in self._queues.items() if q]
+                if active:
+                    self._virtual_time[priority] = max(self._virtual_time[priority], min(active))
+            queue.append(job)
+            self._stats[priority].submitted += 1
+            self._condition.notify()
+        if self.autostart:
+            self.start()
+        return job.future
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="chain-tx-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self._executor.shutdown(wait=False)
+
+    def _current_block(self):
+        """读取当前区块高度，读取失败时按出块间隔估算"""
+        now = time.monotonic()
+        if self._block is not None and now - self._block_checked_at < min(self.block_time / 4, 0.5):
+            return self._block
+        self._block_checked_at = now
+        try:
+            return self.manager.web3.eth.block_number
+        except Exception:
+            return int(time.time() // self.block_time)
+
+    def _roll_block(self, block=None):
+        if block is None:
+            block = self._current_block()
+        if block != self._block:
+            self._block = block
+            self._gas_in_block = 0
+            for stats in self._stats.values():
+                stats.tx_in_block = 0
+                stats.gas_in_block = 0
+
+    def _fits(self, priority_class, job):
+        """判断作业是否在本区块预算内；超出单区块预算的大作业在区块空闲时单独执行"""
+        stats = self._stats[priority_class.name]
+        if stats.tx_in_block == 0 and self._gas_in_block == 0:
+            return True
+        return (
+            stats.tx_in_block + job.tx_count <= priority_class.max_tx_per_block
+            and stats.gas_in_block + job.gas <= priority_class.max_gas_per_block
+            and self._gas_in_block + job.gas <= self.gas_ceiling
+        )
+
+    def _next_job(self):
+        """选出虚拟时间最小且在预算内的类别，同值时按优先级顺序"""
+        best = None
+        for priority_class in self.classes:
+            queue = self._queues[priority_class.name]
+            if not queue or not self._fits(priority_class, queue[0]):
+                continue
+            if best is None or self._virtual_time[priority_class.name] < self._virtual_time[best.name]:
+                best = priority_class
+        if best is None:
+            return None
+        job = self._queues[best.name].popleft()
+        self._virtual_time[best.name] += job.tx_count / best.weight
+        stats = self._stats[best.name]
+        stats.tx_in_block += job.tx_count
+        stats.gas_in_block += job.gas
+        self._gas_in_block += job.gas
+        wait = time.monotonic() - job.enqueued_at
+        stats.waits.append(wait)
+        stats.max_wait = max(stats.max_wait, wait)
+        return job
+
+    def _run(self):
+        while True:
+            # 读取区块高度是一次RPC，不能持有锁：submit 在请求处理中获取同一把锁
+            block = self._current_block()
+            with self._condition:
+                if not self._running:
+                    return
+                self._roll_block(block)
+                job = self._next_job()
+                if job is None:
+                    # 队列为空时等待新作业，预算用完时等待下一个区块
+                    has_pending = any(self._queues.values())
+                    self._condition.wait(timeout=min(self.block_time / 4, 0.5) if has_pending else 1.0)
+                    continue
+            self._executor.submit(self._execute, job)
+
+    def _execute(self, job):
+        stats = self._stats[job.priority]
+        try:
+            result = job.context.run(getattr(job.target, job.method), *job.args)
+        except Exception as e:
+            with self._condition:
+                stats.failed += 1
+            job.future.set_exception(e)
+        else:
+            with self._condition:
+                stats.completed += 1
+            job.future.set_result(result)
+
+    def metrics(self):
+        """各优先级类别的队列深度、等待时间和本区块预算使用情况"""
+        with self._condition:
+            return {
+                "block": self._block,
+                "gas_ceiling_per_block": self.gas_ceiling,
+                "gas_in_current_block": self._gas_in_block,
+                "classes": {
+                    c.name: dict(
+                        self._stats[c.name].snapshot(len(self._queues[c.name])),
+                        max_tx_per_block=c.max_tx_per_block,
+                        max_gas_per_block=c.max_gas_per_block,
+                    )
+                    for c in self.classes
+                },
+            }
+
+
+# 进程内共享的交易调度器，所有写操作经由同一个调度器排队
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_transaction_scheduler(manager=None):
+    """获取进程内的交易调度器，首次调用时用传入的管理器创建"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None and manager is not None:
+            _scheduler = ChainTransactionScheduler(manager)
+        return _scheduler
+
+
+# 多副本部署时的写操作协调器（见 core/signer.py），未设置时写操作在本进程执行
+_write_coordinator = None
+
+
+def set_write_coordinator(coordinator):
+    """设置写操作协调器，None 表示恢复在本进程执行"""
+    global _write_coordinator
+    _write_coordinator = coordinator
+
+
+def get_write_coordinator():
+    return _write_coordinator
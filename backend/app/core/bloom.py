@@ -0,0 +1,182 @@
+# app/core/bloom.py
+import hashlib
+import math
+import os
+import threading
+import time
+
+from ..models.models import User
+from .logger import get_logger
+from .metrics import registry
+
+logger = get_logger(__name__)
+
+# 布隆过滤器的目标误判率
+BLOOM_ERROR_RATE = float(os.getenv("BLOOM_ERROR_RATE", "0.001"))
+# 最小容量；重建时容量取现有用户数的两倍和该值中的较大者
+BLOOM_MIN_CAPACITY = int(os.getenv("BLOOM_MIN_CAPACITY", "100000"))
+# 定期重建的间隔（秒），用于纳入其他副本注册的用户；0 表示只在启动和容量不足时重建
+BLOOM_REBUILD_SECONDS = float(os.getenv("BLOOM_REBUILD_SECONDS", "300"))
+
+availability_checks = registry.counter(
+    "user_availability_checks_total", "用户名/邮箱可用性检查，按字段和结果统计", ("field", "result")
+)
+
+
+class BloomFilter:
+    """固定大小的布隆过滤器
+
+    使用一次 blake2b 摘要得到两个64位哈希，按 h1 + i*h2 生成 k 个位置。
+    """
+
+    def __init__(self, capacity, error_rate=BLOOM_ERROR_RATE):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.size = max(8, int(math.ceil(-self.capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.hash_count = max(1, int(round(self.size / self.capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class AvailabilityIndex:
+    """用户名和邮箱的可用性索引
+
+    过滤器中不存在的值一定未被本副本见过，直接判为可用，不查询数据库；
+    可能存在时再用唯一索引查询确认。过滤器在启动时从用户表重建，注册成功后加入新值。
+    其他副本注册的用户要到下次定期重建才会加入，因此可用性结果只作提示，
+    注册时仍由唯一约束保证不重复。
+    """
+
+    FIELDS = {"username": User.username, "email": User.email}
+
+    def __init__(self, error_rate=BLOOM_ERROR_RATE, min_capacity=BLOOM_MIN_CAPACITY, rebuild_seconds=BLOOM_REBUILD_SECONDS):
+        self.error_rate = error_rate
+        self.min_capacity = min_capacity
+        self.rebuild_seconds = rebuild_seconds
+        self._filters = None
+        self._pending = None  # 重建期间注册的值，重建完成后补入
+        self._lock = threading.Lock()
+        self._session_factory = None
+        self._rebuilding = False
+        self._built_at = 0.0
+
+    @property
+    def ready(self):
+        return self._filters is not None
+
+    def rebuild(self, session_factory, batch_size=10000):
+        """从用户表重建过滤器
+
+        Returns:
+            int: 加入的用户数
+        """
+        self._session_factory = session_factory
+        with self._lock:
+            if self._rebuilding:
+                return 0
+            self._rebuilding = True
+            self._pending = []
+        started = time.perf_counter()
+        try:
+            db = session_factory()
+            try:
+                total = db.query(User.id).count()
+                capacity = max(self.min_capacity, total * 2)
+                filters = {field: BloomFilter(capacity, self.error_rate) for field in self.FIELDS}
+                rows = db.query(User.username, User.email).execution_options(yield_per=batch_size)
+                added = 0
+                for username, email in rows:
+                    if username:
+                        filters["username"].add(username)
+                    if email:
+                        filters["email"].add(email)
+                    added += 1
+            finally:
+                db.close()
+            with self._lock:
+                for field, value in self._pending:
+                    filters[field].add(value)
+                self._filters = filters
+                self._built_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._pending = None
+                self._rebuilding = False
+        logger.info("可用性索引已重建", extra={
+            "users": added, "capacity": capacity, "seconds": round(time.perf_counter() - started, 3)
+        })
+        return added
+
+    def rebuild_async(self, session_factory):
+        """在后台线程中重建，重建完成前检查直接查询数据库"""
+        self._session_factory = session_factory
+        thread = threading.Thread(target=self.rebuild, args=(session_factory,), name="availability-rebuild", daemon=True)
+        thread.start()
+        return thread
+
+    def add(self, username=None, email=None):
+        """加入新注册用户的用户名和邮箱"""
+        with self._lock:
+            values = [("username", username), ("email", email)]
+            for field, value in values:
+                if not value:
+                    continue
+                if self._pending is not None:
+                    self._pending.append((field, value))
+                if self._filters is not None:
+                    self._filters[field].add(value)
+            needs_rebuild = self._filters is not None and self._filters["username"].count > self._filters["username"].capacity
+        if needs_rebuild:
+            self._maybe_rebuild()
+
+    def _maybe_rebuild(self):
+        if self._session_factory is not None and not self._rebuilding:
+            self._built_at = time.monotonic()
+            self.rebuild_async(self._session_factory)
+
+    def check(self, db, **values):
+        """检查各字段的值是否可用
+
+        Args:
+            db: 数据库会话
+            **values: username 和/或 email
+
+        Returns:
+            dict: 字段 -> 是否可用
+        """
+        if self.rebuild_seconds and self.ready and time.monotonic() - self._built_at > self.rebuild_seconds:
+            self._maybe_rebuild()
+        result = {}
+        for field, value in values.items():
+            if value is None:
+                continue
+            filters = self._filters
+            if filters is not None and value not in filters[field]:
+                availability_checks.inc(field, "filter_negative")
+                result[field] = True
+                continue
+            taken = db.query(User.id).filter(self.FIELDS[field] == value).first() is not None
+            if filters is None:
+                availability_checks.inc(field, "unindexed")
+            else:
+                availability_checks.inc(field, "taken" if taken else "false_positive")
+            result[field] = not taken
+        return result
+
+
+# 进程内共享的可用性索引，由应用启动时重建
+availability_index = AvailabilityIndex()
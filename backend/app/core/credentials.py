@@ -0,0 +1,253 @@
+# app/core/credentials.py
+import base64
+import gzip
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models.models import CredentialStatusList, IssuerKey
+from .logger import get_logger
+from .status_list import STATUS_LIST_ID, bit_is_set
+
+logger = get_logger(__name__)
+
+# 凭证的签发方标识，写入 iss 声明
+CREDENTIAL_ISSUER = os.getenv("CREDENTIAL_ISSUER", "dlt-identity-system")
+# 单次批量验证的凭证数上限
+CREDENTIAL_VERIFY_MAX_BATCH = int(os.getenv("CREDENTIAL_VERIFY_MAX_BATCH", "1000"))
+# 并行验证签名的线程数和每个线程处理的凭证数
+CREDENTIAL_VERIFY_WORKERS = int(os.getenv("CREDENTIAL_VERIFY_WORKERS", "4"))
+CREDENTIAL_VERIFY_CHUNK = int(os.getenv("CREDENTIAL_VERIFY_CHUNK", "100"))
+
+STATUS_LIST_PATH = "/api/credentials/status-list"
+
+
+def _b64url(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64url_decode(value):
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def _raw_public_key(public_key):
+    return public_key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+
+
+def key_id(public_key):
+    """公钥的JWK指纹（RFC 7638），作为 kid"""
+    jwk = json.dumps(
+        {"crv": "Ed25519", "kty": "OKP", "x": _b64url(_raw_public_key(public_key))},
+        separators=(",", ":"), sort_keys=True
+    )
+    return _b64url(hashlib.sha256(jwk.encode("utf-8")).digest())
+
+
+def load_signing_key(value):
+    """从PEM或base64url编码的32字节私钥种子加载签名密钥"""
+    if value.strip().startswith("-----BEGIN"):
+        return serialization.load_pem_private_key(value.encode("utf-8"), password=None)
+    return Ed25519PrivateKey.from_private_bytes(_b64url_decode(value.strip()))
+
+
+class IssuerKeyring:
+    """签发凭证的私钥和已知签发公钥的缓存
+
+    私钥来自 CREDENTIAL_SIGNING_KEY；未配置时每个进程生成临时密钥（仅用于开发）。
+    所有副本签发时用到的公钥都登记在 issuer_keys 表中，验证时先查进程内缓存，
+    未命中的 kid 一次查询数据库后缓存，之后不再访问数据库。
+    """
+
+    def __init__(self, signing_key=None):
+        if signing_key is None:
+            configured = os.getenv("CREDENTIAL_SIGNING_KEY")
+            if configured:
+                signing_key = load_signing_key(configured)
+            else:
+                logger.warning("未设置 CREDENTIAL_SIGNING_KEY，使用进程临时签名密钥")
+                signing_key = Ed25519PrivateKey.generate()
+        self.signing_key = signing_key
+        self.kid = key_id(signing_key.public_key())
+        self._public_keys = {self.kid: signing_key.public_key()}
+        self._lock = threading.Lock()
+        self._registered = False
+
+    def register(self, db):
+        """在 issuer_keys 表中登记当前公钥，需在保存凭证的同一事务中调用
+
+        事务提交后才记为已登记；事务回滚时登记随之撤销，下次签发时重新登记。
+        """
+        if self._registered:
+            return
+        if db.get(IssuerKey, self.kid) is None:
+            try:
+                with db.begin_nested():
+                    db.add(IssuerKey(kid=self.kid, public_key=_b64url(_raw_public_key(self.signing_key.public_key()))))
+            except IntegrityError:
+                # 其他副本使用相同的密钥，已经登记
+                pass
+        db.info.setdefault("pending_issuer_keys", set()).add(self)
+
+    def public_keys(self, db, kids):
+        """按 kid 取得公钥，缓存未命中的一次查询数据库
+
+        Returns:
+            dict: kid -> 公钥，未知的 kid 不在结果中
+        """
+        with self._lock:
+            found = {kid: self._public_keys[kid] for kid in kids if kid in self._public_keys}
+        missing = set(kids) - set(found)
+        if missing:
+            rows = db.query(IssuerKey).filter(IssuerKey.kid.in_(missing)).all()
+            loaded = {row.kid: Ed25519PublicKey.from_public_bytes(_b64url_decode(row.public_key)) for row in rows}
+            with self._lock:
+                self._public_keys.update(loaded)
+            found.update(loaded)
+        return found
+
+    def jwks(self, db):
+        """所有签发公钥的JWK集合，包含本进程尚未登记的当前公钥"""
+        keys = {row.kid: row.public_key for row in db.query(IssuerKey).order_by(IssuerKey.created_at)}
+        keys.setdefault(self.kid, _b64url(_raw_public_key(self.signing_key.public_key())))
+        return {"keys": [
+            {"kty": "OKP", "crv": "Ed25519", "x": x, "kid": kid, "alg": "EdDSA", "use": "sig"}
+            for kid, x in keys.items()
+        ]}
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_keys_registered(session):
+    # 保存点的提交不代表外层事务已提交
+    if session.in_nested_transaction():
+        return
+    for keyring in session.info.pop("pending_issuer_keys", ()):
+        keyring._registered = True
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_pending_keys(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("pending_issuer_keys", None)
+
+
+# 进程内共享的签发密钥
+issuer_keys = IssuerKeyring()
+
+
+def _timestamp(value):
+    return int(value.replace(tzinfo=timezone.utc).timestamp())
+
+
+def issue_credential(db, verification, now=None):
+    """为已批准的验证签发链下凭证，保存在 verification.credential
+
+    需在批准验证的同一事务中调用，并且已分配状态列表位置和过期时间。
+    """
+    now = now or datetime.utcnow()
+    issuer_keys.register(db)
+    claims = {
+        "iss": CREDENTIAL_ISSUER,
+        "sub": verification.user_id,
+        "jti": verification.id,
+        "iat": _timestamp(now),
+        "verification_type": verification.verification_type,
+        "verifier_id": verification.verifier_id,
+        "credential_status": {"status_list": STATUS_LIST_PATH, "status_index": verification.status_index},
+    }
+    if verification.expires_at:
+        claims["exp"] = _timestamp(verification.expires_at)
+    verification.credential = jwt.encode(
+        claims, issuer_keys.signing_key, algorithm="EdDSA", headers={"kid": issuer_keys.kid}
+    )
+    return verification.credential
+
+
+def _verify_chunk(items):
+    results = []
+    for token, key in items:
+        if key is None:
+            results.append({"valid": False, "error": "未知的签发密钥"})
+            continue
+        try:
+            claims = jwt.decode(
+                token, key, algorithms=["EdDSA"], issuer=CREDENTIAL_ISSUER,
+                options={"require": ["iss", "sub", "jti"]}
+            )
+        except jwt.ExpiredSignatureError:
+            results.append({"valid": False, "error": "凭证已过期"})
+            continue
+        except jwt.PyJWTError as e:
+            results.append({"valid": False, "error": f"签名无效: {e}"})
+            continue
+        results.append({"valid": True, "error": None, "claims": claims})
+    return results
+
+
+_executor = ThreadPoolExecutor(max_workers=CREDENTIAL_VERIFY_WORKERS, thread_name_prefix="credential-verify")
+
+
+def load_status_bitmap(db):
+    """读取已发布的状态位图，尚未发布时返回 None"""
+    status_list = db.get(CredentialStatusList, STATUS_LIST_ID)
+    if status_list is None or status_list.encoded is None:
+        return None
+    return gzip.decompress(status_list.encoded)
+
+
+def verify_credentials(db, tokens, check_status=True):
+    """批量验证链下凭证
+
+    先用一次查询取得所有 kid 对应的公钥（大多命中缓存），然后把签名验证分块并行执行；
+    check_status 为真时再对照已发布的状态位图检查撤销。整个过程不访问区块链。
+    位图按 STATUS_LIST_PUBLISH_INTERVAL 定期发布，撤销在下一次发布后生效。
+
+    Args:
+        db: 数据库会话
+        tokens: 凭证列表
+        check_status: 是否检查状态位图
+
+    Returns:
+        list: 与输入顺序一致的结果，每项包含 valid、error，有效时包含凭证内容
+    """
+    kids = []
+    for token in tokens:
+        try:
+            kids.append(jwt.get_unverified_header(token).get("kid"))
+        except jwt.PyJWTError:
+            kids.append(None)
+    keys = issuer_keys.public_keys(db, {kid for kid in kids if kid})
+    items = [(token, keys.get(kid)) for token, kid in zip(tokens, kids)]
+
+    chunks = [items[i:i + CREDENTIAL_VERIFY_CHUNK] for i in range(0, len(items), CREDENTIAL_VERIFY_CHUNK)]
+    results = [result for chunk in _executor.map(_verify_chunk, chunks) for result in chunk]
+
+    bitmap = load_status_bitmap(db) if check_status else None
+    for result in results:
+        claims = result.pop("claims", None)
+        if claims is None:
+            continue
+        index = (claims.get("credential_status") or {}).get("status_index")
+        if check_status and index is not None:
+            if bitmap is None or index >= len(bitmap) * 8:
+                result.update(valid=False, error="无法确认凭证状态")
+            elif bit_is_set(bitmap, index):
+                result.update(valid=False, error="凭证已撤销")
+        result.update(
+            verification_id=claims["jti"],
+            user_id=claims["sub"],
+            verification_type=claims.get("verification_type"),
+            verifier_id=claims.get("verifier_id"),
+            status_index=index,
+            expires_at=datetime.utcfromtimestamp(claims["exp"]) if "exp" in claims else None,
+        )
+    return results
@@ -0,0 +1,171 @@
+# app/core/document_store.py
+import hashlib
+import os
+import tempfile
+from starlette.concurrency import run_in_threadpool
+import multipart
+from multipart.multipart import parse_options_header
+
+# 文档内容存储目录
+DOCUMENT_STORE_PATH = os.getenv("DOCUMENT_STORE_PATH", "./document_store")
+# 单个文档的最大字节数
+MAX_DOCUMENT_SIZE = int(os.getenv("MAX_DOCUMENT_SIZE", str(512 * 1024 * 1024)))
+# 普通表单字段的最大字节数
+MAX_FORM_FIELD_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """上传内容不合法"""
+
+
+class DocumentTooLarge(UploadError):
+    """文档超过大小限制"""
+
+
+class StoreWriter:
+    """向内容寻址存储写入一个文档，写入的同时增量计算SHA-256"""
+
+    def __init__(self, store, max_size):
+        self.store = store
+        self.max_size = max_size
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+        os.makedirs(store.tmp_dir, exist_ok=True)
+        self._file = tempfile.NamedTemporaryFile(dir=store.tmp_dir, delete=False)
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        if self.size > self.max_size:
+            raise DocumentTooLarge(f"文档超过最大限制 {self.max_size} 字节")
+        self._sha256.update(chunk)
+        self._file.write(chunk)
+
+    def commit(self):
+        """完成写入并移动到以哈希命名的位置
+
+        Returns:
+            tuple: (SHA-256十六进制摘要, 字节数, 内容是否已存在)
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        digest = self._sha256.hexdigest()
+        final_path = self.store.path_for(digest)
+        if os.path.exists(final_path):
+            # 相同内容已存在，只保留一份
+            os.remove(self._file.name)
+            return digest, self.size, True
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(self._file.name, final_path)
+        return digest, self.size, False
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self._file.name):
+            os.remove(self._file.name)
+
+
+class ContentAddressedStore:
+    """按SHA-256摘要存放文档内容的本地存储"""
+
+    def __init__(self, root):
+        self.root = root
+
+    @property
+    def tmp_dir(self):
+        return os.path.join(self.root, "tmp")
+
+    def path_for(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest):
+        return os.path.exists(self.path_for(digest))
+
+    def open_writer(self, max_size=MAX_DOCUMENT_SIZE):
+        return StoreWriter(self, max_size)
+
+
+async def receive_multipart_upload(request, store, file_field="file"):
+    """流式解析multipart请求
+
+    文件部分边接收边写入存储，内存占用只与网络分块大小有关；
+    其他表单字段保存在内存中并限制长度。
+
+    Returns:
+        tuple: (表单字段字典, (摘要, 字节数, 内容是否已存在))
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise UploadError("请求必须是multipart/form-data格式")
+
+    fields = {}
+    state = {"name": None, "is_file": False, "header_field": b"", "header_value": b"", "headers": {}, "value": b""}
+    pending = []
+    file_received = False
+
+    def on_part_begin():
+        state.update(name=None, is_file=False, headers={}, value=b"")
+
+    def on_header_field(data, start, end):
+        state["header_field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["header_value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["header_field"].lower()] = state["header_value"]
+        state["header_field"] = b""
+        state["header_value"] = b""
+
+    def on_headers_finished():
+        _, options = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        state["name"] = options.get(b"name", b"").decode("utf-8")
+        state["is_file"] = state["name"] == file_field
+
+    def on_part_data(data, start, end):
+        if state["is_file"]:
+            pending.append(bytes(data[start:end]))
+        else:
+            state["value"] += data[start:end]
+            if len(state["value"]) > MAX_FORM_FIELD_SIZE:
+                raise UploadError(f"表单字段 {state['name']} 过长")
+
+    def on_part_end():
+        nonlocal file_received
+        if state["is_file"]:
+            file_received = True
+        elif state["name"]:
+            fields[state["name"]] = state["value"].decode("utf-8")
+
+    parser = multipart.MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    writer = store.open_writer()
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if pending:
+                data = b"".join(pending)
+                pending.clear()
+                # 文件写入放到线程池，避免阻塞事件循环
+                await run_in_threadpool(writer.write, data)
+        parser.finalize()
+        if not file_received:
+            raise UploadError(f"缺少文件字段 {file_field}")
+        result = await run_in_threadpool(writer.commit)
+    except Exception:
+        await run_in_threadpool(writer.abort)
+        raise
+    return fields, result
+
+
+# 进程内共享的文档存储
+document_store = ContentAddressedStore(DOCUMENT_STORE_PATH)
@@ -0,0 +1,140 @@
+# app/core/events.py
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+
+# 每个订阅者最多缓存的未发送事件数，超过后断开该订阅，由客户端凭事件ID续传
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+
+class Event:
+    """一条验证状态变更事件"""
+
+    def __init__(self, event_id, event_type, data, user_id=None, verifier_id=None):
+        self.id = event_id
+        self.type = event_type
+        self.data = data
+        self.user_id = user_id
+        self.verifier_id = verifier_id
+        self.timestamp = time.time()
+
+    def to_sse(self):
+        """格式化为 Server-Sent Events 消息"""
+        payload = json.dumps(self.data, ensure_ascii=False, default=str)
+        return f"id: {self.id}\nevent: {self.type}\ndata: {payload}\n\n"
+
+
+class Subscription:
+    """事件订阅，事件通过事件循环线程安全地投递到 asyncio 队列"""
+
+    def __init__(self, matcher, loop):
+        self.matcher = matcher
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.closed = False
+
+    def deliver(self, event):
+        """从任意线程投递事件"""
+        if self.closed or not self.matcher(event):
+            return
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # 事件循环已关闭
+            self.closed = True
+
+    def _put(self, event):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # 消费过慢：清空队列并放入结束标记，客户端重连后从最后的事件ID续传
+            self.closed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class EventBus:
+    """进程内发布/订阅总线，保留最近的事件以支持断线续传"""
+
+    def __init__(self, history_size=10000):
+        self._history = deque(maxlen=history_size)
+        self._subscribers = set()
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def publish(self, event_type, data, user_id=None, verifier_id=None):
+        """发布事件，可以在任意线程调用
+
+        Returns:
+            Event: 已发布的事件
+        """
+        with self._lock:
+            event = Event(self._next_id, event_type, data, user_id=user_id, verifier_id=verifier_id)
+            self._next_id += 1
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.deliver(event)
+        return event
+
+    def subscribe(self, matcher, last_event_id=None):
+        """订阅事件
+
+        Args:
+            matcher: 判断事件是否发送给该订阅者的函数
+            last_event_id: 客户端已收到的最后一个事件ID，用于续传
+
+        Returns:
+            tuple: (订阅对象, 需要补发的历史事件列表, 历史是否有缺口)
+        """
+        subscription = Subscription(matcher, asyncio.get_running_loop())
+        with self._lock:
+            backlog = []
+            gap = False
+            if last_event_id is not None:
+                oldest = self._history[0].id if self._history else self._next_id
+                # 请求续传的事件已被淘汰，客户端需要重新拉取完整状态
+                gap = last_event_id + 1 < oldest or last_event_id >= self._next_id
+                backlog = [e for e in self._history if e.id > last_event_id and matcher(e)]
+            self._subscribers.add(subscription)
+        return subscription, backlog, gap
+
+    def unsubscribe(self, subscription):
+        subscription.closed = True
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def last_event_id(self):
+        return self._next_id - 1
+
+
+def verification_event_data(verification):
+    """从验证记录生成事件数据"""
+    return {
+        "verification_id": verification.id,
+        "user_id": verification.user_id,
+        "verifier_id": verification.verifier_id,
+        "verification_type": verification.verification_type,
+        "status": verification.status,
+        "transaction_hash": verification.transaction_hash,
+    }
+
+
+def publish_verification_event(event_type, verification):
+    """发布验证记录相关事件"""
+    return event_bus.publish(
+        event_type,
+        verification_event_data(verification),
+        user_id=verification.user_id,
+        verifier_id=verification.verifier_id,
+    )
+
+
+# 进程内共享的事件总线
+event_bus = EventBus()
@@ -0,0 +1,210 @@
+# app/core/expiry.py
+import os
+import threading
+from datetime import datetime
+from types import SimpleNamespace
+
+from sqlalchemy import select, update
+
+from ..models.models import User, Verification
+from .analytics import CounterDeltas
+from .blockchain import PRIORITY_BULK, REVOKE_CREDENTIAL_GAS
+from .events import event_bus, verification_event_data
+from .logger import get_logger
+from .reuse import not_expired
+
+logger = get_logger(__name__)
+
+# 两轮清理之间的间隔（秒）
+EXPIRY_SWEEP_INTERVAL = float(os.getenv("EXPIRY_SWEEP_INTERVAL", "300"))
+# 每批处理的过期验证数，也是每笔链上撤销批量的上限
+EXPIRY_BATCH_SIZE = int(os.getenv("EXPIRY_BATCH_SIZE", "500"))
+EXPIRY_SWEEPER_ENABLED = os.getenv("EXPIRY_SWEEPER_ENABLED", "true").lower() == "true"
+
+
+def sweep_expired(db, manager=None, now=None, batch_size=EXPIRY_BATCH_SIZE, max_batches=None):
+    """把到期的已批准验证标记为 expired，并批量撤销对应的链上凭证
+
+    每批按过期时间顺序领取一批到期的验证（PostgreSQL 上用 SKIP LOCKED，与正在修改这些行的请求
+    互不等待），在一个事务中更新状态、统计计数和用户的已验证标记。
+    同一用户同一类型的凭证在链上共用一个ID，仍有有效批准的凭证不撤销。
+
+    Args:
+        db: 数据库会话
+        manager: BlockchainManager，为 None 时只更新数据库
+        now: 当前时间（UTC），便于测试
+        batch_size: 每批行数
+        max_batches: 最多处理的批数，None 表示直到没有到期的验证
+
+    Returns:
+        int: 标记为过期的验证数
+    """
+    now = now or datetime.utcnow()
+    table = Verification.__table__
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        rows = db.execute(
+            select(
+                table.c.id, table.c.user_id, table.c.verifier_id,
+                table.c.verification_type, table.c.transaction_hash
+            ).where(
+                table.c.status == "approved",
+                table.c.expires_at <= now
+            ).order_by(table.c.expires_at).limit(batch_size).with_for_update(skip_locked=True)
+        ).all()
+        if not rows:
+            break
+        expired = [SimpleNamespace(**row._mapping, status="expired") for row in rows]
+
+        # 同时递增行版本号，使缓存的ETag失效
+        db.execute(
+            update(table).where(
+                table.c.id.in_([v.id for v in expired]),
+                table.c.status == "approved"
+            ).values(
+                status="expired",
+                version_id=table.c.version_id + 1
+            ).execution_options(synchronize_session=False)
+        )
+        deltas = CounterDeltas(now)
+        for verification in expired:
+            deltas.status_changed(verification, "approved")
+        deltas.apply(db)
+
+        user_ids = {v.user_id for v in expired}
+        still_valid = set(db.query(Verification.user_id, Verification.verification_type).filter(
+            Verification.user_id.in_(user_ids),
+            Verification.status == "approved",
+            not_expired(now)
+        ).distinct())
+        unverified = user_ids - {user_id for user_id, _ in still_valid}
+        if unverified:
+            db.execute(
+                update(User.__table__).where(
+                    User.__table__.c.id.in_(unverified),
+                    User.__table__.c.is_verified.is_(True)
+                ).values(
+                    is_verified=False,
+                    version_id=User.__table__.c.version_id + 1
+                ).execution_options(synchronize_session=False)
+            )
+        owners = dict(db.query(User.id, User.blockchain_address).filter(User.id.in_(user_ids)))
+        db.commit()
+
+        for verification in expired:
+            event_bus.publish(
+                "verification.expired",
+                verification_event_data(verification),
+                user_id=verification.user_id,
+                verifier_id=verification.verifier_id,
+            )
+
+        credentials = {}
+        for verification in expired:
+            key = (verification.user_id, verification.verification_type)
+            if not verification.transaction_hash or not owners.get(verification.user_id) or key in still_valid:
+                continue
+            credentials[key] = {
+                "owner": owners[verification.user_id],
+                "user_id": verification.user_id,
+                "verification_type": verification.verification_type,
+            }
+        if manager is not None and credentials:
+            _submit_revocations(manager, list(credentials.values()))
+
+        total += len(expired)
+        batches += 1
+        if len(rows) < batch_size:
+            break
+    if total:
+        logger.info("标记过期验证", extra={"expired": total})
+    return total
+
+
+def _submit_revocations(manager, credentials):
+    """以低优先级排队撤销一批链上凭证"""
+    future = manager.submit_transaction(
+        PRIORITY_BULK, "revoke_credentials_batch", credentials,
+        gas=REVOKE_CREDENTIAL_GAS * len(credentials), tx_count=len(credentials)
+    )
+
+    def _log_result(f):
+        try:
+            results = f.result()
+        except Exception:
+            logger.exception("批量撤销凭证失败", extra={"credentials": len(credentials)})
+            return
+        for credential, result in zip(credentials, results):
+            if result["error"]:
+                logger.error(
+                    "撤销凭证失败: %s", result["error"],
+                    extra={"user_id": credential["user_id"], "verification_type": credential["verification_type"]}
+                )
+
+    future.add_done_callback(_log_result)
+    return future
+
+
+class ExpirySweeper:
+    """定期清理到期验证的后台线程"""
+
+    def __init__(self, session_factory, manager=None, interval=EXPIRY_SWEEP_INTERVAL):
+        self.session_factory = session_factory
+        self.manager = manager
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """启动后台清理线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="expiry-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("清理过期验证出错")
+            self._stop.wait(self.interval)
+
+    def run_once(self, now=None):
+        """执行一轮清理
+
+        Returns:
+            int: 本轮标记为过期的验证数
+        """
+        db = self.session_factory()
+        try:
+            return sweep_expired(db, self.manager, now=now)
+        finally:
+            db.close()
+
+
+# 进程内的过期清理线程，由应用启动时启动
+sweeper = None
+
+
+def start_sweeper(session_factory, manager=None):
+    """启动进程内的过期清理线程"""
+    global sweeper
+    if sweeper is None:
+        sweeper = ExpirySweeper(session_factory, manager)
+        sweeper.start()
+    return sweeper
+
+
+def stop_sweeper():
+    global sweeper
+    if sweeper is not None:
+        sweeper.stop()
+        sweeper = None
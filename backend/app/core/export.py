@@ -0,0 +1,129 @@
+# app/core/export.py
+import csv
+import io
+import json
+import os
+import zlib
+from datetime import date, datetime
+
+from sqlalchemy import exists, select
+from sqlalchemy.orm import Session
+
+from ..models.models import Document, Verification
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# 服务端游标每批读取的行数，也是每次输出的行数
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+# gzip 压缩级别；导出以吞吐为先，默认使用最快的级别
+EXPORT_GZIP_LEVEL = int(os.getenv("EXPORT_GZIP_LEVEL", "1"))
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# 领取租约等内部字段不导出
+VERIFICATION_EXPORT_COLUMNS = [
+    c for c in Verification.__table__.columns if c.name not in ("leased_by", "lease_id", "lease_expires_at")
+]
+DOCUMENT_EXPORT_COLUMNS = list(Document.__table__.columns)
+
+
+def verification_export_query(verifier_id=None, start=None, end=None):
+    """按验证者和验证日期范围导出验证记录
+
+    不排序：有序导出需要对整个结果排序，首字节要等到排序完成。
+    """
+    query = select(*VERIFICATION_EXPORT_COLUMNS)
+    if verifier_id:
+        query = query.where(Verification.verifier_id == verifier_id)
+    if start:
+        query = query.where(Verification.verification_date >= start)
+    if end:
+        query = query.where(Verification.verification_date < end)
+    return query
+
+
+def document_export_query(verifier_id=None, start=None, end=None):
+    """按上传时间范围导出文档；指定验证者时只导出该验证者验证过的用户的文档"""
+    query = select(*DOCUMENT_EXPORT_COLUMNS)
+    if verifier_id:
+        query = query.where(exists().where(
+            Verification.user_id == Document.user_id,
+            Verification.verifier_id == verifier_id
+        ))
+    if start:
+        query = query.where(Document.uploaded_at >= start)
+    if end:
+        query = query.where(Document.uploaded_at < end)
+    return query
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _encode_batch(rows, names, fmt):
+    if fmt == "ndjson":
+        return "".join(
+            json.dumps(dict(zip(names, row)), ensure_ascii=False, default=_json_default, separators=(",", ":")) + "\n"
+            for row in rows
+        ).encode("utf-8")
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([_csv_value(value) for value in row] for row in rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def stream_export(bind, query, fmt="ndjson", compress=False, batch_size=EXPORT_BATCH_SIZE):
+    """逐批读取查询结果并编码输出
+
+    在独立的会话中使用服务端游标（stream_results）按批读取，内存占用只与批大小有关。
+    压缩时使用 gzip 格式的流式压缩，输出可直接保存为 .gz 文件。
+
+    Args:
+        bind: 数据库引擎或连接
+        query: 导出查询
+        fmt: ndjson 或 csv
+        compress: 是否gzip压缩
+        batch_size: 每批行数
+
+    Yields:
+        bytes: 编码（和压缩）后的数据块
+    """
+    names = [column.name for column in query.selected_columns]
+    compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31) if compress else None
+    total = 0
+
+    def emit(chunk):
+        return compressor.compress(chunk) if compressor else chunk
+
+    db = Session(bind=bind)
+    try:
+        if fmt == "csv":
+            buffer = io.StringIO()
+            csv.writer(buffer).writerow(names)
+            yield emit(buffer.getvalue().encode("utf-8"))
+        result = db.execute(query.execution_options(stream_results=True, yield_per=batch_size))
+        for rows in result.partitions():
+            total += len(rows)
+            chunk = emit(_encode_batch(rows, names, fmt))
+            if chunk:
+                yield chunk
+        if compressor:
+            yield compressor.flush()
+    finally:
+        db.close()
+        logger.info("导出完成", extra={"rows": total, "format": fmt, "compressed": compress})
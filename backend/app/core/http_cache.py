@@ -0,0 +1,93 @@
+# app/core/http_cache.py
+import hashlib
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Response
+
+
+def make_etag(*parts):
+    """根据行版本号等组成部分生成强ETag"""
+    digest = hashlib.sha256("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _as_utc(dt):
+    """数据库中的时间可能不带时区（SQLite），统一视为UTC"""
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def http_date(dt):
+    """格式化为HTTP日期（Last-Modified使用）"""
+    dt = _as_utc(dt)
+    return format_datetime(dt.replace(microsecond=0), usegmt=True) if dt else None
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match 使用弱比较，忽略 W/ 前缀"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def cache_headers(etag, last_modified=None, private=True, max_age=None):
+    """生成条件请求相关的响应头
+
+    max_age 只用于公共资源：在有效期内共享缓存和客户端可直接使用，过期后再用ETag重新验证。
+    """
+    if private:
+        # 允许缓存存储，但每次使用前都需要用ETag重新验证
+        cache_control = "private, no-cache"
+    else:
+        cache_control = f"public, max-age={int(max_age)}" if max_age else "no-cache"
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+    }
+    if private:
+        headers["Vary"] = "Authorization"
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def check_not_modified(request, etag, last_modified=None, private=True, max_age=None):
+    """处理条件GET请求
+
+    If-None-Match 优先；没有时才使用 If-Modified-Since。
+
+    Returns:
+        Response: 资源未修改时返回304响应，否则返回 None
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        not_modified = etag_matches(if_none_match, etag)
+    else:
+        not_modified = False
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and last_modified is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+                not_modified = _as_utc(last_modified).replace(microsecond=0) <= _as_utc(since)
+            except (TypeError, ValueError):
+                not_modified = False
+    if not_modified:
+        return Response(status_code=304, headers=cache_headers(etag, last_modified, private, max_age))
+    return None
+
+
+def set_cache_headers(response, etag, last_modified=None, private=True, max_age=None):
+    """在正常响应上设置ETag和Last-Modified"""
+    for name, value in cache_headers(etag, last_modified, private, max_age).items():
+        response.headers[name] = value
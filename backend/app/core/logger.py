@@ -0,0 +1,189 @@
+# app/core/logger.py
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# 应用日志的根记录器名称
+ROOT_LOGGER_NAME = "app"
+# 默认日志级别
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# 按模块设置的日志级别，例如 "app.core.blockchain=DEBUG,app.api=WARNING"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# 输出格式：json 或 text
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+# 日志队列容量，队列满时丢弃新日志而不是阻塞请求
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# 重复错误采样：每个时间窗口内同一错误最多输出的条数
+LOG_ERROR_SAMPLE_WINDOW = float(os.getenv("LOG_ERROR_SAMPLE_WINDOW", "60"))
+LOG_ERROR_SAMPLE_BURST = int(os.getenv("LOG_ERROR_SAMPLE_BURST", "5"))
+
+# LogRecord 自带的属性，其余属性视为结构化字段
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """把日志记录格式化为单行JSON"""
+
+    def format(self, record):
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ErrorSampler(logging.Filter):
+    """对重复出现的警告和错误采样
+
+    同一记录器、同一消息模板和异常类型在一个时间窗口内最多放行 burst 条，
+    之后的记录被丢弃；下一个窗口放行的第一条记录带上被丢弃的条数。
+    """
+
+    def __init__(self, window=LOG_ERROR_SAMPLE_WINDOW, burst=LOG_ERROR_SAMPLE_BURST):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING or self.burst <= 0:
+            return True
+        exc_type = record.exc_info[0].__name__ if record.exc_info and record.exc_info[0] else None
+        key = (record.name, record.msg if isinstance(record.msg, str) else repr(record.msg), exc_type)
+        now = time.monotonic()
+        with self._lock:
+            window_start, count, suppressed = self._seen.get(key, (now, 0, 0))
+            if now - window_start >= self.window:
+                window_start, count = now, 0
+            if count >= self.burst:
+                self._seen[key] = (window_start, count, suppressed + 1)
+                return False
+            self._seen[key] = (window_start, count + 1, 0)
+        if suppressed:
+            record.suppressed_repeats = suppressed
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """把日志放入队列，由后台线程写出
+
+    调用线程只负责渲染消息和异常文本，不做任何I/O；队列满时丢弃日志。
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def parse_levels(spec):
+    """解析 "模块=级别" 逗号分隔的配置"""
+    levels = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        name, level = item.split("=", 1)
+        name, level = name.strip(), level.strip().upper()
+        if name and isinstance(logging.getLevelName(level), int):
+            levels[name] = level
+    return levels
+
+
+_listener = None
+_handler = None
+_setup_lock = threading.Lock()
+
+
+def setup_logging(level=LOG_LEVEL, levels=LOG_LEVELS, log_format=LOG_FORMAT, stream=None):
+    """配置应用日志（只配置一次）
+
+    Returns:
+        NonBlockingQueueHandler: 应用记录器使用的队列处理器
+    """
+    global _listener, _handler
+    with _setup_lock:
+        if _handler is not None:
+            return _handler
+
+        output = logging.StreamHandler(stream or sys.stdout)
+        if log_format == "json":
+            output.setFormatter(JsonFormatter())
+        else:
+            output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        handler = NonBlockingQueueHandler(log_queue)
+        handler.addFilter(ErrorSampler())
+
+        root = logging.getLogger(ROOT_LOGGER_NAME)
+        root.handlers = [handler]
+        root.setLevel(level)
+        root.propagate = False
+        for name, module_level in parse_levels(levels).items():
+            logging.getLogger(name).setLevel(module_level)
+
+        _listener = QueueListener(log_queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        _handler = handler
+        return handler
+
+
+def shutdown_logging():
+    """停止后台写日志线程，写出队列中剩余的日志"""
+    global _listener, _handler
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+        if _handler is not None:
+            logging.getLogger(ROOT_LOGGER_NAME).removeHandler(_handler)
+            _handler = None
+
+
+def get_logger(name):
+    """获取模块的记录器
+
+    模块无论以 backend.app.xxx 还是 app.xxx 导入，都统一为 app.xxx，
+    便于按模块配置级别。
+    """
+    setup_logging()
+    if name.startswith("backend."):
+        name = name[len("backend."):]
+    if name != ROOT_LOGGER_NAME and not name.startswith(ROOT_LOGGER_NAME + "."):
+        name = f"{ROOT_LOGGER_NAME}.{name}"
+    return logging.getLogger(name)
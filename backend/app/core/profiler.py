@@ -0,0 +1,246 @@
+# app/core/profiler.py
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# 采样间隔（秒）
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+# 启动时即开始采样的路由处理函数，逗号分隔，例如 "register_user,update_verification_status"
+PROFILE_ROUTES = os.getenv("PROFILE_ROUTES", "")
+# 火焰图文件输出目录
+PROFILE_OUTPUT_DIR = os.getenv("PROFILE_OUTPUT_DIR", "./profiles")
+# 通过管理接口开启时的最长采样时间（秒）
+PROFILE_MAX_DURATION = float(os.getenv("PROFILE_MAX_DURATION", "600"))
+# 单个路由最多保留的不同调用栈数量，超过后新栈计入 [truncated]
+PROFILE_MAX_STACKS = int(os.getenv("PROFILE_MAX_STACKS", "20000"))
+
+
+def _frame_label(code):
+    # 火焰图工具以分号分隔栈帧，名称中不能出现分号
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+class SamplingProfiler:
+    """按路由聚合调用栈的统计采样器
+
+    后台线程定期读取所有线程的当前栈，栈中包含被采样路由处理函数的帧时，
+    把从该帧到栈顶的部分计入该路由。没有开启任何路由时后台线程不运行，
+    未被采样的请求没有任何额外开销。
+    """
+
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self._codes = {}  # 处理函数代码对象 -> 路由名
+        self._enabled = {}  # 路由名 -> 截止时间（None 表示不限）
+        self._request_scoped = Counter()  # 路由名 -> 按请求开启的计数
+        self._stacks = {}  # 路由名 -> Counter(折叠栈 -> 采样数)
+        self._samples = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def register_endpoints(self, routes):
+        """登记可采样的路由处理函数"""
+        for route in routes:
+            endpoint = getattr(route, "endpoint", None)
+            code = getattr(endpoint, "__code__", None)
+            if code is not None:
+                self._codes[code] = endpoint.__name__
+
+    def available_endpoints(self):
+        return sorted(set(self._codes.values()))
+
+    def _check(self, names):
+        unknown = set(names) - set(self._codes.values())
+        if unknown:
+            raise ValueError(f"未知的路由: {', '.join(sorted(unknown))}")
+
+    def enable(self, names, duration=None):
+        """开启指定路由的采样
+
+        Args:
+            names: 路由处理函数名列表
+            duration: 采样时长（秒），None 表示直到关闭
+        """
+        self._check(names)
+        deadline = time.monotonic() + duration if duration else None
+        with self._lock:
+            for name in names:
+                self._enabled[name] = deadline
+        self._ensure_running()
+
+    def disable(self, names=None):
+        """关闭指定路由的采样，names 为空时全部关闭"""
+        with self._lock:
+            for name in list(names or self._enabled):
+                self._enabled.pop(name, None)
+
+    def activate(self, name):
+        """为单个请求开启所在路由的采样，需与 deactivate 成对调用"""
+        with self._lock:
+            self._request_scoped[name] += 1
+        self._ensure_running()
+
+    def deactivate(self, name):
+        with self._lock:
+            self._request_scoped[name] -= 1
+            if self._request_scoped[name] <= 0:
+                del self._request_scoped[name]
+
+    def active_endpoints(self):
+        now = time.monotonic()
+        with self._lock:
+            for name, deadline in list(self._enabled.items()):
+                if deadline is not None and deadline <= now:
+                    del self._enabled[name]
+            return set(self._enabled) | set(self._request_scoped)
+
+    def _ensure_running(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            active = self.active_endpoints()
+            if not active:
+                with self._lock:
+                    # 没有需要采样的路由时退出，下次开启时重新启动
+                    if not self._enabled and not self._request_scoped:
+                        self._thread = None
+                        return
+                time.sleep(self.interval)
+                continue
+            self.sample(active)
+            time.sleep(self.interval)
+
+    def sample(self, active):
+        """采集一次所有线程的栈"""
+        own = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            labels = []
+            endpoint = None
+            while frame is not None:
+                code = frame.f_code
+                labels.append(_frame_label(code))
+                name = self._codes.get(code)
+                if name is not None and name in active:
+                    endpoint = name
+                    break
+                frame = frame.f_back
+            if endpoint is None:
+                continue
+            stack = ";".join(reversed(labels))
+            with self._lock:
+                stacks = self._stacks.setdefault(endpoint, Counter())
+                if stack not in stacks and len(stacks) >= PROFILE_MAX_STACKS:
+                    stack = f"{labels[-1]};[truncated]"
+                stacks[stack] += 1
+                self._samples[endpoint] += 1
+
+    def collapsed(self, name):
+        """返回路由的折叠栈文本（flamegraph.pl / speedscope 可直接读取）"""
+        with self._lock:
+            stacks = dict(self._stacks.get(name, {}))
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+
+    def reset(self, names=None):
+        with self._lock:
+            for name in list(names or self._stacks):
+                self._stacks.pop(name, None)
+                self._samples.pop(name, None)
+
+    def status(self):
+        active = self.active_endpoints()
+        with self._lock:
+            return {
+                "interval_seconds": self.interval,
+                "available": self.available_endpoints(),
+                "enabled": sorted(self._enabled),
+                "request_scoped": sorted(self._request_scoped),
+                "running": bool(active),
+                "samples": dict(self._samples),
+            }
+
+    def write_flamegraphs(self, directory=PROFILE_OUTPUT_DIR, names=None):
+        """把各路由的折叠栈写入文件
+
+        Returns:
+            list: 写入的文件路径
+        """
+        os.makedirs(directory, exist_ok=True)
+        timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        paths = []
+        for name in sorted(names or list(self._stacks)):
+            content = self.collapsed(name)
+            if not content:
+                continue
+            path = os.path.join(directory, f"{name}-{timestamp}.collapsed")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content)
+            paths.append(path)
+        logger.info("写出火焰图文件", extra={"paths": paths})
+        return paths
+
+
+class ProfilerMiddleware:
+    """ASGI中间件：请求携带 x-profile 和有效的 admin-token 时，对该请求所在路由采样"""
+
+    def __init__(self, app, profiler, token_checker):
+        self.app = app
+        self.profiler = profiler
+        self.token_checker = token_checker
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers", []))
+        if not headers.get(b"x-profile") or not self.token_checker(headers.get(b"admin-token", b"").decode("latin-1")):
+            await self.app(scope, receive, send)
+            return
+
+        name = self._match_endpoint(scope)
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+        self.profiler.activate(name)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.profiler.deactivate(name)
+
+    def _match_endpoint(self, scope):
+        # 只在请求显式要求采样时才做路由匹配
+        from starlette.routing import Match
+        app = scope.get("app")
+        for route in getattr(app, "routes", []):
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route.endpoint, "__name__", None)
+        return None
+
+
+# 进程内共享的采样器
+profiler = SamplingProfiler()
+
+
+def configure_from_env(routes):
+    """登记应用路由，并开启 PROFILE_ROUTES 中配置的路由"""
+    profiler.register_endpoints(routes)
+    names = [name.strip() for name in PROFILE_ROUTES.split(",") if name.strip()]
+    if names:
+        try:
+            profiler.enable(names)
+        except ValueError as e:
+            logger.warning("PROFILE_ROUTES 配置无效: %s", e)
@@ -0,0 +1,65 @@
+# app/core/reuse.py
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_
+
+from ..models.models import Document, Verification
+from .blockchain import CREDENTIAL_VALIDITY_DAYS
+
+
+def validity_cutoff(now=None):
+    """早于该时间批准的验证视为已过期"""
+    now = now or datetime.utcnow()
+    return now - timedelta(days=CREDENTIAL_VALIDITY_DAYS)
+
+
+def expires_at(verification):
+    """已批准验证的过期时间；早于过期时间列的记录按验证日期推算"""
+    if verification.expires_at:
+        return verification.expires_at
+    if not verification.verification_date:
+        return None
+    return verification.verification_date.replace(tzinfo=None) + timedelta(days=CREDENTIAL_VALIDITY_DAYS)
+
+
+def not_expired(now=None):
+    """未过期的条件：有过期时间的按过期时间判断，没有的按验证日期推算"""
+    now = now or datetime.utcnow()
+    return or_(
+        Verification.expires_at > now,
+        and_(Verification.expires_at.is_(None), Verification.verification_date >= validity_cutoff(now))
+    )
+
+
+def find_reusable_for_user(db, user_id, verification_type, exclude_verifier_id=None, now=None):
+    """查找用户在任意机构已批准且未过期的验证
+
+    使用 ix_verifications_reuse 索引的一次查询，最新的排在前面。
+    """
+    query = db.query(Verification).filter(
+        Verification.user_id == user_id,
+        Verification.verification_type == verification_type,
+        Verification.status == "approved",
+        not_expired(now)
+    )
+    if exclude_verifier_id:
+        query = query.filter(Verification.verifier_id != exclude_verifier_id)
+    return query.order_by(Verification.verification_date.desc()).all()
+
+
+def find_reusable_by_document_hash(db, document_hash, verification_type=None, exclude_verifier_id=None, now=None):
+    """通过文档哈希查找持有该文档的用户已批准且未过期的验证
+
+    文档哈希和验证记录都走索引，在一次连接查询中完成。
+    """
+    query = db.query(Verification).join(
+        Document, Document.user_id == Verification.user_id
+    ).filter(
+        Document.document_hash == document_hash,
+        Verification.status == "approved",
+        not_expired(now)
+    )
+    if verification_type:
+        query = query.filter(Verification.verification_type == verification_type)
+    if exclude_verifier_id:
+        query = query.filter(Verification.verifier_id != exclude_verifier_id)
+    return query.distinct().order_by(Verification.verification_date.desc()).all()
@@ -0,0 +1,483 @@
+# app/core/signer.py
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, case, func, or_, select
+from sqlalchemy.exc import IntegrityError
+
+from ..models.models import ChainWriteRequest, SignerLease
+from . import blockchain
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# 多副本部署时开启：链上写操作经数据库交给持有租约的副本签名发送
+SIGNER_COORDINATION = os.getenv("SIGNER_COORDINATION", "false").lower() == "true"
+# 本副本的标识，默认使用主机名和进程号
+REPLICA_ID = os.getenv("REPLICA_ID") or f"{socket.gethostname()}-{os.getpid()}"
+# 签名租约时长（秒），持有者在此时间内未续约时其他副本接管
+SIGNER_LEASE_SECONDS = float(os.getenv("SIGNER_LEASE_SECONDS", "15"))
+# 轮询写请求和结果的间隔（秒）
+SIGNER_POLL_INTERVAL = float(os.getenv("SIGNER_POLL_INTERVAL", "0.2"))
+# 等待签名副本返回结果的最长时间（秒）
+CHAIN_WRITE_TIMEOUT = float(os.getenv("CHAIN_WRITE_TIMEOUT", "300"))
+# 换主后重新执行的最多次数，超过后标记为失败
+CHAIN_WRITE_MAX_ATTEMPTS = int(os.getenv("CHAIN_WRITE_MAX_ATTEMPTS", "3"))
+# 签名副本同时交给交易调度器的最多请求数
+CHAIN_WRITE_MAX_IN_FLIGHT = int(os.getenv("CHAIN_WRITE_MAX_IN_FLIGHT", "100"))
+
+# 共享管理员账户的租约名
+ADMIN_SIGNER = "admin"
+# 换主时即使旧签名副本可能已经发送也可以重新执行的方法：合约拒绝重复的身份注册。
+# 凭证颁发、撤销和存证会覆盖链上记录，不在此列
+REPLAYABLE_METHODS = {"register_identity"}
+
+
+class ChainWriteError(Exception):
+    """签名副本执行链上写操作失败"""
+
+
+class LeaseLostError(Exception):
+    """执行前发现签名租约已失去，请求留给新的签名副本"""
+
+
+class LeaderLease:
+    """基于数据库行的签名租约
+
+    获取和续约都是一条带条件的 UPDATE：只有租约由自己持有或已过期时才会成功，
+    换主时 epoch 递增。本地按获取前的时间点计算有效期并留出余量，
+    因此本地认为仍持有租约时，其他副本一定还无法接管（各副本时钟偏差需小于余量）。
+    """
+
+    def __init__(self, session_factory, replica_id=REPLICA_ID, name=ADMIN_SIGNER, lease_seconds=SIGNER_LEASE_SECONDS):
+        self.session_factory = session_factory
+        self.replica_id = replica_id
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.epoch = None
+        self._valid_until = 0.0
+
+    def held(self):
+        """本地判断是否仍持有租约"""
+        return self.epoch is not None and time.monotonic() < self._valid_until
+
+    def acquire(self, now=None):
+        """获取或续约租约
+
+        Returns:
+            bool: 是否持有租约
+        """
+        started = time.monotonic()
+        now = now or datetime.utcnow()
+        table = SignerLease.__table__
+        db = self.session_factory()
+        try:
+            result = db.execute(
+                table.update().where(
+                    table.c.name == self.name,
+                    or_(table.c.holder == self.replica_id, table.c.lease_expires_at < now)
+                ).values(
+                    # 只有续约自己仍持有的租约时保持 epoch；重新获得（包括重启后）都递增
+                    epoch=case(
+                        (and_(table.c.holder == self.replica_id, table.c.epoch == self.epoch), table.c.epoch),
+                        else_=table.c.epoch + 1
+                    ),
+                    holder=self.replica_id,
+                    lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                    renewed_at=now
+                )
+            )
+            if result.rowcount == 0:
+                exists = db.execute(select(table.c.name).where(table.c.name == self.name)).first()
+                if exists:
+                    db.rollback()
+                    self.epoch = None
+                    return False
+                db.execute(table.insert().values(
+                    name=self.name,
+                    holder=self.replica_id,
+                    epoch=1,
+                    lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                    renewed_at=now
+                ))
+            epoch = db.execute(select(table.c.epoch).where(table.c.name == self.name)).scalar()
+            db.commit()
+        except IntegrityError:
+            # 其他副本同时创建了租约行
+            db.rollback()
+            self.epoch = None
+            return False
+        finally:
+            db.close()
+        self.epoch = epoch
+        # 留出五分之一的余量，覆盖数据库往返和时钟偏差
+        self._valid_until = started + self.lease_seconds * 0.8
+        return True
+
+    def release(self):
+        """主动释放租约，让其他副本立即接管"""
+        if self.epoch is None:
+            return
+        table = SignerLease.__table__
+        db = self.session_factory()
+        try:
+            db.execute(table.update().where(
+                table.c.name == self.name,
+                table.c.holder == self.replica_id
+            ).values(lease_expires_at=datetime.utcnow() - timedelta(seconds=1)))
+            db.commit()
+        finally:
+            db.close()
+        self.epoch = None
+        self._valid_until = 0.0
+
+    def current(self):
+        """数据库中的租约持有情况"""
+        db = self.session_factory()
+        try:
+            row = db.query(SignerLease).filter(SignerLease.name == self.name).first()
+            if row is None:
+                return None
+            return {"holder": row.holder, "epoch": row.epoch, "lease_expires_at": row.lease_expires_at}
+        finally:
+            db.close()
+
+
+class ChainWriteCoordinator:
+    """多副本之间的链上写操作协调
+
+    每个副本把写操作记录到 chain_write_requests 表并返回Future。持有签名租约的副本
+    领取待执行的请求，交给本地的交易调度器按优先级和区块预算执行，把交易哈希写回；
+    提交方轮询自己的请求得到结果。只有一个副本使用共享的管理员私钥签名，
+    nonce 不再冲突；签名副本失去租约后未执行的请求由新的签名副本继续执行。
+    """
+
+    def __init__(self, session_factory, manager, lease=None, scheduler=None,
+                 poll_interval=SIGNER_POLL_INTERVAL, timeout=CHAIN_WRITE_TIMEOUT):
+        self.session_factory = session_factory
+        self.manager = manager
+        self.lease = lease or LeaderLease(session_factory)
+        self.scheduler = scheduler or blockchain.get_transaction_scheduler(manager)
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._waiting = {}  # 请求ID -> (Future, 超时时间)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._next_renewal = 0.0
+        self._was_leader = False
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def replica_id(self):
+        return self.lease.replica_id
+
+    def submit(self, priority, method, args=(), gas=blockchain.REGISTER_IDENTITY_GAS, tx_count=1):
+        """记录写操作，返回在签名副本执行后完成的Future"""
+        if priority not in {c.name for c in self.scheduler.classes}:
+            raise ValueError(f"未知的交易优先级: {priority}")
+        db = self.session_factory()
+        try:
+            request = ChainWriteRequest(
+                priority=priority,
+                method=method,
+                args=json.dumps(list(args)),
+                gas=gas,
+                tx_count=tx_count,
+                requested_by=self.replica_id
+            )
+            db.add(request)
+            db.commit()
+            request_id = request.id
+        finally:
+            db.close()
+        future = Future()
+        with self._lock:
+            self._waiting[request_id] = (future, time.monotonic() + self.timeout)
+        self._wake.set()
+        return future
+
+    def start(self):
+        """启动后台线程：续约、领取和收集结果"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="chain-write-coordinator", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        if self.lease.held():
+            self.lease.release()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("链上写操作协调出错")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def run_once(self):
+        """执行一轮：按需续约，持有租约时领取请求，然后收集本副本请求的结果"""
+        self.renew_lease()
+        if self.lease.held():
+            self.dispatch_pending()
+        self.collect_results()
+
+    def renew_lease(self, force=False):
+        now = time.monotonic()
+        if not force and now < self._next_renewal:
+            return self.lease.held()
+        # 持有者每三分之一租约续约一次，其他副本以同样间隔尝试接管
+        self._next_renewal = now + self.lease.lease_seconds / 3
+        leader = self.lease.acquire()
+        if leader and not self._was_leader:
+            logger.info("成为签名副本", extra={"replica_id": self.replica_id, "epoch": self.lease.epoch})
+            self._take_over()
+        elif not leader and self._was_leader:
+            logger.warning("失去签名租约", extra={"replica_id": self.replica_id})
+        self._was_leader = leader
+        return leader
+
+    def _take_over(self):
+        """接管时处理旧签名副本未完成的请求
+
+        状态为 running 的请求旧副本尚未开始发送，重新排队即可。状态为 sending 的请求
+        旧副本可能已经发送了交易：合约拒绝重复的身份注册，这类请求重新排队；
+        凭证颁发、撤销和存证重新执行会覆盖链上记录，标记为失败交由提交方处理。
+        超过重试次数的请求同样标记为失败。
+        """
+        table = ChainWriteRequest.__table__
+        now = datetime.utcnow()
+        db = self.session_factory()
+        try:
+            stale = (table.c.status.in_(("running", "sending")), table.c.epoch != self.lease.epoch)
+            db.execute(table.update().where(*stale, table.c.attempts >= CHAIN_WRITE_MAX_ATTEMPTS).values(
+                status="failed",
+                error="签名副本切换，重试次数已用完",
+                completed_at=now
+            ))
+            unknown = db.execute(table.update().where(
+                *stale, table.c.status == "sending", table.c.method.notin_(REPLAYABLE_METHODS)
+            ).values(
+                status="failed",
+                error="签名副本切换时交易可能已发送，为避免重复上链不再执行",
+                completed_at=now
+            )).rowcount
+            requeued = db.execute(table.update().where(*stale).values(status="pending", claimed_by=None)).rowcount
+            db.commit()
+        finally:
+            db.close()
+        if requeued:
+            logger.warning("重新排队旧签名副本未完成的请求", extra={"requeued": requeued})
+        if unknown:
+            logger.error("旧签名副本可能已发送的请求标记为失败", extra={"failed": unknown})
+
+    def dispatch_pending(self):
+        """领取待执行的请求交给本地交易调度器
+
+        Returns:
+            int: 本轮领取的请求数
+        """
+        with self._lock:
+            capacity = CHAIN_WRITE_MAX_IN_FLIGHT - self._in_flight
+        if capacity <= 0:
+            return 0
+        epoch = self.lease.epoch
+        table = ChainWriteRequest.__table__
+        # 按优先级类别领取，积压的批量写入不会挤占时间敏感的写入
+        priority_rank = case(
+            {c.name: rank for rank, c in enumerate(self.scheduler.classes)},
+            value=table.c.priority,
+            else_=len(self.scheduler.classes)
+        )
+        db = self.session_factory()
+        try:
+            candidates = db.execute(
+                select(table).where(table.c.status == "pending").order_by(
+                    priority_rank, table.c.created_at
+                ).limit(capacity)
+            ).mappings().all()
+            claimed = []
+            for row in candidates:
+                # 条件更新防止同一请求被重复领取
+                result = db.execute(table.update().where(
+                    table.c.id == row["id"],
+                    table.c.status == "pending"
+                ).values(
+                    status="running",
+                    claimed_by=self.replica_id,
+                    epoch=epoch,
+                    attempts=table.c.attempts + 1
+                ))
+                if result.rowcount:
+                    claimed.append(row)
+            db.commit()
+        finally:
+            db.close()
+
+        for row in claimed:
+            with self._lock:
+                self._in_flight += 1
+            future = self.scheduler.submit(
+                row["priority"],
+                "execute_request",
+                (row["id"], epoch, row["method"], json.loads(row["args"] or "[]")),
+                gas=row["gas"],
+                tx_count=row["tx_count"] or 1,
+                target=self
+            )
+            future.add_done_callback(lambda f, request_id=row["id"], epoch=epoch: self._record(request_id, epoch, f))
+        return len(claimed)
+
+    def execute_request(self, request_id, epoch, method, args):
+        """由交易调度器调用；执行前确认仍持有领取时的租约，并在发送前标记为 sending"""
+        if not self.lease.held() or self.lease.epoch != epoch:
+            raise LeaseLostError("签名租约已失去")
+        table = ChainWriteRequest.__table__
+        db = self.session_factory()
+        try:
+            # 新签名副本接管后请求已不属于本副本，条件更新不会成功
+            marked = db.execute(table.update().where(
+                table.c.id == request_id, table.c.status == "running", table.c.epoch == epoch
+            ).values(status="sending")).rowcount
+            db.commit()
+        finally:
+            db.close()
+        if not marked:
+            raise LeaseLostError("请求已由新的签名副本接管")
+        return getattr(self.manager, method)(*args)
+
+    def _record(self, request_id, epoch, future):
+        with self._lock:
+            self._in_flight -= 1
+        table = ChainWriteRequest.__table__
+        owned = (table.c.id == request_id, table.c.status.in_(("running", "sending")), table.c.epoch == epoch)
+        error = future.exception()
+        db = self.session_factory()
+        try:
+            if isinstance(error, LeaseLostError):
+                # 未执行，留给新的签名副本
+                db.execute(table.update().where(*owned).values(status="pending", claimed_by=None))
+            elif error is not None:
+                db.execute(table.update().where(*owned).values(
+                    status="failed", error=str(error), completed_at=datetime.utcnow()
+                ))
+            else:
+                db.execute(table.update().where(*owned).values(
+                    status="done", result=json.dumps(future.result()), completed_at=datetime.utcnow()
+                ))
+            db.commit()
+        except Exception:
+            logger.exception("记录链上写操作结果失败", extra={"request_id": request_id})
+        finally:
+            db.close()
+
+        if isinstance(error, LeaseLostError):
+            return
+        # 本副本提交的请求直接完成，不必等下一轮轮询
+        with self._lock:
+            waiting = self._waiting.pop(request_id, None)
+        if waiting is not None:
+            if error is not None:
+                waiting[0].set_exception(ChainWriteError(str(error)))
+            else:
+                waiting[0].set_result(future.result())
+
+    def collect_results(self):
+        """完成本副本已有结果的请求，超时的请求以异常结束
+
+        Returns:
+            int: 本轮完成的请求数
+        """
+        with self._lock:
+            ids = list(self._waiting)
+        if not ids:
+            return 0
+        db = self.session_factory()
+        try:
+            rows = []
+            for i in range(0, len(ids), 500):
+                rows.extend(db.query(ChainWriteRequest).filter(
+                    ChainWriteRequest.id.in_(ids[i:i + 500]),
+                    ChainWriteRequest.status.in_(("done", "failed"))
+                ).all())
+        finally:
+            db.close()
+
+        completed = 0
+        for row in rows:
+            with self._lock:
+                waiting = self._waiting.pop(row.id, None)
+            if waiting is None:
+                continue
+            if row.status == "done":
+                waiting[0].set_result(json.loads(row.result) if row.result else None)
+            else:
+                waiting[0].set_exception(ChainWriteError(row.error or "链上写操作失败"))
+            completed += 1
+
+        now = time.monotonic()
+        with self._lock:
+            expired = [(request_id, w[0]) for request_id, w in self._waiting.items() if w[1] <= now]
+            for request_id, _ in expired:
+                del self._waiting[request_id]
+        for request_id, future in expired:
+            future.set_exception(TimeoutError(f"等待链上写操作结果超时: {request_id}"))
+        return completed
+
+    def status(self):
+        """租约持有情况和写请求积压"""
+        db = self.session_factory()
+        try:
+            counts = dict(db.query(ChainWriteRequest.status, func.count(ChainWriteRequest.id)).filter(
+                ChainWriteRequest.status.in_(("pending", "running", "sending"))
+            ).group_by(ChainWriteRequest.status).all())
+        finally:
+            db.close()
+        with self._lock:
+            waiting = len(self._waiting)
+            in_flight = self._in_flight
+        return {
+            "enabled": True,
+            "replica_id": self.replica_id,
+            "is_signer": self.lease.held(),
+            "lease": self.lease.current(),
+            "pending": counts.get("pending", 0),
+            "running": counts.get("running", 0) + counts.get("sending", 0),
+            "waiting": waiting,
+            "in_flight": in_flight,
+        }
+
+
+# 进程内的写操作协调器，由应用启动时按 SIGNER_COORDINATION 创建
+coordinator = None
+
+
+def start_coordinator(session_factory, manager):
+    """启动写操作协调，并让 BlockchainManager.submit_transaction 经由协调器提交"""
+    global coordinator
+    if coordinator is None:
+        coordinator = ChainWriteCoordinator(session_factory, manager)
+        blockchain.set_write_coordinator(coordinator)
+        coordinator.start()
+    return coordinator
+
+
+def stop_coordinator():
+    global coordinator
+    if coordinator is not None:
+        blockchain.set_write_coordinator(None)
+        coordinator.stop()
+        coordinator = None
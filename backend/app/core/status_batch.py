@@ -0,0 +1,105 @@
+# app/core/status_batch.py
+import json
+import os
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..models.models import Verification
+from .logger import get_logger
+from .reuse import not_expired
+
+logger = get_logger(__name__)
+
+# 单次批量查询的最多 (用户, 验证类型) 数
+STATUS_BATCH_MAX_PAIRS = int(os.getenv("STATUS_BATCH_MAX_PAIRS", "10000"))
+# 每次查询和输出的请求数；IN 列表长度受数据库参数个数限制
+STATUS_BATCH_CHUNK = int(os.getenv("STATUS_BATCH_CHUNK", "500"))
+
+STATUS_COLUMNS = (
+    Verification.id, Verification.user_id, Verification.verifier_id, Verification.verification_type,
+    Verification.expires_at, Verification.verification_date,
+)
+PROOF_COLUMNS = (Verification.transaction_hash, Verification.status_index, Verification.credential)
+
+
+def lookup_status(db, pairs, include_proofs=False, verifier_id=None, now=None):
+    """查询一组 (用户, 验证类型) 是否有已批准且未过期的验证
+
+    按验证类型分组，每种类型用一条 user_id IN 查询（走 ix_verifications_reuse 索引），
+    查询次数只与类型数有关，与请求数无关。
+
+    Args:
+        db: 数据库会话
+        pairs: (user_id, verification_type) 列表
+        include_proofs: 是否返回交易哈希、状态列表位置和签名凭证
+        verifier_id: 查询方验证者ID；签名凭证是用户的持有凭证，只返回该验证者签发的
+        now: 当前时间（UTC），便于测试
+
+    Returns:
+        list: 与输入顺序一致的结果
+    """
+    now = now or datetime.utcnow()
+    users_by_type = defaultdict(set)
+    for user_id, verification_type in pairs:
+        users_by_type[verification_type].add(user_id)
+
+    columns = STATUS_COLUMNS + (PROOF_COLUMNS if include_proofs else ())
+    found = {}
+    for verification_type, user_ids in users_by_type.items():
+        rows = db.execute(
+            select(*columns).where(
+                Verification.verification_type == verification_type,
+                Verification.user_id.in_(user_ids),
+                Verification.status == "approved",
+                not_expired(now)
+            ).order_by(Verification.verification_date.desc())
+        )
+        for row in rows:
+            # 同一用户有多条有效批准时使用最新的一条
+            found.setdefault((row.user_id, verification_type), row)
+
+    results = []
+    for user_id, verification_type in pairs:
+        row = found.get((user_id, verification_type))
+        result = {"user_id": user_id, "verification_type": verification_type, "is_verified": row is not None}
+        if row is not None:
+            result.update(
+                verification_id=row.id,
+                verifier_id=row.verifier_id,
+                expires_at=row.expires_at.isoformat() if row.expires_at else None,
+            )
+            if include_proofs:
+                result.update(
+                    transaction_hash=row.transaction_hash,
+                    status_index=row.status_index,
+                )
+                if verifier_id is not None and row.verifier_id == verifier_id:
+                    result["credential"] = row.credential
+        results.append(result)
+    return results
+
+
+def stream_status(bind, pairs, include_proofs=False, verifier_id=None, chunk_size=STATUS_BATCH_CHUNK):
+    """按请求顺序逐块查询并以NDJSON输出，每块一个数据块
+
+    在独立的会话中执行，首块查询完成即可开始输出。
+
+    Yields:
+        bytes: 该块结果的NDJSON行
+    """
+    db = Session(bind=bind)
+    now = datetime.utcnow()
+    verified = 0
+    try:
+        for start in range(0, len(pairs), chunk_size):
+            results = lookup_status(db, pairs[start:start + chunk_size], include_proofs, verifier_id, now)
+            verified += sum(1 for result in results if result["is_verified"])
+            yield "".join(
+                json.dumps(result, ensure_ascii=False, separators=(",", ":")) + "\n" for result in results
+            ).encode("utf-8")
+    finally:
+        db.close()
+        logger.info("批量查询验证状态", extra={"pairs": len(pairs), "verified": verified})
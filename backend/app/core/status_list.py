@@ -0,0 +1,251 @@
+# app/core/status_list.py
+import hashlib
+import os
+import threading
+import zlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models.models import CredentialStatusList, Verification
+from .blockchain import ANCHOR_DIGEST_GAS, PRIORITY_BULK
+from .logger import get_logger
+from .reuse import not_expired
+
+logger = get_logger(__name__)
+
+STATUS_LIST_ID = "default"
+# 位图的最小位数（16KB），凭证较少时也不能从列表长度推断签发量
+STATUS_LIST_MIN_SIZE = int(os.getenv("STATUS_LIST_MIN_SIZE", "131072"))
+# 重新生成位图的间隔（秒），也是客户端缓存的有效期
+STATUS_LIST_PUBLISH_INTERVAL = float(os.getenv("STATUS_LIST_PUBLISH_INTERVAL", "60"))
+# 两次上链存证之间的最短间隔（秒）
+STATUS_LIST_ANCHOR_INTERVAL = float(os.getenv("STATUS_LIST_ANCHOR_INTERVAL", "3600"))
+STATUS_LIST_PUBLISHER_ENABLED = os.getenv("STATUS_LIST_PUBLISHER_ENABLED", "true").lower() == "true"
+
+
+def allocate_indexes(db, count):
+    """在状态列表中分配 count 个连续位置，需在保存凭证的同一事务中调用
+
+    用一条条件更新递增 next_index，并发事务在该行上排队，不会分配到相同的位置。
+
+    Returns:
+        int: 第一个位置
+    """
+    table = CredentialStatusList.__table__
+    while True:
+        next_index = db.execute(
+            update(table).where(table.c.id == STATUS_LIST_ID).values(
+                next_index=table.c.next_index + count
+            ).returning(table.c.next_index)
+        ).scalar()
+        if next_index is not None:
+            return next_index - count
+        try:
+            with db.begin_nested():
+                db.execute(table.insert().values(id=STATUS_LIST_ID, next_index=count))
+            return 0
+        except IntegrityError:
+            # 其他事务刚创建了列表，重新递增
+            continue
+
+
+def assign_status_indexes(db, verifications):
+    """为尚未分配位置的已批准验证分配状态列表位置
+
+    重新批准的验证沿用原来的位置，位的值由验证的当前状态决定。
+    """
+    pending = [v for v in verifications if v.status_index is None]
+    if not pending:
+        return
+    first = allocate_indexes(db, len(pending))
+    for offset, verification in enumerate(pending):
+        verification.status_index = first + offset
+
+
+def bit_is_set(bitmap, index):
+    """读取位图中的一位，第0位是第一个字节的最高位"""
+    return bool(bitmap[index // 8] >> (7 - index % 8) & 1)
+
+
+def build_bitmap(db, now=None):
+    """从验证表生成当前的状态位图
+
+    已分配的位置先全部置1，再清除仍然有效（已批准且未过期）的凭证对应的位，
+    因此拒绝、过期、已归档或删除的凭证都视为无效，不需要在每次状态变更时维护位图。
+
+    Returns:
+        tuple: (位图, 位数)
+    """
+    row = db.get(CredentialStatusList, STATUS_LIST_ID)
+    allocated = row.next_index if row else 0
+    size = max(STATUS_LIST_MIN_SIZE, (allocated + 7) // 8 * 8)
+    bitmap = bytearray(size // 8)
+    full, rest = divmod(allocated, 8)
+    bitmap[:full] = b"\xff" * full
+    if rest:
+        bitmap[full] = (0xff << (8 - rest)) & 0xff
+
+    valid = db.query(Verification.status_index).filter(
+        Verification.status_index.isnot(None),
+        Verification.status == "approved",
+        not_expired(now)
+    )
+    for (index,) in valid.execution_options(yield_per=10000):
+        bitmap[index // 8] &= ~(1 << (7 - index % 8)) & 0xff
+    return bytes(bitmap), size
+
+
+def encode_bitmap(bitmap):
+    """gzip压缩位图；不写入时间戳，相同位图的压缩结果和摘要相同"""
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+    return compressor.compress(bitmap) + compressor.flush()
+
+
+def publish_status_list(db, now=None):
+    """重新生成并保存状态列表，内容未变化时只返回已发布的列表
+
+    Returns:
+        CredentialStatusList: 已发布的状态列表
+    """
+    now = now or datetime.utcnow()
+    bitmap, size = build_bitmap(db, now)
+    encoded = encode_bitmap(bitmap)
+    digest = "0x" + hashlib.sha256(encoded).hexdigest()
+
+    row = db.get(CredentialStatusList, STATUS_LIST_ID)
+    if row is None:
+        row = CredentialStatusList(id=STATUS_LIST_ID, next_index=0)
+        db.add(row)
+    if row.digest != digest:
+        row.size = size
+        row.encoded = encoded
+        row.digest = digest
+        row.published_at = now
+        logger.info("发布凭证状态列表", extra={"digest": digest, "allocated": row.next_index})
+    db.commit()
+    return row
+
+
+def anchor_status_list(db, manager, now=None):
+    """把最新发布的状态列表摘要写入链上
+
+    用条件更新认领本次存证，多个副本同时运行时只有一个提交交易；
+    距上次存证不足 STATUS_LIST_ANCHOR_INTERVAL 或摘要未变化时不做任何事。
+
+    Returns:
+        Future: 链上交易的 Future，未提交时返回 None
+    """
+    now = now or datetime.utcnow()
+    table = CredentialStatusList.__table__
+    row = db.get(CredentialStatusList, STATUS_LIST_ID)
+    if row is None or row.digest is None:
+        return None
+    digest = row.digest
+    claimed = db.execute(
+        update(table).where(
+            table.c.id == STATUS_LIST_ID,
+            table.c.digest == digest,
+            or_(table.c.anchored_digest.is_(None), table.c.anchored_digest != digest),
+            or_(
+                table.c.anchored_at.is_(None),
+                table.c.anchored_at <= now - timedelta(seconds=STATUS_LIST_ANCHOR_INTERVAL)
+            )
+        ).values(
+            anchored_digest=digest, anchored_at=now, anchor_tx_hash=None
+        ).execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    if not claimed:
+        return None
+
+    bind = db.get_bind()
+    future = manager.submit_transaction(PRIORITY_BULK, "anchor_digest", digest, gas=ANCHOR_DIGEST_GAS)
+    future.add_done_callback(lambda f: _record_anchor(bind, digest, f))
+    return future
+
+
+def _record_anchor(bind, digest, future):
+    """记录存证结果；失败时清除认领，下一轮重新提交"""
+    try:
+        tx_hash = future.result()
+        values = {"anchor_tx_hash": tx_hash}
+        logger.info("状态列表摘要已上链", extra={"digest": digest, "transaction_hash": tx_hash})
+    except Exception:
+        logger.exception("状态列表摘要上链失败", extra={"digest": digest})
+        values = {"anchored_digest": None, "anchored_at": None}
+    table = CredentialStatusList.__table__
+    db = Session(bind=bind)
+    try:
+        db.execute(
+            update(table).where(
+                table.c.id == STATUS_LIST_ID, table.c.anchored_digest == digest
+            ).values(**values)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+class StatusListPublisher:
+    """定期发布状态列表并上链存证的后台线程"""
+
+    def __init__(self, session_factory, manager=None, interval=STATUS_LIST_PUBLISH_INTERVAL):
+        self.session_factory = session_factory
+        self.manager = manager
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """启动后台发布线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="status-list-publisher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("发布凭证状态列表出错")
+            self._stop.wait(self.interval)
+
+    def run_once(self, now=None):
+        """发布一次状态列表，并在需要时提交上链存证"""
+        db = self.session_factory()
+        try:
+            publish_status_list(db, now)
+            if self.manager is not None:
+                anchor_status_list(db, self.manager, now)
+        finally:
+            db.close()
+
+
+# 进程内的状态列表发布线程，由应用启动时启动
+publisher = None
+
+
+def start_publisher(session_factory, manager=None):
+    """启动进程内的状态列表发布线程"""
+    global publisher
+    if publisher is None:
+        publisher = StatusListPublisher(session_factory, manager)
+        publisher.start()
+    return publisher
+
+
+def stop_publisher():
+    global publisher
+    if publisher is not None:
+        publisher.stop()
+        publisher = None
@@ -0,0 +1,480 @@
+# app/core/tracing.py
+import contextvars
+import functools
+import json
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .logger import get_logger
+from .metrics import statement_fingerprint
+
+logger = get_logger(__name__)
+
+# 头部采样率：请求开始时按该概率决定是否记录整条链路
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+# 导出方式：file、otlp 或 none
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "file").lower()
+# file 导出时的输出文件，每行一条链路
+TRACE_FILE_PATH = os.getenv("TRACE_FILE_PATH", "./traces.jsonl")
+# otlp 导出时的 OTLP/HTTP 地址
+OTLP_TRACES_ENDPOINT = os.getenv("OTLP_TRACES_ENDPOINT", "http://127.0.0.1:4318/v1/traces")
+# 服务名，写入导出数据的资源属性
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "dlt-identity-system")
+# 导出队列容量，队列满时丢弃链路而不是阻塞请求
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "2000"))
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def new_trace_id():
+    return f"{random.getrandbits(128):032x}"
+
+
+def new_span_id():
+    return f"{random.getrandbits(64):016x}"
+
+
+class Trace:
+    """一条链路中已结束的span，根span结束时一起导出"""
+
+    def __init__(self, trace_id, exporter):
+        self.trace_id = trace_id
+        self.exporter = exporter
+        self.spans = []
+        self.exported = False
+        self._lock = threading.Lock()
+
+    def finish(self, span, is_root):
+        with self._lock:
+            self.spans.append(span)
+            if not is_root and not self.exported:
+                return
+            # 根span结束时导出整条链路；之后才结束的后台span单独导出
+            spans, self.spans = self.spans, []
+            self.exported = True
+        if self.exporter is not None:
+            self.exporter.export(spans)
+
+
+class Span:
+    """一次计时操作"""
+
+    def __init__(self, trace, name, parent=None, kind="internal", attributes=None):
+        self.trace = trace
+        self.trace_id = trace.trace_id
+        self.span_id = new_span_id()
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.status = "ok"
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self._token = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_error(self, exc):
+        self.status = "error"
+        self.attributes["error.type"] = type(exc).__name__
+        self.attributes["error.message"] = str(exc)
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.trace.finish(self, self.parent_id is None)
+
+    @property
+    def duration_ms(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_unix_nano": self.start_ns,
+            "end_unix_nano": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.record_error(exc)
+        _current_span.reset(self._token)
+        self.end()
+        return False
+
+
+class _NoopSpan:
+    """未采样时使用的空span，不做任何记录"""
+
+    trace_id = None
+    span_id = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def record_error(self, exc):
+        pass
+
+    def end(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def current_span():
+    return _current_span.get()
+
+
+def current_trace_id():
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+def start_span(name, kind="internal", attributes=None):
+    """在当前链路下创建子span；当前请求未被采样时返回空span
+
+    用作上下文管理器，退出时结束span并恢复父span。
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return NOOP_SPAN
+    return Span(parent.trace, name, parent=parent, kind=kind, attributes=attributes)
+
+
+def start_trace(name, trace_id=None, parent_id=None, kind="server", attributes=None, exporter=None):
+    """开始一条新链路，返回根span"""
+    trace = Trace(trace_id or new_trace_id(), exporter if exporter is not None else get_exporter())
+    span = Span(trace, name, kind=kind, attributes=attributes)
+    if parent_id:
+        # 上游服务传入的父span，仅作为属性记录，本服务内仍以该span为根
+        span.attributes["parent.remote_span_id"] = parent_id
+    return span
+
+
+def traced(name=None):
+    """为函数创建span的装饰器"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with start_span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def trace_public_methods(prefix):
+    """类装饰器：为所有公开方法创建span"""
+    def decorator(cls):
+        for attr, value in list(vars(cls).items()):
+            if callable(value) and not attr.startswith("_"):
+                setattr(cls, attr, traced(f"{prefix}.{attr}")(value))
+        return cls
+    return decorator
+
+
+def parse_traceparent(header):
+    """解析W3C traceparent请求头
+
+    Returns:
+        tuple: (trace_id, parent_span_id, 是否采样)，格式不正确时返回 None
+    """
+    parts = (header or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+class SpanExporter:
+    """后台线程批量导出链路，请求线程只做入队"""
+
+    def __init__(self, queue_size=TRACE_QUEUE_SIZE, flush_interval=1.0, max_batch=200):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                self.write(batch)
+            except Exception as e:
+                logger.warning("导出链路失败: %s", e)
+
+    def write(self, traces):
+        raise NotImplementedError
+
+
+class FileSpanExporter(SpanExporter):
+    """把每条链路作为一行JSON追加写入本地文件"""
+
+    def __init__(self, path=TRACE_FILE_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+
+    def write(self, traces):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for spans in traces:
+                spans = sorted(spans, key=lambda s: s.start_ns)
+                f.write(json.dumps({
+                    "trace_id": spans[0].trace_id,
+                    "spans": [s.to_dict() for s in spans],
+                }, ensure_ascii=False, default=str) + "\n")
+
+
+_OTLP_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(traces, service_name=TRACE_SERVICE_NAME):
+    """转换为OTLP/HTTP的JSON编码"""
+    spans = []
+    for trace_spans in traces:
+        for span in trace_spans:
+            item = {
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": _OTLP_KINDS.get(span.kind, 1),
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+                "status": {"code": 2 if span.status == "error" else 1},
+            }
+            if span.parent_id:
+                item["parentSpanId"] = span.parent_id
+            spans.append(item)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{"scope": {"name": "app.core.tracing"}, "spans": spans}],
+        }]
+    }
+
+
+class OtlpHttpSpanExporter(SpanExporter):
+    """以OTLP/HTTP JSON格式发送到采集器"""
+
+    def __init__(self, endpoint=OTLP_TRACES_ENDPOINT, timeout=5, **kwargs):
+        super().__init__(**kwargs)
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def write(self, traces):
+        body = json.dumps(to_otlp(traces)).encode("utf-8")
+        request = urllib.request.Request(
+            self.endpoint, data=body, headers={"Content-Type": "application/json"}, method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter():
+    """按配置创建进程内共享的导出器"""
+    global _exporter
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                if TRACE_EXPORTER == "otlp":
+                    _exporter = OtlpHttpSpanExporter()
+                elif TRACE_EXPORTER == "file":
+                    _exporter = FileSpanExporter()
+                else:
+                    _exporter = False
+    return _exporter or None
+
+
+class TracingMiddleware:
+    """ASGI中间件：按头部采样为请求创建根span，并在响应中返回 X-Trace-Id
+
+    上游传入已采样的 traceparent 时沿用其链路ID并强制采样。
+    """
+
+    def __init__(self, app, sample_rate=TRACE_SAMPLE_RATE, exporter=None):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+
+    def _should_sample(self, upstream):
+        if upstream is not None:
+            return upstream[2]
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        upstream = None
+        for key, value in scope.get("headers", []):
+            if key == b"traceparent":
+                upstream = parse_traceparent(value.decode("latin-1"))
+                break
+
+        if not self._should_sample(upstream):
+            trace_id = upstream[0] if upstream else new_trace_id()
+            await self.app(scope, receive, self._with_trace_header(send, trace_id, None))
+            return
+
+        span = start_trace(
+            f"{scope['method']} {scope['path']}",
+            trace_id=upstream[0] if upstream else None,
+            parent_id=upstream[1] if upstream else None,
+            attributes={"http.method": scope["method"], "http.target": scope["path"]},
+            exporter=self.exporter,
+        )
+        token = _current_span.set(span)
+        try:
+            await self.app(scope, receive, self._with_trace_header(send, span.trace_id, span))
+        except Exception as e:
+            span.record_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                # 路由匹配后使用路由模板命名，便于按接口聚合
+                span.name = f"{scope['method']} {route}"
+                span.set_attribute("http.route", route)
+            span.end()
+
+    @staticmethod
+    def _with_trace_header(send, trace_id, span):
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-trace-id", trace_id.encode("latin-1"))]
+                if span is not None:
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.status = "error"
+            await send(message)
+        return send_wrapper
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    parent = _current_span.get()
+    if parent is None:
+        return
+    span = Span(parent.trace, "db.query", parent=parent, kind="client", attributes={
+        "db.system": conn.engine.dialect.name,
+        "db.statement": statement_fingerprint(statement),
+    })
+    conn.info.setdefault("trace_spans", []).append(span)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.get("trace_spans")
+    if spans:
+        span = spans.pop()
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            span.set_attribute("db.rowcount", cursor.rowcount)
+        span.end()
+
+
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    spans = connection.info.get("trace_spans") if connection is not None else None
+    if spans:
+        span = spans.pop()
+        span.record_error(exception_context.original_exception)
+        span.end()
+
+
+_sqlalchemy_instrumented = False
+
+
+def instrument_sqlalchemy():
+    """为所有引擎的语句执行创建span（只注册一次）"""
+    global _sqlalchemy_instrumented
+    if _sqlalchemy_instrumented:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+    _sqlalchemy_instrumented = True
+
+
+def web3_tracing_middleware(make_request, w3):
+    """web3中间件：为每次节点RPC调用创建span"""
+    def middleware(method, params):
+        if _current_span.get() is None:
+            return make_request(method, params)
+        with start_span(f"rpc {method}", kind="client", attributes={"rpc.method": method}) as span:
+            response = make_request(method, params)
+            if isinstance(response, dict) and "error" in response:
+                span.status = "error"
+            return response
+    return middleware
@@ -0,0 +1,318 @@
+# app/core/webhooks.py
+import hashlib
+import hmac
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+from sqlalchemy import func, select, update
+
+from ..models.models import Verifier, WebhookDelivery, WebhookEvent
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# 事件在合并窗口内等待更多事件一起投递（秒）
+WEBHOOK_COALESCE_SECONDS = float(os.getenv("WEBHOOK_COALESCE_SECONDS", "2"))
+# 单次投递最多包含的事件数
+WEBHOOK_MAX_BATCH = int(os.getenv("WEBHOOK_MAX_BATCH", "100"))
+# 最大投递次数，超过后标记为失败
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+# 指数退避的基础间隔和上限（秒）
+WEBHOOK_BACKOFF_BASE = float(os.getenv("WEBHOOK_BACKOFF_BASE", "2"))
+WEBHOOK_BACKOFF_MAX = float(os.getenv("WEBHOOK_BACKOFF_MAX", "600"))
+# 每个通知地址同时进行的投递数
+WEBHOOK_MAX_CONCURRENCY_PER_ENDPOINT = int(os.getenv("WEBHOOK_MAX_CONCURRENCY_PER_ENDPOINT", "2"))
+# 单次请求超时（秒），同时作为投递中的占用时长
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT", "10"))
+
+
+def sign_payload(secret, timestamp, body):
+    """计算通知签名：HMAC-SHA256(secret, "时间戳.请求体")"""
+    message = f"{timestamp}.".encode("utf-8") + body
+    return hmac.new(secret.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+
+def verify_signature(secret, timestamp, body, signature):
+    """供接收方使用的签名校验"""
+    expected = sign_payload(secret, timestamp, body)
+    return hmac.compare_digest(f"sha256={expected}", signature)
+
+
+def enqueue_assignment(db, verifier, verification):
+    """记录新分配的验证请求，等待合并投递
+
+    只写入发件箱，与验证请求在同一事务中提交；未配置通知地址的验证者不记录。
+    """
+    if not verifier.webhook_url:
+        return None
+    event = WebhookEvent(
+        verifier_id=verifier.id,
+        event_type="verification.assigned",
+        payload=json.dumps({
+            "verification_id": verification.id,
+            "user_id": verification.user_id,
+            "verification_type": verification.verification_type,
+            "priority": verification.priority or 0,
+        }, ensure_ascii=False)
+    )
+    db.add(event)
+    return event
+
+
+def http_post(url, body, headers, timeout):
+    """发送POST请求，返回HTTP状态码"""
+    request = urllib.request.Request(url, data=body, headers=headers, method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def backoff_seconds(attempts):
+    """第 attempts 次失败后的等待时间，带随机抖动"""
+    delay = min(WEBHOOK_BACKOFF_BASE * (2 ** (attempts - 1)), WEBHOOK_BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+class WebhookDispatcher:
+    """批量通知投递器
+
+    每轮先把发件箱中的事件按验证者合并成投递批次，再并发发送到期的批次。
+    投递状态保存在数据库中，进程重启后继续重试。
+    """
+
+    def __init__(self, session_factory, sender=http_post, interval=1.0):
+        self.session_factory = session_factory
+        self.sender = sender
+        self.interval = interval
+        self._endpoint_slots = {}
+        self._slots_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="webhook")
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """启动后台投递线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="webhook-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self._executor.shutdown(wait=False)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("通知投递出错")
+            self._stop.wait(self.interval)
+
+    def run_once(self, now=None, wait=False):
+        """执行一轮合并和投递
+
+        Args:
+            now: 当前时间（UTC），便于测试
+            wait: 是否等待本轮发送完成
+
+        Returns:
+            int: 本轮开始发送的批次数
+        """
+        now = now or datetime.utcnow()
+        self.coalesce(now)
+        futures = [self._executor.submit(self._deliver, *job, now) for job in self._claim_due(now)]
+        if wait:
+            for future in futures:
+                future.result()
+        return len(futures)
+
+    def coalesce(self, now):
+        """把等待时间超过合并窗口或数量达到上限的事件合并为投递批次"""
+        db = self.session_factory()
+        try:
+            pending = db.query(
+                WebhookEvent.verifier_id,
+                func.min(WebhookEvent.created_at),
+                func.count(WebhookEvent.id)
+            ).filter(
+                WebhookEvent.delivery_id.is_(None)
+            ).group_by(WebhookEvent.verifier_id).all()
+
+            cutoff = now - timedelta(seconds=WEBHOOK_COALESCE_SECONDS)
+            for verifier_id, oldest, count in pending:
+                if count < WEBHOOK_MAX_BATCH and oldest is not None and oldest.replace(tzinfo=None) > cutoff:
+                    continue
+                while count > 0:
+                    event_ids = [row.id for row in db.query(WebhookEvent.id).filter(
+                        WebhookEvent.verifier_id == verifier_id,
+                        WebhookEvent.delivery_id.is_(None)
+                    ).order_by(WebhookEvent.created_at).limit(WEBHOOK_MAX_BATCH)]
+                    if not event_ids:
+                        break
+                    delivery = WebhookDelivery(verifier_id=verifier_id, status="pending", attempts=0, next_attempt_at=now)
+                    db.add(delivery)
+                    db.flush()
+                    # 条件更新，避免多个进程把同一事件放入不同批次
+                    db.execute(
+                        update(WebhookEvent).where(
+                            WebhookEvent.id.in_(event_ids),
+                            WebhookEvent.delivery_id.is_(None)
+                        ).values(delivery_id=delivery.id).execution_options(synchronize_session=False)
+                    )
+                    db.commit()
+                    count -= len(event_ids)
+        finally:
+            db.close()
+
+    def _acquire_slot(self, url):
+        endpoint = urlsplit(url).netloc
+        with self._slots_lock:
+            semaphore = self._endpoint_slots.setdefault(
+                endpoint, threading.BoundedSemaphore(WEBHOOK_MAX_CONCURRENCY_PER_ENDPOINT)
+            )
+        return semaphore if semaphore.acquire(blocking=False) else None
+
+    def _claim_due(self, now):
+        """领取到期的投递批次并占用对应地址的并发名额
+
+        验证者取消通知地址后未投递的批次标记为失败；并发名额已满的批次推迟到下一轮，
+        不占用本轮的领取名额，其他验证者的批次不会被同一地址的积压挡住。
+        """
+        db = self.session_factory()
+        jobs = []
+        deferred = []
+        try:
+            db.execute(
+                update(WebhookDelivery).where(
+                    WebhookDelivery.status == "pending",
+                    WebhookDelivery.verifier_id.in_(select(Verifier.id).where(Verifier.webhook_url.is_(None)))
+                ).values(
+                    status="failed",
+                    last_error="验证者已取消通知地址"
+                ).execution_options(synchronize_session=False)
+            )
+            db.commit()
+
+            due = db.query(WebhookDelivery, Verifier).join(
+                Verifier, Verifier.id == WebhookDelivery.verifier_id
+            ).filter(
+                WebhookDelivery.status == "pending",
+                WebhookDelivery.next_attempt_at <= now,
+                Verifier.webhook_url.isnot(None)
+            ).order_by(WebhookDelivery.next_attempt_at).limit(100).all()
+
+            for delivery, verifier in due:
+                slot = self._acquire_slot(verifier.webhook_url)
+                if slot is None:
+                    # 该地址的并发名额已满，下一轮再试
+                    deferred.append(delivery.id)
+                    continue
+                # 投递期间推迟下次投递时间，防止被重复领取
+                claimed = db.execute(
+                    update(WebhookDelivery).where(
+                        WebhookDelivery.id == delivery.id,
+                        WebhookDelivery.next_attempt_at == delivery.next_attempt_at
+                    ).values(
+                        next_attempt_at=now + timedelta(seconds=WEBHOOK_TIMEOUT * 2)
+                    ).execution_options(synchronize_session=False)
+                ).rowcount
+                db.commit()
+                if not claimed:
+                    slot.release()
+                    continue
+                jobs.append((delivery.id, verifier.webhook_url, verifier.webhook_secret or "", slot))
+
+            if deferred:
+                db.execute(
+                    update(WebhookDelivery).where(
+                        WebhookDelivery.id.in_(deferred),
+                        WebhookDelivery.status == "pending",
+                        WebhookDelivery.next_attempt_at <= now
+                    ).values(
+                        next_attempt_at=now + timedelta(seconds=self.interval)
+                    ).execution_options(synchronize_session=False)
+                )
+                db.commit()
+        finally:
+            db.close()
+        return jobs
+
+    def _deliver(self, delivery_id, url, secret, slot, now):
+        db = self.session_factory()
+        try:
+            delivery = db.query(WebhookDelivery).filter(WebhookDelivery.id == delivery_id).first()
+            events = db.query(WebhookEvent).filter(
+                WebhookEvent.delivery_id == delivery_id
+            ).order_by(WebhookEvent.created_at).all()
+            body = json.dumps({
+                "delivery_id": delivery_id,
+                "verifier_id": delivery.verifier_id,
+                "events": [
+                    {"id": e.id, "type": e.event_type, "data": json.loads(e.payload)}
+                    for e in events
+                ],
+            }, ensure_ascii=False).encode("utf-8")
+            timestamp = str(int(time.time()))
+            headers = {
+                "Content-Type": "application/json",
+                "X-Webhook-Delivery": delivery_id,
+                "X-Webhook-Timestamp": timestamp,
+                "X-Webhook-Signature": f"sha256={sign_payload(secret, timestamp, body)}",
+            }
+
+            error = None
+            try:
+                status_code = self.sender(url, body, headers, WEBHOOK_TIMEOUT)
+                if not 200 <= status_code < 300:
+                    error = f"HTTP {status_code}"
+            except Exception as e:
+                error = str(e)
+
+            delivery.attempts = (delivery.attempts or 0) + 1
+            if error is None:
+                delivery.status = "delivered"
+                delivery.delivered_at = now
+                delivery.last_error = None
+            elif delivery.attempts >= WEBHOOK_MAX_ATTEMPTS:
+                delivery.status = "failed"
+                delivery.last_error = error
+            else:
+                delivery.last_error = error
+                delivery.next_attempt_at = now + timedelta(seconds=backoff_seconds(delivery.attempts))
+            db.commit()
+        finally:
+            db.close()
+            slot.release()
+
+
+# 进程内共享的投递器，由应用启动时启动
+dispatcher = None
+
+
+def start_dispatcher(session_factory):
+    """启动进程内的通知投递器"""
+    global dispatcher
+    if dispatcher is None:
+        dispatcher = WebhookDispatcher(session_factory)
+        dispatcher.start()
+    return dispatcher
+
+
+def stop_dispatcher():
+    global dispatcher
+    if dispatcher is not None:
+        dispatcher.stop()
+        dispatcher = None
@@ -0,0 +1,128 @@
+# app/core/work_queue.py
+import os
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import or_, update
+
+from ..models.models import Verification
+
+# 默认租约时长（秒），工作进程在此时间内未处理完的请求会重新可领取
+DEFAULT_LEASE_SECONDS = int(os.getenv("VERIFICATION_LEASE_SECONDS", "300"))
+# 单次最多领取的请求数
+MAX_CLAIM_BATCH = 100
+
+
+def _claimable(verifier_id, now):
+    """可领取的验证请求：属于该验证者、待处理、未被领取或租约已过期"""
+    return (
+        Verification.verifier_id == verifier_id,
+        Verification.status == "pending",
+        or_(Verification.lease_expires_at.is_(None), Verification.lease_expires_at <= now),
+    )
+
+
+def _claim_order():
+    """领取顺序：优先级高的在前，同优先级按提交时间先后"""
+    return (
+        Verification.priority.desc(),
+        Verification.verification_date.asc(),
+        Verification.id.asc(),
+    )
+
+
+def claim_verifications(db, verifier_id, worker_id=None, limit=10, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """为工作进程租用一批互不重叠的待处理验证请求
+
+    PostgreSQL 上使用 SELECT ... FOR UPDATE SKIP LOCKED，多个工作进程并发领取时
+    互不阻塞；SQLite 等不支持 SKIP LOCKED 的数据库退化为带条件的 UPDATE 抢占，
+    只有仍处于可领取状态的行会被本次租约占用。
+
+    Args:
+        db: 数据库会话
+        verifier_id: 验证者ID
+        worker_id: 工作进程标识
+        limit: 最多领取的数量
+        lease_seconds: 租约时长（秒）
+
+    Returns:
+        tuple: (租约ID, 租约到期时间, 领取到的验证请求列表)
+    """
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=lease_seconds)
+    lease_id = str(uuid.uuid4())
+    limit = max(1, min(limit, MAX_CLAIM_BATCH))
+
+    if db.get_bind().dialect.name == "postgresql":
+        claimed = db.query(Verification).filter(
+            *_claimable(verifier_id, now)
+        ).order_by(*_claim_order()).limit(limit).with_for_update(
+            skip_locked=True, of=Verification
+        ).all()
+        for verification in claimed:
+            verification.leased_by = worker_id
+            verification.lease_id = lease_id
+            verification.lease_expires_at = expires_at
+        db.commit()
+        return lease_id, expires_at, claimed
+
+    candidate_ids = [
+        row.id for row in db.query(Verification.id).filter(
+            *_claimable(verifier_id, now)
+        ).order_by(*_claim_order()).limit(limit)
+    ]
+    if not candidate_ids:
+        return lease_id, expires_at, []
+
+    # 条件更新保证同一行只会被一个租约抢到，被其他进程抢先的行直接跳过
+    db.execute(
+        update(Verification).where(
+            Verification.id.in_(candidate_ids),
+            *_claimable(verifier_id, now)
+        ).values(
+            leased_by=worker_id,
+            lease_id=lease_id,
+            lease_expires_at=expires_at
+        ).execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+    claimed = db.query(Verification).filter(
+        Verification.lease_id == lease_id
+    ).order_by(*_claim_order()).all()
+    return lease_id, expires_at, claimed
+
+
+def release_lease(db, verifier_id, lease_id):
+    """提前归还租约中尚未处理的验证请求
+
+    Returns:
+        int: 被释放的请求数量
+    """
+    result = db.execute(
+        update(Verification).where(
+            Verification.verifier_id == verifier_id,
+            Verification.lease_id == lease_id,
+            Verification.status == "pending"
+        ).values(
+            leased_by=None,
+            lease_id=None,
+            lease_expires_at=None
+        ).execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+
+def is_leased_by_other(verification, lease_id, now=None):
+    """判断验证请求是否被其他未过期的租约占用"""
+    if not verification.lease_id or verification.lease_id == lease_id:
+        return False
+    now = now or datetime.utcnow()
+    return verification.lease_expires_at is not None and verification.lease_expires_at > now
+
+
+def clear_lease(verification):
+    """处理完成后清除租约信息"""
+    verification.leased_by = None
+    verification.lease_id = None
+    verification.lease_expires_at = None
@@ -1,7 +1,13 @@
 # app/database.py
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
+from fastapi import Depends, Request
+from collections import OrderedDict
+import hashlib
+import itertools
+import threading
+import time
 import os
 from dotenv import load_dotenv
 
@@ -11,10 +17,24 @@ load_dotenv()
 # 获取数据库URL，如果不存在则使用默认SQLite URL
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./identity_system.db")
 
+# 只读副本URL，逗号分隔；未设置时所有读写都走主库
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# 副本延迟超过该值（秒）时读请求回退到主库
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+# 副本延迟的检查间隔（秒）
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL", "2"))
+# 客户端写入后在该时间（秒）内的读请求仍走主库，保证读到自己的写入
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+
+def _engine_options(url):
+    if url.startswith("sqlite"):
+        return {"connect_args": {"check_same_thread": False}}  # 只对SQLite需要
+    return {"pool_pre_ping": True}
+
+
 # 创建SQLAlchemy引擎
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}  # 只对SQLite需要
-)
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
 
 # 创建会话类
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -22,11 +42,202 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # 创建基类
 Base = declarative_base()
 
+
+@event.listens_for(Session, "after_flush")
+def _mark_flush_writes(session, flush_context):
+    session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_statement_writes(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_committed_writes(session):
+    # 提交时立即记录客户端的写入：依赖的清理代码在响应发送和后台任务完成之后才执行，
+    # 在那里记录会让期间的读请求落到尚未同步的副本
+    if session.info.pop("has_writes", False):
+        replica_router.mark_write(session.info.get("client_key"))
+
+
+@event.listens_for(Session, "after_rollback")
+def _clear_writes(session):
+    session.info.pop("has_writes", None)
+
+
+@event.listens_for(Session, "before_flush")
+def _reject_replica_writes(session, flush_context, instances):
+    if session.info.get("replica"):
+        raise RuntimeError("只读副本会话不能写入")
+
+
+def client_key(request):
+    """用认证信息标识客户端，用于写后读的主库粘滞"""
+    credential = request.headers.get("authorization") or request.headers.get("api-key")
+    if not credential:
+        return None
+    return hashlib.sha256(credential.encode("utf-8")).hexdigest()
+
+
+class ReplicaRouter:
+    """在主库和只读副本之间路由读请求
+
+    副本轮询使用；延迟按间隔检查并缓存，超过上限或检查失败的副本暂不使用。
+    客户端写入后的一段时间内，其读请求固定走主库。
+    """
+
+    def __init__(self, replica_urls, max_lag=REPLICA_MAX_LAG_SECONDS, check_interval=REPLICA_LAG_CHECK_INTERVAL,
+                 sticky_seconds=READ_YOUR_WRITES_SECONDS, max_sticky_clients=100000):
+        self.replicas = []
+        for url in replica_urls:
+            replica_engine = create_engine(url, **_engine_options(url))
+            self.replicas.append({
+                "name": replica_engine.url.render_as_string(hide_password=True),
+                "engine": replica_engine,
+                "sessionmaker": sessionmaker(autocommit=False, autoflush=False, bind=replica_engine),
+                "lag_seconds": None,
+                "healthy": False,
+                "checked_at": 0.0,
+                "error": None,
+            })
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.sticky_seconds = sticky_seconds
+        self.max_sticky_clients = max_sticky_clients
+        self.routed = {"primary": 0, "replica": 0, "sticky": 0, "fallback": 0}
+        self._sticky = OrderedDict()
+        self._cycle = itertools.cycle(range(len(self.replicas))) if self.replicas else None
+        self._lock = threading.Lock()
+
+    def mark_write(self, key):
+        """记录客户端的写入，之后的读请求在粘滞时间内走主库"""
+        if key is None or not self.replicas:
+            return
+        with self._lock:
+            self._sticky[key] = time.monotonic() + self.sticky_seconds
+            self._sticky.move_to_end(key)
+            while len(self._sticky) > self.max_sticky_clients:
+                self._sticky.popitem(last=False)
+
+    def is_sticky(self, key):
+        if key is None:
+            return False
+        with self._lock:
+            until = self._sticky.get(key)
+            if until is None:
+                return False
+            if until < time.monotonic():
+                del self._sticky[key]
+                return False
+            return True
+
+    def measure_lag(self, replica):
+        """查询副本的复制延迟（秒）
+
+        PostgreSQL 使用最后回放事务的时间；没有待回放的事务时延迟为0。其他数据库视为无延迟。
+        """
+        with replica["engine"].connect() as conn:
+            if conn.dialect.name != "postgresql":
+                conn.execute(text("SELECT 1"))
+                return 0.0
+            lag = conn.execute(text(
+                "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+            )).scalar()
+            return float(lag or 0.0)
+
+    def _refresh(self, replica):
+        now = time.monotonic()
+        if now - replica["checked_at"] < self.check_interval:
+            return
+        replica["checked_at"] = now
+        try:
+            replica["lag_seconds"] = self.measure_lag(replica)
+            replica["healthy"] = replica["lag_seconds"] <= self.max_lag
+            replica["error"] = None
+        except Exception as e:
+            replica["healthy"] = False
+            replica["error"] = str(e)
+
+    def choose_replica(self):
+        """按轮询选择延迟在上限内的副本，没有可用副本时返回 None"""
+        for _ in range(len(self.replicas)):
+            with self._lock:
+                replica = self.replicas[next(self._cycle)]
+            self._refresh(replica)
+            if replica["healthy"]:
+                return replica
+        return None
+
+    def route(self, key):
+        """决定读请求使用的副本，返回 None 表示使用主库"""
+        if not self.replicas:
+            self.routed["primary"] += 1
+            return None
+        if self.is_sticky(key):
+            self.routed["sticky"] += 1
+            return None
+        replica = self.choose_replica()
+        if replica is None:
+            self.routed["fallback"] += 1
+            return None
+        self.routed["replica"] += 1
+        return replica
+
+    def status(self):
+        """各副本的延迟和健康状态"""
+        return {
+            "max_lag_seconds": self.max_lag,
+            "read_your_writes_seconds": self.sticky_seconds,
+            "routed": dict(self.routed),
+            "replicas": [
+                {
+                    "name": r["name"],
+                    "lag_seconds": r["lag_seconds"],
+                    "healthy": r["healthy"],
+                    "error": r["error"],
+                }
+                for r in self.replicas
+            ],
+        }
+
+
+# 进程内共享的副本路由
+replica_router = ReplicaRouter(DATABASE_REPLICA_URLS)
+
+
+def bind_client(db, request):
+    """记录会话所属的客户端，会话提交写入时据此让该客户端之后的读走主库"""
+    if request is not None:
+        db.info["client_key"] = client_key(request)
+    return db
+
+
 # 获取数据库会话的依赖函数
-def get_db():
-    """提供数据库会话依赖"""
-    db = SessionLocal()
+def get_db(request: Request = None):
+    """提供主库会话依赖，提交写入时记录客户端以便写后读走主库"""
+    db = bind_client(SessionLocal(), request)
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def get_read_db(request: Request, db: Session = Depends(get_db)):
+    """提供只读会话依赖
+
+    读请求优先使用延迟在上限内的副本；客户端刚写入过、副本延迟过高或未配置副本时
+    使用主库会话（与同一请求中的 get_db 为同一会话）。
+    """
+    replica = replica_router.route(client_key(request))
+    if replica is None:
+        yield db
+        return
+    read_db = replica["sessionmaker"]()
+    read_db.info["replica"] = replica["name"]
+    try:
+        yield read_db
+    finally:
+        read_db.close()
@@ -1,8 +1,20 @@
 # app/main.py
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .api import user_routes, verification_routes
-from .database import engine, Base
+from fastapi.responses import PlainTextResponse
+from .api import user_routes, verification_routes, admin_routes, credential_routes
+import os
+from .database import engine, Base, SessionLocal, replica_router
+from .core import webhooks, signer, expiry, status_list
+from .core.blockchain import get_transaction_scheduler
+from .core.bloom import availability_index
+from .core.metrics import MetricsMiddleware, instrument_sqlalchemy, registry
+from .core import tracing
+from .core.profiler import ProfilerMiddleware, profiler, configure_from_env
+
+# 为数据库语句计时，并在采样的请求链路中记录span
+instrument_sqlalchemy()
+tracing.instrument_sqlalchemy()
 
 # 创建数据库表
 Base.metadata.create_all(bind=engine)
@@ -19,12 +31,106 @@ app.add_middleware(
     allow_headers=["*"],  # 允许所有HTTP头
 )
 
+# 记录每个路由的请求处理时间
+app.add_middleware(MetricsMiddleware)
+# 按头部采样记录请求链路，响应中返回 X-Trace-Id
+app.add_middleware(tracing.TracingMiddleware)
+# 携带 x-profile 和管理令牌的请求对所在路由采样
+app.add_middleware(ProfilerMiddleware, profiler=profiler, token_checker=admin_routes.is_valid_admin_token)
+
 # 包含API路由
 app.include_router(user_routes.router, prefix="/api/users", tags=["users"])
 app.include_router(verification_routes.router, prefix="/api/verifications", tags=["verifications"])
+app.include_router(admin_routes.router, prefix="/api/admin", tags=["admin"])
+app.include_router(credential_routes.router, prefix="/api/credentials", tags=["credentials"])
+
+# 登记可采样的路由，并按 PROFILE_ROUTES 开启采样
+configure_from_env(app.routes)
+
+
+@app.on_event("startup")
+def start_background_workers():
+    """启动后台任务"""
+    # 在后台从用户表构建用户名/邮箱过滤器，完成前可用性检查直接查询数据库
+    availability_index.rebuild_async(SessionLocal)
+    if os.getenv("WEBHOOK_DISPATCHER_ENABLED", "true").lower() == "true":
+        webhooks.start_dispatcher(SessionLocal)
+    if signer.SIGNER_COORDINATION:
+        # 多副本部署：只有持有签名租约的副本发送链上交易
+        signer.start_coordinator(SessionLocal, verification_routes.blockchain)
+    if expiry.EXPIRY_SWEEPER_ENABLED:
+        # 到期的批准标记为过期，并排队撤销链上凭证
+        expiry.start_sweeper(SessionLocal, verification_routes.blockchain)
+    if status_list.STATUS_LIST_PUBLISHER_ENABLED:
+        # 定期发布凭证状态位图并把摘要上链
+        status_list.start_publisher(SessionLocal, verification_routes.blockchain)
+
+
+@app.on_event("shutdown")
+def stop_background_workers():
+    """停止后台任务"""
+    webhooks.stop_dispatcher()
+    expiry.stop_sweeper()
+    status_list.stop_publisher()
+    signer.stop_coordinator()
+    scheduler = get_transaction_scheduler()
+    if scheduler is not None:
+        scheduler.stop()
 
 
 @app.get("/")
 async def root():
     """健康检查端点"""
-    return {"message": "DLT身份验证系统API正在运行"}
\ No newline at end of file
+    return {"message": "DLT身份验证系统API正在运行"}
+
+
+@app.get("/api/chain/scheduler")
+async def chain_scheduler_metrics():
+    """链上交易调度器的队列深度、等待时间和区块预算使用情况"""
+    scheduler = get_transaction_scheduler()
+    if scheduler is None:
+        return {"block": None, "classes": {}}
+    return scheduler.metrics()
+
+
+def _scheduler_metrics():
+    """把交易调度器的状态输出为仪表盘指标"""
+    scheduler = get_transaction_scheduler()
+    if scheduler is None:
+        return []
+    classes = scheduler.metrics()["classes"]
+    return [
+        ("chain_scheduler_queue_depth", "gauge", "各优先级排队中的链上写操作数",
+         [({"priority": name}, stats["queue_depth"]) for name, stats in classes.items()]),
+        ("chain_scheduler_wait_p95_seconds", "gauge", "各优先级最近排队等待时间的P95",
+         [({"priority": name}, stats["wait_seconds"]["p95"]) for name, stats in classes.items()]),
+        ("chain_scheduler_jobs_completed_total", "counter", "各优先级已完成的链上写操作数",
+         [({"priority": name}, stats["completed"]) for name, stats in classes.items()]),
+        ("chain_scheduler_jobs_failed_total", "counter", "各优先级失败的链上写操作数",
+         [({"priority": name}, stats["failed"]) for name, stats in classes.items()]),
+    ]
+
+
+registry.add_collector(_scheduler_metrics)
+
+
+def _replica_metrics():
+    """只读副本的复制延迟和读请求路由统计"""
+    status = replica_router.status()
+    return [
+        ("db_replica_lag_seconds", "gauge", "只读副本最近一次检查到的复制延迟",
+         [({"replica": r["name"]}, r["lag_seconds"]) for r in status["replicas"] if r["lag_seconds"] is not None]),
+        ("db_replica_healthy", "gauge", "只读副本是否可用（延迟在上限内）",
+         [({"replica": r["name"]}, int(r["healthy"])) for r in status["replicas"]]),
+        ("db_read_routing_total", "counter", "读请求的路由结果",
+         [({"target": target}, count) for target, count in status["routed"].items()]),
+    ]
+
+
+registry.add_collector(_replica_metrics)
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """以文本暴露格式输出监控指标"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -1,9 +1,10 @@
 # app/models/models.py
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Date, DateTime, Text, Index, LargeBinary, event
+from sqlalchemy.orm import Session, relationship
 from sqlalchemy.sql import func
 from ..database import Base
 import uuid
+from datetime import datetime
 
 def generate_uuid():
     """生成唯一标识符"""
@@ -23,6 +24,8 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     is_active = Column(Boolean, default=True)
     is_verified = Column(Boolean, default=False)  # 用户是否通过身份验证
+    version_id = Column(Integer, nullable=False, default=1, server_default="1")  # 行版本号，每次更新自动递增，用于ETag
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     # 关系
     verifications = relationship("Verification", back_populates="user")
@@ -36,15 +39,99 @@ class Verification(Base):
     user_id = Column(String, ForeignKey("users.id"))
     verifier_id = Column(String, ForeignKey("verifiers.id"))  # 验证者ID
     verification_type = Column(String)  # KYC, AML等
-    status = Column(String)  # pending, approved, rejected
+    status = Column(String)  # pending, approved, rejected, expired
     transaction_hash = Column(String)  # 区块链交易哈希
+    expires_at = Column(DateTime, nullable=True)  # 批准后凭证的过期时间（UTC），与链上 expiresAt 一致
+    status_index = Column(Integer, nullable=True)  # 凭证在状态列表位图中的位置，首次批准时分配
+    credential = Column(Text, nullable=True)  # 批准时签发的链下凭证（EdDSA签名的JWT）
     verification_date = Column(DateTime(timezone=True), server_default=func.now())
     notes = Column(Text, nullable=True)
+    priority = Column(Integer, nullable=False, default=0, server_default="0")  # 优先级，数值越大越先被领取
+    leased_by = Column(String, nullable=True)  # 领取该请求的工作进程
+    lease_id = Column(String, nullable=True)  # 领取批次标识
+    lease_expires_at = Column(DateTime, nullable=True)  # 租约到期时间（UTC），到期后可被重新领取
+    version_id = Column(Integer, nullable=False, default=1, server_default="1")  # 行版本号，每次更新自动递增，用于ETag
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     # 关系
     user = relationship("User", back_populates="verifications")
     verifier = relationship("Verifier", back_populates="verifications")
 
+    __table_args__ = (
+        # 领取队列：按验证者和状态过滤，按优先级和时间排序
+        Index("ix_verifications_claim", "verifier_id", "status", "priority", "verification_date"),
+        # 跨机构复用：按用户和验证类型查找已批准的验证
+        Index("ix_verifications_reuse", "user_id", "verification_type", "status", "verification_date"),
+        # 过期清理：按到期时间顺序读取已批准的验证
+        Index("ix_verifications_expiry", "status", "expires_at"),
+        # 状态列表位置唯一
+        Index("uq_verifications_status_index", "status_index", unique=True),
+    )
+
+@event.listens_for(Session, "before_flush")
+def _bump_version_ids(session, flush_context, instances):
+    # 版本号只用于ETag，不做乐观锁检查：用 version_id + 1 表达式在数据库中原子递增，
+    # 并发更新同一行（如同一用户的两次批准、过期清理的Core更新）不会因版本不一致而失败
+    for obj in session.dirty:
+        if isinstance(obj, (User, Verification)) and session.is_modified(obj, include_collections=False):
+            obj.version_id = type(obj).version_id + 1
+
+class VerificationArchive(Base):
+    """已归档的验证记录，完整行数据压缩存放，只保留按ID和用户查找所需的列"""
+    __tablename__ = "verifications_archive"
+
+    id = Column(String, primary_key=True)  # 与原验证记录ID相同
+    user_id = Column(String, index=True)
+    verifier_id = Column(String, index=True)
+    verification_type = Column(String)
+    status = Column(String)
+    verification_date = Column(DateTime)
+    archived_at = Column(DateTime, server_default=func.now())
+    payload = Column(LargeBinary)  # zlib压缩的JSON行数据
+
+class VerificationCounter(Base):
+    """按状态、类型和验证者累计的验证数量，与验证的创建和状态变更在同一事务中更新"""
+    __tablename__ = "verification_counters"
+
+    status = Column(String, primary_key=True)
+    verification_type = Column(String, primary_key=True)
+    verifier_id = Column(String, primary_key=True)
+    shard = Column(Integer, primary_key=True, default=0)  # 同一计数分散到多行，减少并发事务的行锁竞争
+    count = Column(Integer, nullable=False, default=0)
+
+class VerificationDailyCount(Base):
+    """按天统计的验证请求数和处理数"""
+    __tablename__ = "verification_daily_counts"
+
+    day = Column(Date, primary_key=True)  # UTC日期
+    event = Column(String, primary_key=True)  # requested, approved, rejected, expired
+    verification_type = Column(String, primary_key=True)
+    verifier_id = Column(String, primary_key=True)
+    shard = Column(Integer, primary_key=True, default=0)
+    count = Column(Integer, nullable=False, default=0)
+
+class CredentialStatusList(Base):
+    """凭证状态列表：每个已签发的凭证占一位，1 表示已撤销、过期或不再有效"""
+    __tablename__ = "credential_status_lists"
+
+    id = Column(String, primary_key=True)  # 列表标识
+    next_index = Column(Integer, nullable=False, default=0)  # 下一个可分配的位置
+    size = Column(Integer, nullable=True)  # 已发布位图的位数
+    encoded = Column(LargeBinary, nullable=True)  # gzip压缩的位图
+    digest = Column(String, nullable=True)  # 压缩后位图的sha256，0x开头
+    published_at = Column(DateTime, nullable=True)
+    anchored_digest = Column(String, nullable=True)  # 最近一次上链的摘要
+    anchor_tx_hash = Column(String, nullable=True)
+    anchored_at = Column(DateTime, nullable=True)
+
+class IssuerKey(Base):
+    """签发链下凭证使用过的公钥，用于验证签名和发布JWKS"""
+    __tablename__ = "issuer_keys"
+
+    kid = Column(String, primary_key=True)  # 公钥的JWK指纹（RFC 7638）
+    public_key = Column(String)  # base64url编码的Ed25519公钥
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class Verifier(Base):
     """验证者模型，代表金融机构"""
     __tablename__ = "verifiers"
@@ -54,6 +141,10 @@ class Verifier(Base):
     blockchain_address = Column(String, unique=True)  # 验证者区块链地址
     api_key = Column(String, unique=True)  # 用于API认证
     is_active = Column(Boolean, default=True)
+    supported_types = Column(String, nullable=True)  # 支持的验证类型，逗号分隔，为空表示全部
+    weight = Column(Integer, nullable=False, default=1, server_default="1")  # 分配权重，用于加权轮询
+    webhook_url = Column(String, nullable=True)  # 新任务通知地址
+    webhook_secret = Column(String, nullable=True)  # 通知签名密钥
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # 关系
@@ -66,10 +157,75 @@ class Document(Base):
     id = Column(String, primary_key=True, default=generate_uuid)
     user_id = Column(String, ForeignKey("users.id"))
     document_type = Column(String)  # passport, id_card, drivers_license等
-    document_hash = Column(String)  # 文档哈希值，而不是实际文档
+    document_hash = Column(String, index=True)  # 文档哈希值，而不是实际文档
+    size_bytes = Column(Integer, nullable=True)  # 服务端接收的文档大小，客户端只提交哈希时为空
     ipfs_hash = Column(String, nullable=True)  # 可选的IPFS哈希，用于分布式存储
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
     status = Column(String, default="pending")  # pending, verified, rejected
     
     # 关系
-    user = relationship("User", back_populates="documents")
\ No newline at end of file
+    user = relationship("User", back_populates="documents")
+
+class WebhookEvent(Base):
+    """待通知给验证者的事件（发件箱），由投递任务合并成批次"""
+    __tablename__ = "webhook_events"
+
+    id = Column(String, primary_key=True, default=generate_uuid)
+    verifier_id = Column(String, ForeignKey("verifiers.id"), index=True)
+    event_type = Column(String)  # verification.assigned等
+    payload = Column(Text)  # JSON格式的事件内容
+    delivery_id = Column(String, ForeignKey("webhook_deliveries.id"), nullable=True, index=True)  # 所属投递批次
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class WebhookDelivery(Base):
+    """一次批量通知投递，失败时按指数退避重试"""
+    __tablename__ = "webhook_deliveries"
+
+    id = Column(String, primary_key=True, default=generate_uuid)
+    verifier_id = Column(String, ForeignKey("verifiers.id"))
+    status = Column(String, default="pending")  # pending, delivered, failed
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime)  # 下次投递时间（UTC）
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    delivered_at = Column(DateTime, nullable=True)
+
+    events = relationship("WebhookEvent")
+
+    __table_args__ = (
+        Index("ix_webhook_deliveries_due", "status", "next_attempt_at"),
+    )
+
+class SignerLease(Base):
+    """共享签名账户的租约，持有者是唯一发送链上交易的副本"""
+    __tablename__ = "signer_leases"
+
+    name = Column(String, primary_key=True)  # 签名账户标识
+    holder = Column(String)  # 持有租约的副本
+    epoch = Column(Integer, nullable=False, default=1)  # 每次换主递增，用于隔离旧主
+    lease_expires_at = Column(DateTime)  # 租约到期时间（UTC），到期后其他副本可接管
+    renewed_at = Column(DateTime)
+
+class ChainWriteRequest(Base):
+    """交给签名副本执行的链上写操作"""
+    __tablename__ = "chain_write_requests"
+
+    id = Column(String, primary_key=True, default=generate_uuid)
+    priority = Column(String)  # 交易调度器的优先级类别
+    method = Column(String)  # BlockchainManager 方法名
+    args = Column(Text)  # JSON格式的方法参数
+    gas = Column(Integer)
+    tx_count = Column(Integer, default=1)
+    status = Column(String, default="pending")  # pending, running, sending, done, failed
+    requested_by = Column(String)  # 提交请求的副本
+    claimed_by = Column(String, nullable=True)  # 执行请求的签名副本
+    epoch = Column(Integer, nullable=True)  # 执行时的租约代数
+    attempts = Column(Integer, default=0)
+    result = Column(Text, nullable=True)  # JSON格式的返回值，通常为交易哈希
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_chain_write_requests_status", "status", "created_at"),
+    )
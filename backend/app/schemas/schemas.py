@@ -32,6 +32,8 @@ class VerifierBase(BaseModel):
     """验证者基本信息"""
     name: str
     blockchain_address: str
+    supported_types: Optional[str] = None  # 逗号分隔，为空表示支持所有验证类型
+    weight: Optional[int] = 1
 
 class VerifierCreate(VerifierBase):
     """创建验证者所需信息"""
@@ -47,6 +49,16 @@ class VerifierResponse(VerifierBase):
     class Config:
         orm_mode = True
 
+class WebhookRegistration(BaseModel):
+    """注册验证者通知地址所需信息"""
+    url: str
+    secret: Optional[str] = None
+
+class WebhookRegistrationResponse(BaseModel):
+    """通知地址注册结果"""
+    url: str
+    secret: str
+
 # 验证模式
 class VerificationBase(BaseModel):
     """验证基本信息"""
@@ -65,10 +77,91 @@ class VerificationResponse(VerificationBase):
     status: str
     transaction_hash: Optional[str]
     verification_date: datetime
+    priority: Optional[int] = 0
+    expires_at: Optional[datetime] = None
+    status_index: Optional[int] = None
+    credential: Optional[str] = None
 
     class Config:
         orm_mode = True
 
+class ReusableVerificationResponse(BaseModel):
+    """可复用的已批准验证"""
+    id: str
+    user_id: str
+    verifier_id: str
+    verification_type: str
+    verification_date: datetime
+    expires_at: Optional[datetime] = None
+    transaction_hash: Optional[str] = None
+
+class VerificationClaimResponse(BaseModel):
+    """领取验证请求的响应模型"""
+    lease_id: str
+    lease_expires_at: datetime
+    verifications: List[VerificationResponse]
+
+# 批量验证决定
+class VerificationDecision(BaseModel):
+    """批量更新中的单个验证决定"""
+    verification_id: str
+    status: str
+    transaction_hash: Optional[str] = None
+    notes: Optional[str] = None
+
+class VerificationBatchUpdate(BaseModel):
+    """批量更新验证状态所需信息"""
+    decisions: List[VerificationDecision]
+
+class VerificationBatchItemResult(BaseModel):
+    """批量更新中单个决定的处理结果"""
+    verification_id: str
+    success: bool
+    status_code: int
+    detail: Optional[str] = None
+    verification: Optional[VerificationResponse] = None
+
+class VerificationBatchResponse(BaseModel):
+    """批量更新验证状态的响应模型"""
+    results: List[VerificationBatchItemResult]
+    succeeded: int
+    failed: int
+    queued_chain_writes: int
+
+# 批量状态查询
+class VerificationStatusQuery(BaseModel):
+    """批量状态查询中的单个 (用户, 验证类型)"""
+    user_id: str
+    verification_type: str
+
+class VerificationStatusBatchRequest(BaseModel):
+    """批量查询验证状态所需信息"""
+    queries: List[VerificationStatusQuery]
+    include_proofs: bool = False
+
+# 链下凭证验证
+class CredentialVerifyRequest(BaseModel):
+    """批量验证链下凭证所需信息"""
+    credentials: List[str]
+    check_status: bool = True
+
+class CredentialVerifyResult(BaseModel):
+    """单个凭证的验证结果"""
+    valid: bool
+    error: Optional[str] = None
+    verification_id: Optional[str] = None
+    user_id: Optional[str] = None
+    verification_type: Optional[str] = None
+    verifier_id: Optional[str] = None
+    status_index: Optional[int] = None
+    expires_at: Optional[datetime] = None
+
+class CredentialVerifyResponse(BaseModel):
+    """批量验证链下凭证的响应模型"""
+    results: List[CredentialVerifyResult]
+    valid: int
+    invalid: int
+
 # 文档模式
 class DocumentBase(BaseModel):
     """文档基本信息"""
@@ -86,6 +179,7 @@ class DocumentResponse(DocumentBase):
     user_id: str
     status: str
     uploaded_at: datetime
+    size_bytes: Optional[int] = None
 
     class Config:
         orm_mode = True
@@ -112,4 +206,9 @@ class VerificationUpdate(BaseModel):
 class UserUpdate(BaseModel):
     full_name: Optional[str] = None
     id_number: Optional[str] = None
-    # 可以添加其他可更新的字段
\ No newline at end of file
+    # 可以添加其他可更新的字段
+# 采样分析开关
+class ProfilerStart(BaseModel):
+    """开启路由采样所需信息"""
+    routes: List[str]
+    duration_seconds: Optional[float] = 60
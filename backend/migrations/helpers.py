@@ -0,0 +1,53 @@
+"""迁移共用的辅助函数
+
+应用启动时 create_all 会先创建缺少的表，新建的数据库也已经有全部的列和索引，
+因此升级的每一步先检查对象是否已存在，对新建的和部分升级过的数据库都可以执行。
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+def existing_columns(table):
+    return {column["name"] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def existing_indexes(table):
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def add_columns(table, columns):
+    existing = existing_columns(table)
+    for column in columns:
+        if column.name not in existing:
+            op.add_column(table, column)
+
+
+def add_updated_at(table, backfill_from):
+    """添加 updated_at 并用已有的时间列回填
+
+    SQLite 的 ADD COLUMN 不接受 CURRENT_TIMESTAMP 这类非常量默认值，只在其他数据库上设置服务端默认值。
+    """
+    if "updated_at" in existing_columns(table):
+        return
+    sqlite = op.get_bind().dialect.name == "sqlite"
+    op.add_column(table, sa.Column(
+        "updated_at", sa.DateTime(timezone=True), server_default=None if sqlite else sa.func.now()
+    ))
+    op.execute(f"UPDATE {table} SET updated_at = {backfill_from} WHERE updated_at IS NULL")
+
+
+def create_index(name, table, columns, unique=False):
+    if name not in existing_indexes(table):
+        op.create_index(name, table, columns, unique=unique)
+
+
+def create_table(name, *columns, **kwargs):
+    if not sa.inspect(op.get_bind()).has_table(name):
+        op.create_table(name, *columns, **kwargs)
+
+
+def drop_columns(table, names):
+    """删除列；SQLite 不能删除带索引或约束的列，按表重建"""
+    with op.batch_alter_table(table) as batch:
+        for name in names:
+            batch.drop_column(name)
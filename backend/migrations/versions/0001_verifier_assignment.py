@@ -0,0 +1,29 @@
+"""给验证者添加分配引擎使用的支持类型和权重
+
+初始版本只用 create_all 建表，应用启动时 create_all 只会创建缺少的表，不会给已有的表加列。
+之后的每个迁移给已有的表补上对应功能新增的列、索引和表。
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+import sqlalchemy as sa
+
+from migrations.helpers import add_columns, drop_columns
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # NOT NULL 的列带服务端默认值，已有行直接得到初始值
+    add_columns("verifiers", [
+        sa.Column("supported_types", sa.String(), nullable=True),
+        sa.Column("weight", sa.Integer(), nullable=False, server_default="1"),
+    ])
+
+
+def downgrade():
+    drop_columns("verifiers", ["supported_types", "weight"])
@@ -0,0 +1,30 @@
+"""给验证记录添加工作队列的优先级和租约
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import add_columns, create_index, drop_columns
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    add_columns("verifications", [
+        sa.Column("priority", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("leased_by", sa.String(), nullable=True),
+        sa.Column("lease_id", sa.String(), nullable=True),
+        sa.Column("lease_expires_at", sa.DateTime(), nullable=True),
+    ])
+    create_index("ix_verifications_claim", "verifications", ["verifier_id", "status", "priority", "verification_date"])
+
+
+def downgrade():
+    op.drop_index("ix_verifications_claim", table_name="verifications")
+    drop_columns("verifications", ["priority", "leased_by", "lease_id", "lease_expires_at"])
@@ -0,0 +1,49 @@
+"""添加验证者的通知地址和通知发件箱
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import add_columns, create_table, drop_columns
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    add_columns("verifiers", [
+        sa.Column("webhook_url", sa.String(), nullable=True),
+        sa.Column("webhook_secret", sa.String(), nullable=True),
+    ])
+    create_table(
+        "webhook_deliveries",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("verifier_id", sa.String(), sa.ForeignKey("verifiers.id")),
+        sa.Column("status", sa.String()),
+        sa.Column("attempts", sa.Integer()),
+        sa.Column("next_attempt_at", sa.DateTime()),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("delivered_at", sa.DateTime(), nullable=True),
+        sa.Index("ix_webhook_deliveries_due", "status", "next_attempt_at"),
+    )
+    create_table(
+        "webhook_events",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("verifier_id", sa.String(), sa.ForeignKey("verifiers.id"), index=True),
+        sa.Column("event_type", sa.String()),
+        sa.Column("payload", sa.Text()),
+        sa.Column("delivery_id", sa.String(), sa.ForeignKey("webhook_deliveries.id"), nullable=True, index=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+
+def downgrade():
+    op.drop_table("webhook_events")
+    op.drop_table("webhook_deliveries")
+    drop_columns("verifiers", ["webhook_url", "webhook_secret"])
@@ -0,0 +1,30 @@
+"""给用户和验证记录添加ETag使用的行版本号和更新时间
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+import sqlalchemy as sa
+
+from migrations.helpers import add_columns, add_updated_at, drop_columns
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    add_columns("users", [
+        sa.Column("version_id", sa.Integer(), nullable=False, server_default="1"),
+    ])
+    add_updated_at("users", "created_at")
+    add_columns("verifications", [
+        sa.Column("version_id", sa.Integer(), nullable=False, server_default="1"),
+    ])
+    add_updated_at("verifications", "verification_date")
+
+
+def downgrade():
+    drop_columns("verifications", ["version_id", "updated_at"])
+    drop_columns("users", ["version_id", "updated_at"])
@@ -0,0 +1,27 @@
+"""添加文档大小，并按文档哈希建立索引
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import add_columns, create_index, drop_columns
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    add_columns("documents", [
+        sa.Column("size_bytes", sa.Integer(), nullable=True),
+    ])
+    create_index("ix_documents_document_hash", "documents", ["document_hash"])
+
+
+def downgrade():
+    op.drop_index("ix_documents_document_hash", table_name="documents")
+    drop_columns("documents", ["size_bytes"])
@@ -0,0 +1,22 @@
+"""添加跨机构复用查找已批准验证的索引
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+from migrations.helpers import create_index
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    create_index("ix_verifications_reuse", "verifications", ["user_id", "verification_type", "status", "verification_date"])
+
+
+def downgrade():
+    op.drop_index("ix_verifications_reuse", table_name="verifications")
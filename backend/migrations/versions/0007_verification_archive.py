@@ -0,0 +1,34 @@
+"""添加已归档验证记录表
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import create_table
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    create_table(
+        "verifications_archive",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("user_id", sa.String(), index=True),
+        sa.Column("verifier_id", sa.String(), index=True),
+        sa.Column("verification_type", sa.String()),
+        sa.Column("status", sa.String()),
+        sa.Column("verification_date", sa.DateTime()),
+        sa.Column("archived_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("payload", sa.LargeBinary()),
+    )
+
+
+def downgrade():
+    # 归档的记录已从 verifications 中删除，回退前需要先恢复需要保留的记录
+    op.drop_table("verifications_archive")
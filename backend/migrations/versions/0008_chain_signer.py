@@ -0,0 +1,50 @@
+"""添加签名账户租约和链上写请求表
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import create_table
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    create_table(
+        "signer_leases",
+        sa.Column("name", sa.String(), primary_key=True),
+        sa.Column("holder", sa.String()),
+        sa.Column("epoch", sa.Integer(), nullable=False),
+        sa.Column("lease_expires_at", sa.DateTime()),
+        sa.Column("renewed_at", sa.DateTime()),
+    )
+    create_table(
+        "chain_write_requests",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("priority", sa.String()),
+        sa.Column("method", sa.String()),
+        sa.Column("args", sa.Text()),
+        sa.Column("gas", sa.Integer()),
+        sa.Column("tx_count", sa.Integer()),
+        sa.Column("status", sa.String()),
+        sa.Column("requested_by", sa.String()),
+        sa.Column("claimed_by", sa.String(), nullable=True),
+        sa.Column("epoch", sa.Integer(), nullable=True),
+        sa.Column("attempts", sa.Integer()),
+        sa.Column("result", sa.Text(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("completed_at", sa.DateTime(), nullable=True),
+        sa.Index("ix_chain_write_requests_status", "status", "created_at"),
+    )
+
+
+def downgrade():
+    op.drop_table("chain_write_requests")
+    op.drop_table("signer_leases")
@@ -0,0 +1,41 @@
+"""添加验证数量计数表和每日统计表
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import create_table
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 计数表建好后为空，用 rebuild_counters 从已有的验证记录重建
+    create_table(
+        "verification_counters",
+        sa.Column("status", sa.String(), primary_key=True),
+        sa.Column("verification_type", sa.String(), primary_key=True),
+        sa.Column("verifier_id", sa.String(), primary_key=True),
+        sa.Column("shard", sa.Integer(), primary_key=True),
+        sa.Column("count", sa.Integer(), nullable=False),
+    )
+    create_table(
+        "verification_daily_counts",
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("event", sa.String(), primary_key=True),
+        sa.Column("verification_type", sa.String(), primary_key=True),
+        sa.Column("verifier_id", sa.String(), primary_key=True),
+        sa.Column("shard", sa.Integer(), primary_key=True),
+        sa.Column("count", sa.Integer(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("verification_daily_counts")
+    op.drop_table("verification_counters")
@@ -0,0 +1,27 @@
+"""给验证记录添加凭证过期时间和过期清理索引
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import add_columns, create_index, drop_columns
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    add_columns("verifications", [
+        sa.Column("expires_at", sa.DateTime(), nullable=True),
+    ])
+    create_index("ix_verifications_expiry", "verifications", ["status", "expires_at"])
+
+
+def downgrade():
+    op.drop_index("ix_verifications_expiry", table_name="verifications")
+    drop_columns("verifications", ["expires_at"])
@@ -0,0 +1,40 @@
+"""添加凭证状态列表和验证记录在列表中的位置
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import add_columns, create_index, create_table, drop_columns
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    add_columns("verifications", [
+        sa.Column("status_index", sa.Integer(), nullable=True),
+    ])
+    create_index("uq_verifications_status_index", "verifications", ["status_index"], unique=True)
+    create_table(
+        "credential_status_lists",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("next_index", sa.Integer(), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=True),
+        sa.Column("encoded", sa.LargeBinary(), nullable=True),
+        sa.Column("digest", sa.String(), nullable=True),
+        sa.Column("published_at", sa.DateTime(), nullable=True),
+        sa.Column("anchored_digest", sa.String(), nullable=True),
+        sa.Column("anchor_tx_hash", sa.String(), nullable=True),
+        sa.Column("anchored_at", sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_table("credential_status_lists")
+    op.drop_index("uq_verifications_status_index", table_name="verifications")
+    drop_columns("verifications", ["status_index"])
@@ -0,0 +1,32 @@
+"""添加批准时签发的链下凭证和签发公钥表
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import add_columns, create_table, drop_columns
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    add_columns("verifications", [
+        sa.Column("credential", sa.Text(), nullable=True),
+    ])
+    create_table(
+        "issuer_keys",
+        sa.Column("kid", sa.String(), primary_key=True),
+        sa.Column("public_key", sa.String()),
+        sa.Column("created_at", sa.DateTime()),
+    )
+
+
+def downgrade():
+    op.drop_table("issuer_keys")
+    drop_columns("verifications", ["credential"])
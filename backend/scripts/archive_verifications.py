@@ -0,0 +1,78 @@
+"""验证记录归档和分区维护
+
+- archive: 把超过保留期的已处理验证移入压缩归档表；PostgreSQL 上随后删除已清空的旧分区
+- partition: 把 PostgreSQL 上的 verifications 表转换为按月范围分区（一次性，在维护窗口内运行）
+- ensure-partitions: 预先创建未来月份的分区，应与 archive 一起定期运行
+
+用法（在项目根目录下运行）:
+    python backend/scripts/archive_verifications.py archive --retention-days 365
+    python backend/scripts/archive_verifications.py partition --months-ahead 3
+    python backend/scripts/archive_verifications.py ensure-partitions --months-ahead 3
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from backend.app.database import Base  # noqa: E402
+from backend.app.core.archive import (  # noqa: E402
+    ARCHIVE_BATCH_SIZE,
+    ARCHIVE_RETENTION_DAYS,
+    archive_closed_verifications,
+    archive_cutoff,
+    drop_empty_partitions,
+    ensure_partitions,
+    is_partitioned,
+    partition_verifications,
+)
+
+
+def run_archive(engine, args):
+    cutoff = archive_cutoff(retention_days=args.retention_days)
+    started = time.perf_counter()
+    with Session(engine) as session:
+        archived = archive_closed_verifications(session, before=cutoff, batch_size=args.batch_size)
+    print(f"归档 {archived} 条早于 {cutoff:%Y-%m-%d} 的验证记录，耗时 {time.perf_counter() - started:.1f} 秒")
+
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            if is_partitioned(conn):
+                dropped = drop_empty_partitions(conn, cutoff)
+                print(f"删除已清空的分区: {', '.join(dropped) or '无'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="验证记录归档和分区维护")
+    parser.add_argument("command", choices=["archive", "partition", "ensure-partitions"])
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///./identity_system.db"),
+                        help="目标数据库，默认使用 DATABASE_URL")
+    parser.add_argument("--retention-days", type=int, default=ARCHIVE_RETENTION_DAYS, help="热表中保留的天数")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE, help="每批归档的行数")
+    parser.add_argument("--months-ahead", type=int, default=3, help="预先创建的未来月份分区数")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    # 归档表可能尚未创建
+    Base.metadata.create_all(bind=engine)
+
+    if args.command == "archive":
+        run_archive(engine, args)
+        return
+
+    if engine.dialect.name != "postgresql":
+        parser.error("分区只支持 PostgreSQL")
+    with engine.begin() as conn:
+        if args.command == "partition":
+            count = partition_verifications(conn, args.months_ahead)
+        else:
+            count = ensure_partitions(conn, args.months_ahead)
+    print(f"月度分区共 {count} 个")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+"""端到端API负载基准
+
+以可配置的并发驱动真实的FastAPI应用，每个虚拟用户依次执行：
+注册 → 登录 → 上传文档 → 请求验证 → 验证者批准，统计每一步的吞吐量和 P50/P95/P99 延迟。
+所有用户完成一步后才开始下一步，每一步单独计时。
+
+区块链管理器在导入应用之前替换为离线实现（可模拟节点延迟），数据库使用临时SQLite文件，
+请求通过 httpx 的 ASGI 传输直接进入应用，不需要网络。
+
+用法（在项目根目录下运行）:
+    python benchmarks/api_benchmark.py --users 40 --concurrency 8
+    python benchmarks/api_benchmark.py --check             # 与 baseline.json 比较，退化超过阈值时退出码为1
+    python benchmarks/api_benchmark.py --update-baseline   # 用本次结果更新 baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+STEPS = ["register", "login", "upload_document", "request_verification", "approve"]
+VERIFIER_COUNT = 4
+
+
+def configure_environment(workdir):
+    """在导入应用之前设置环境：临时数据库和文档存储，关闭后台投递和链路导出"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'benchmark.db')}"
+    os.environ["DOCUMENT_STORE_PATH"] = os.path.join(workdir, "document_store")
+    os.environ["WEBHOOK_DISPATCHER_ENABLED"] = "false"
+    os.environ["TRACE_EXPORTER"] = "none"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+def install_offline_blockchain(chain_latency):
+    """把区块链管理器替换为离线实现
+
+    与 tests/conftest.py 中的 MockBlockchainManager 一样返回固定交易哈希，
+    另外按 chain_latency（秒）模拟等待交易回执的时间。
+    """
+    from backend.app.core import blockchain
+
+    def offline_init(self):
+        self.web3 = None
+        self.contract = None
+        self.contract_address = "0x" + "0" * 40
+
+    def offline_write(tx_marker):
+        def write(self, *args):
+            if chain_latency:
+                time.sleep(chain_latency)
+            return "0x" + tx_marker * 64
+        return write
+
+    def offline_issue(self, credentials):
+        # 批量颁发只等待一次回执，每个凭证返回各自的结果
+        if chain_latency:
+            time.sleep(chain_latency)
+        return [{"transaction_hash": "0x" + "2" * 64, "error": None} for _ in credentials]
+
+    blockchain.BlockchainManager.__init__ = offline_init
+    blockchain.BlockchainManager.register_identity = offline_write("1")
+    blockchain.BlockchainManager.issue_credentials_batch = offline_issue
+    blockchain.BlockchainManager.check_verification_status = lambda self, *args: True
+
+
+def seed_verifiers(session_factory, count):
+    """确保存在 count 个验证者，返回 {验证者ID: api_key}（重复运行时复用已有验证者）"""
+    from backend.app.models.models import Verifier
+
+    db = session_factory()
+    try:
+        keys = {verifier.id: verifier.api_key for verifier in db.query(Verifier).all()}
+        for i in range(len(keys), count):
+            verifier = Verifier(
+                name=f"Benchmark Verifier {i}",
+                blockchain_address="0x" + f"{i + 1:040x}",
+                api_key=f"benchmark_key_{i}_{uuid.uuid4().hex}",
+            )
+            db.add(verifier)
+            db.flush()
+            keys[verifier.id] = verifier.api_key
+        db.commit()
+        return keys
+    finally:
+        db.close()
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class StepRecorder:
+    """记录每一步的耗时、失败和阶段用时"""
+
+    def __init__(self):
+        self.latencies = {step: [] for step in STEPS}
+        self.errors = {step: 0 for step in STEPS}
+        self.wall_seconds = {step: 0.0 for step in STEPS}
+
+    async def run(self, step, coroutine, expected_status):
+        start = time.perf_counter()
+        response = await coroutine
+        self.latencies[step].append(time.perf_counter() - start)
+        if response.status_code not in expected_status:
+            self.errors[step] += 1
+            raise RuntimeError(f"{step} 返回 {response.status_code}: {response.text[:200]}")
+        return response
+
+    def summary(self):
+        result = {}
+        for step in STEPS:
+            values = sorted(self.latencies[step])
+            wall_seconds = self.wall_seconds[step]
+            result[step] = {
+                "count": len(values),
+                "errors": self.errors[step],
+                "throughput_per_second": round(len(values) / wall_seconds, 2) if wall_seconds else 0.0,
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p95_ms": round(percentile(values, 95) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+            }
+        return result
+
+
+async def register(client, recorder, user):
+    response = await recorder.run("register", client.post("/api/users/register", json={
+        "username": user["username"],
+        "email": f"{user['username']}@example.com",
+        "password": user["password"],
+        "full_name": f"Benchmark User {user['index']}",
+        "blockchain_address": "0x" + uuid.uuid4().hex + uuid.uuid4().hex[:8],
+    }), (201,))
+    user["id"] = response.json()["id"]
+
+
+async def login(client, recorder, user):
+    response = await recorder.run("login", client.post("/api/users/login", json={
+        "username": user["username"],
+        "password": user["password"],
+    }), (200,))
+    user["headers"] = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def upload_document(client, recorder, user):
+    await recorder.run("upload_document", client.post(
+        "/api/users/documents/upload",
+        data={"document_type": "passport"},
+        files={"file": (f"passport_{user['username']}.bin", user["document"], "application/octet-stream")},
+        headers=user["headers"],
+    ), (200, 201))
+
+
+async def request_verification(client, recorder, user):
+    response = await recorder.run("request_verification", client.post("/api/verifications/request", json={
+        "user_id": user["id"],
+        "verification_type": "KYC",
+    }, headers=user["headers"]), (200, 201))
+    user["verification"] = response.json()
+
+
+async def approve(client, recorder, user):
+    verification = user["verification"]
+    await recorder.run("approve", client.put(
+        f"/api/verifications/{verification['id']}",
+        json={"status": "approved", "notes": "benchmark"},
+        headers={"api-key": user["verifier_keys"][verification["verifier_id"]]},
+    ), (200,))
+
+
+STEP_FUNCTIONS = {
+    "register": register,
+    "login": login,
+    "upload_document": upload_document,
+    "request_verification": request_verification,
+    "approve": approve,
+}
+
+
+async def run_benchmark(users, concurrency, document_size, chain_latency):
+    """按阶段执行：所有用户完成一步后再开始下一步
+
+    每一步单独计时，吞吐量和延迟不受其他步骤（例如占用事件循环的bcrypt）干扰，
+    结果在多次运行之间可比较。
+    """
+    import httpx
+
+    install_offline_blockchain(chain_latency)
+    from backend.app.main import app
+    from backend.app.database import SessionLocal
+
+    verifier_keys = seed_verifiers(SessionLocal, VERIFIER_COUNT)
+    document_bytes = os.urandom(document_size)
+    recorder = StepRecorder()
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = []
+    active = []
+    for index in range(users):
+        username = f"bench_{index}_{uuid.uuid4().hex[:8]}"
+        active.append({
+            "index": index,
+            "username": username,
+            "password": "Benchmark_Passw0rd",
+            "document": document_bytes + username.encode(),
+            "verifier_keys": verifier_keys,
+        })
+
+    async def guarded(client, step, user):
+        async with semaphore:
+            try:
+                await STEP_FUNCTIONS[step](client, recorder, user)
+                return user
+            except Exception as e:
+                failures.append(str(e))
+                return None
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=120) as client:
+        start = time.perf_counter()
+        for step in STEPS:
+            step_start = time.perf_counter()
+            results = await asyncio.gather(*(guarded(client, step, user) for user in active))
+            recorder.wall_seconds[step] = time.perf_counter() - step_start
+            # 失败的用户不再参与后续步骤
+            active = [user for user in results if user is not None]
+        wall_seconds = time.perf_counter() - start
+
+    return {
+        "parameters": {
+            "users": users,
+            "concurrency": concurrency,
+            "document_size": document_size,
+            "chain_latency": chain_latency,
+        },
+        "wall_seconds": round(wall_seconds, 3),
+        "flows_per_second": round(len(active) / wall_seconds, 2),
+        "failed_flows": users - len(active),
+        "first_failures": failures[:5],
+        "steps": recorder.summary(),
+    }
+
+
+def merge_runs(runs):
+    """多次运行时每项指标取中位数，减少单次运行的抖动"""
+    if len(runs) == 1:
+        return runs[0]
+    merged = dict(runs[0])
+    merged["wall_seconds"] = round(statistics.median(r["wall_seconds"] for r in runs), 3)
+    merged["flows_per_second"] = round(statistics.median(r["flows_per_second"] for r in runs), 2)
+    merged["failed_flows"] = sum(r["failed_flows"] for r in runs)
+    merged["first_failures"] = [f for r in runs for f in r["first_failures"]][:5]
+    merged["steps"] = {
+        step: {
+            key: (sum(r["steps"][step][key] for r in runs) if key in ("count", "errors")
+                  else round(statistics.median(r["steps"][step][key] for r in runs), 2))
+            for key in runs[0]["steps"][step]
+        }
+        for step in runs[0]["steps"]
+    }
+    merged["parameters"] = dict(runs[0]["parameters"], repeat=len(runs))
+    return merged
+
+
+def compare_with_baseline(result, baseline, threshold, min_delta_ms):
+    """与基线比较
+
+    P50/P95 超过基线的 (1 + threshold) 倍且绝对增加超过 min_delta_ms，或吞吐量低于基线的
+    (1 - threshold) 倍时视为退化。P99 样本太少、抖动大，只报告不判定。
+
+    Returns:
+        list: 退化项说明，为空表示没有超过阈值的退化
+    """
+    regressions = []
+    if result["parameters"] != baseline.get("parameters"):
+        print(f"警告: 本次参数 {result['parameters']} 与基线参数 {baseline.get('parameters')} 不同")
+    if result["failed_flows"]:
+        regressions.append(f"{result['failed_flows']} 个流程失败")
+    for step, base in baseline.get("steps", {}).items():
+        current = result["steps"].get(step)
+        if current is None:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            limit = max(base[key] * (1 + threshold), base[key] + min_delta_ms)
+            if current[key] > limit:
+                regressions.append(f"{step} {key}: {current[key]} > {base[key]} (+{threshold:.0%})")
+        floor = base["throughput_per_second"] * (1 - threshold)
+        if current["throughput_per_second"] < floor:
+            regressions.append(
+                f"{step} throughput_per_second: {current['throughput_per_second']} < {base['throughput_per_second']} (-{threshold:.0%})"
+            )
+    return regressions
+
+
+def print_report(result):
+    print(f"\n{result['parameters']['users']} 个用户，并发 {result['parameters']['concurrency']}，"
+          f"耗时 {result['wall_seconds']} 秒，{result['flows_per_second']} 流程/秒，失败 {result['failed_flows']}")
+    print(f"{'步骤':<22}{'次数':>6}{'错误':>6}{'吞吐/秒':>10}{'P50ms':>10}{'P95ms':>10}{'P99ms':>10}")
+    for step, stats in result["steps"].items():
+        print(f"{step:<24}{stats['count']:>6}{stats['errors']:>6}{stats['throughput_per_second']:>10}"
+              f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+    for failure in result["first_failures"]:
+        print(f"  失败: {failure}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端API负载基准")
+    parser.add_argument("--users", type=int, default=40, help="虚拟用户数（完整流程次数）")
+    parser.add_argument("--concurrency", type=int, default=8, help="同时执行的流程数")
+    parser.add_argument("--document-size", type=int, default=256 * 1024, help="上传文档的字节数")
+    parser.add_argument("--chain-latency", type=float, default=0.05, help="模拟的链上交易确认时间（秒）")
+    parser.add_argument("--threshold", type=float, default=float(os.getenv("BENCHMARK_THRESHOLD", "0.25")),
+                        help="允许的退化比例，默认0.25（P50/P95增加或吞吐量下降超过25%%视为退化）")
+    parser.add_argument("--min-delta-ms", type=float, default=50,
+                        help="延迟绝对增加不超过该值（毫秒）时不视为退化，避免快速步骤的抖动误报")
+    parser.add_argument("--repeat", type=int, default=3, help="重复运行次数，各项指标取中位数")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="基线文件路径")
+    parser.add_argument("--check", action="store_true", help="与基线比较，退化时以退出码1结束")
+    parser.add_argument("--update-baseline", action="store_true", help="用本次结果更新基线")
+    parser.add_argument("--output", help="把本次结果写入JSON文件")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="identity-benchmark-") as workdir:
+        configure_environment(workdir)
+        runs = [
+            asyncio.run(run_benchmark(args.users, args.concurrency, args.document_size, args.chain_latency))
+            for _ in range(args.repeat)
+        ]
+    result = merge_runs(runs)
+
+    print_report(result)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    if args.update_baseline and result["failed_flows"]:
+        print("\n存在失败的流程，未更新基线")
+        sys.exit(1)
+    if args.update_baseline:
+        baseline = {key: result[key] for key in ("parameters", "flows_per_second", "steps")}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"\n基线已更新: {args.baseline}")
+
+    if args.check:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(result, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print("\n性能退化:")
+            for item in regressions:
+                print(f"  {item}")
+            sys.exit(1)
+        print(f"\n与基线相比没有超过 {args.threshold:.0%} 的退化")
+
+
+if __name__ == "__main__":
+    main()
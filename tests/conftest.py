@@ -1,4 +1,7 @@
+import hashlib
+
 import pytest
+from fastapi import Request
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
@@ -6,8 +9,9 @@ from sqlalchemy.pool import StaticPool
 
 # 导入您的主应用和数据库相关模块
 from backend.app.main import app
-from backend.app.database import Base, get_db
+from backend.app.database import Base, bind_client, get_db
 from backend.app.core.blockchain import BlockchainManager
+from backend.app.models.models import User, Verifier
 
 # 创建测试数据库引擎（使用内存SQLite）
 TEST_DATABASE_URL = "sqlite:///:memory:"
@@ -46,9 +50,9 @@ def client():
     Base.metadata.create_all(bind=engine)
     
     # 重写数据库依赖
-    def override_get_db():
+    def override_get_db(request: Request):
         try:
-            db = TestingSessionLocal()
+            db = bind_client(TestingSessionLocal(), request)
             yield db
         finally:
             db.close()
@@ -83,4 +87,37 @@ def db():
 
     session.close()
     transaction.rollback()
-    connection.close()
\ No newline at end of file
+    connection.close()
+
+@pytest.fixture(scope="function")
+def db_session():
+    """
+    创建数据库表和一个测试会话
+    测试结束后关闭会话并删除所有表
+    """
+    Base.metadata.create_all(bind=engine)
+    session = TestingSessionLocal()
+
+    yield session
+
+    session.close()
+    Base.metadata.drop_all(bind=engine)
+
+def make_user(db, username, **fields):
+    """
+    添加测试用户，邮箱由用户名生成
+    """
+    user = User(username=username, email=f"{username}@example.com", hashed_password="x", **fields)
+    db.add(user)
+    db.flush()
+    return user
+
+def make_verifier(db, name, api_key, **fields):
+    """
+    添加测试验证者，未指定区块链地址时由API密钥生成
+    """
+    fields.setdefault("blockchain_address", "0x" + hashlib.sha1(api_key.encode("utf-8")).hexdigest())
+    verifier = Verifier(name=name, api_key=api_key, **fields)
+    db.add(verifier)
+    db.flush()
+    return verifier
@@ -0,0 +1,92 @@
+from datetime import datetime
+
+import pytest
+
+from backend.app.api import admin_routes
+from backend.app.models.models import Verification
+from backend.app.core.analytics import CounterDeltas, rebuild_counters, record_created, record_status_change, summarize
+from .conftest import make_user, make_verifier
+
+
+@pytest.fixture(scope="function")
+def session(db_session):
+    user = make_user(db_session, "counted")
+    verifier = make_verifier(db_session, "Count Bank", "count_key")
+    db_session.commit()
+    return db_session, user, verifier
+
+
+def create(db, user, verifier, verification_type="KYC"):
+    verification = Verification(
+        user_id=user.id, verifier_id=verifier.id, verification_type=verification_type, status="pending"
+    )
+    db.add(verification)
+    db.flush()
+    record_created(db, verification)
+    db.commit()
+    return verification
+
+
+def decide(db, verification, status):
+    previous = verification.status
+    verification.status = status
+    record_status_change(db, verification, previous)
+    db.commit()
+
+
+def test_counters_follow_creation_and_status_changes(session):
+    """
+    测试计数随验证的创建和状态变更更新，汇总结果与验证表一致
+    """
+    db, user, verifier = session
+    first = create(db, user, verifier)
+    second = create(db, user, verifier)
+    create(db, user, verifier, "AML")
+    decide(db, first, "approved")
+    decide(db, second, "rejected")
+    decide(db, first, "approved")
+
+    summary = summarize(db)
+    assert summary["total"] == 3
+    assert summary["by_status"] == {"approved": 1, "rejected": 1, "pending": 1}
+    assert summary["by_type"] == {"KYC": {"approved": 1, "rejected": 1}, "AML": {"pending": 1}}
+    assert summary["by_verifier"][verifier.id] == {"approved": 1, "rejected": 1, "pending": 1}
+    assert summary["daily"] == [
+        {"day": datetime.utcnow().date().isoformat(), "requested": 3, "approved": 1, "rejected": 1, "expired": 0}
+    ]
+
+    # 重新计算的结果与增量维护的结果一致
+    rebuild_counters(db)
+    rebuilt = summarize(db)
+    assert rebuilt["by_status"] == summary["by_status"]
+    assert rebuilt["by_type"] == summary["by_type"]
+
+
+def test_rolled_back_changes_are_not_counted(session):
+    """
+    测试计数与验证在同一事务中，回滚后计数不变
+    """
+    db, user, verifier = session
+    verification = create(db, user, verifier)
+
+    deltas = CounterDeltas()
+    verification.status = "approved"
+    deltas.status_changed(verification, "pending")
+    deltas.apply(db)
+    db.rollback()
+
+    assert summarize(db)["by_status"] == {"pending": 1}
+
+
+def test_analytics_endpoint_requires_admin_token(client, session, monkeypatch):
+    """
+    测试统计接口需要管理令牌并返回计数表汇总
+    """
+    db, user, verifier = session
+    create(db, user, verifier)
+    monkeypatch.setattr(admin_routes, "ADMIN_TOKEN", "admin_secret")
+
+    assert client.get("/api/admin/analytics/verifications").status_code == 401
+    response = client.get("/api/admin/analytics/verifications", headers={"admin-token": "admin_secret"})
+    assert response.status_code == 200
+    assert response.json()["by_status"] == {"pending": 1}
@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.app.main import app
+from backend.app.models.models import Verification, VerificationArchive
+from backend.app.api.user_routes import get_current_user
+from backend.app.core.archive import (
+    archive_closed_verifications,
+    find_archived_verification,
+    find_archived_verifications_for_user,
+)
+from .conftest import make_user, make_verifier
+
+
+@pytest.fixture(scope="function")
+def session(db_session):
+    """创建带有一个用户和一个验证者的数据库会话"""
+    user = make_user(db_session, "archived")
+    verifier = make_verifier(db_session, "Archive Bank", "archive_key")
+    db_session.commit()
+    return db_session, user, verifier
+
+
+def add_verification(db, user, verifier, status, age_days):
+    verification = Verification(
+        user_id=user.id,
+        verifier_id=verifier.id,
+        verification_type="KYC",
+        status=status,
+        transaction_hash="0x" + "c" * 64 if status == "approved" else None,
+        verification_date=datetime.utcnow() - timedelta(days=age_days)
+    )
+    db.add(verification)
+    db.commit()
+    return verification.id
+
+
+def test_archives_only_closed_verifications_past_retention(session):
+    """
+    测试只归档超过保留期的已处理验证，待处理和近期的验证留在热表
+    """
+    db, user, verifier = session
+    old_approved = add_verification(db, user, verifier, "approved", 400)
+    old_rejected = add_verification(db, user, verifier, "rejected", 500)
+    old_pending = add_verification(db, user, verifier, "pending", 400)
+    recent = add_verification(db, user, verifier, "approved", 10)
+
+    archived = archive_closed_verifications(db, before=datetime.utcnow() - timedelta(days=365), batch_size=1)
+    assert archived == 2
+
+    hot_ids = {v.id for v in db.query(Verification).all()}
+    assert hot_ids == {old_pending, recent}
+    assert {a.id for a in db.query(VerificationArchive).all()} == {old_approved, old_rejected}
+
+    restored = find_archived_verification(db, old_approved)
+    assert restored.status == "approved"
+    assert restored.user_id == user.id
+    assert restored.transaction_hash == "0x" + "c" * 64
+    assert isinstance(restored.verification_date, datetime)
+    assert find_archived_verification(db, recent) is None
+    assert [v.id for v in find_archived_verifications_for_user(db, user.id)] == [old_rejected, old_approved]
+
+
+def test_lookup_by_id_falls_through_to_archive(client, session):
+    """
+    测试按ID查询已归档的验证记录与查询热表中的记录结果一致
+    """
+    db, user, verifier = session
+    verification_id = add_verification(db, user, verifier, "approved", 400)
+    archive_closed_verifications(db, before=datetime.utcnow() - timedelta(days=365))
+
+    app.dependency_overrides[get_current_user] = lambda: user
+    response = client.get(f"/api/verifications/{verification_id}")
+    assert response.status_code == 200
+    assert response.json()["id"] == verification_id
+    assert response.json()["status"] == "approved"
+
+    response = client.get(f"/api/verifications/user/{user.id}")
+    assert response.json() == []
+    response = client.get(f"/api/verifications/user/{user.id}", params={"include_archived": True})
+    assert [v["id"] for v in response.json()] == [verification_id]
+
+    response = client.put(
+        f"/api/verifications/{verification_id}",
+        json={"status": "rejected"},
+        headers={"api-key": "archive_key"}
+    )
+    assert response.status_code == 409
+
+
+def test_unexpired_approvals_stay_in_hot_table(session):
+    """
+    测试超过保留期但凭证尚未过期的批准留在热表，过期后才归档
+    """
+    db, user, verifier = session
+    valid = add_verification(db, user, verifier, "approved", 400)
+    lapsed = add_verification(db, user, verifier, "approved", 400)
+    db.get(Verification, valid).expires_at = datetime.utcnow() + timedelta(days=30)
+    db.get(Verification, lapsed).expires_at = datetime.utcnow() - timedelta(days=1)
+    db.commit()
+
+    assert archive_closed_verifications(db, before=datetime.utcnow() - timedelta(days=365)) == 1
+    assert {v.id for v in db.query(Verification).all()} == {valid}
+    assert {a.id for a in db.query(VerificationArchive).all()} == {lapsed}
@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+
+from backend.app.core.assignment import (
+    LeastPendingStrategy,
+    VerifierAssigner,
+    VerifierQueueDepths,
+    WeightedRoundRobinStrategy,
+    supports_type,
+)
+
+
+def make_verifier(verifier_id, weight=1, supported_types=None):
+    return SimpleNamespace(id=verifier_id, weight=weight, supported_types=supported_types)
+
+
+def test_least_pending_balances_queue_depths():
+    """
+    测试最少待处理策略
+    1. 连续分配请求
+    2. 各验证者队列深度差不超过1
+    """
+    verifiers = [make_verifier("a"), make_verifier("b"), make_verifier("c")]
+    assigner = VerifierAssigner(strategy=LeastPendingStrategy(), depths=VerifierQueueDepths())
+
+    for _ in range(30):
+        assigner.choose(verifiers, "KYC")
+
+    depths = assigner.depths.snapshot()
+    assert depths == {"a": 10, "b": 10, "c": 10}
+
+    # 处理掉a的请求后，新请求应优先分配给a
+    for _ in range(5):
+        assigner.release("a")
+    assert assigner.choose(verifiers, "KYC").id == "a"
+
+
+def test_weighted_round_robin_follows_weights():
+    """
+    测试加权轮询策略
+    1. 权重为3:1的两个验证者
+    2. 分配结果按权重比例
+    """
+    verifiers = [make_verifier("heavy", weight=3), make_verifier("light", weight=1)]
+    assigner = VerifierAssigner(strategy=WeightedRoundRobinStrategy(), depths=VerifierQueueDepths())
+
+    chosen = [assigner.choose(verifiers, "KYC").id for _ in range(40)]
+
+    assert chosen.count("heavy") == 30
+    assert chosen.count("light") == 10
+
+
+def test_capability_routing():
+    """
+    测试按验证类型路由
+    1. 只有支持该类型的验证者会被选中
+    2. 没有支持的验证者时返回None
+    """
+    verifiers = [
+        make_verifier("kyc-only", supported_types="KYC"),
+        make_verifier("aml-cdd", supported_types="AML, CDD"),
+    ]
+    assigner = VerifierAssigner(depths=VerifierQueueDepths())
+
+    assert supports_type(make_verifier("any"), "AML")
+    assert assigner.choose(verifiers, "kyc").id == "kyc-only"
+    assert assigner.choose(verifiers, "CDD").id == "aml-cdd"
+    assert assigner.choose(verifiers, "PEP") is None
+
+
+def test_status_change_updates_depths():
+    """
+    测试状态变更时维护队列深度
+    """
+    assigner = VerifierAssigner(depths=VerifierQueueDepths())
+    assigner.depths.adjust("v1", 2)
+
+    assigner.on_status_change("v1", "pending", "approved")
+    assert assigner.depths.get("v1") == 1
+
+    assigner.on_status_change("v1", "approved", "pending")
+    assert assigner.depths.get("v1") == 2
+
+    assigner.on_status_change("v1", "approved", "rejected")
+    assert assigner.depths.get("v1") == 2
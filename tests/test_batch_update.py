@@ -0,0 +1,107 @@
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from backend.app.api import verification_routes
+from backend.app.models.models import Verification
+from backend.app.core.work_queue import claim_verifications
+from .conftest import TestingSessionLocal, make_user, make_verifier
+
+HEADERS = {"api-key": "batch_key"}
+
+
+class RecordingManager:
+    """记录批量提交的链上写操作"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit_transaction(self, priority, method, *args, gas=0, tx_count=1):
+        self.submitted.append((method, args, tx_count))
+        future = Future()
+        future.set_result([
+            {"transaction_hash": f"0xbatch_{credential['user_id']}", "error": None} for credential in args[0]
+        ])
+        return future
+
+
+@pytest.fixture(scope="function")
+def session(db_session, monkeypatch):
+    users = [make_user(db_session, f"batched{i}", blockchain_address="0x" + str(i) * 40) for i in range(3)]
+    verifier = make_verifier(db_session, "Batch Bank", "batch_key")
+    other = make_verifier(db_session, "Other Bank", "other_batch_key")
+    now = datetime.utcnow()
+    # 不同的提交时间，领取顺序是确定的
+    verifications = [
+        Verification(user_id=user.id, verifier_id=verifier.id, verification_type="KYC", status="pending",
+                     verification_date=now - timedelta(minutes=len(users) - i))
+        for i, user in enumerate(users)
+    ] + [Verification(user_id=users[0].id, verifier_id=other.id, verification_type="AML", status="pending")]
+    db_session.add_all(verifications)
+    db_session.commit()
+    manager = RecordingManager()
+    monkeypatch.setattr(verification_routes.blockchain, "submit_transaction", manager.submit_transaction)
+    return db_session, verifier, verifications, manager
+
+
+def test_batch_update_returns_per_item_results(client, session):
+    """
+    测试批量更新
+    1. 每个决定单独返回结果，失败的决定不影响其他决定
+    2. 所有决定在一个事务中提交
+    3. 需要上链的批准作为一次 issue_credentials_batch 提交，交易哈希回写
+    """
+    db, verifier, (approved, rejected, manual, foreign), manager = session
+    commits = []
+    # 只统计外层事务的提交，不含保存点
+    listener = lambda session: None if session.in_nested_transaction() else commits.append(session)
+    event.listen(TestingSessionLocal, "after_commit", listener)
+    try:
+        response = client.put("/api/verifications/batch", json={"decisions": [
+            {"verification_id": approved.id, "status": "approved"},
+            {"verification_id": rejected.id, "status": "rejected", "notes": "证件过期"},
+            {"verification_id": manual.id, "status": "approved", "transaction_hash": "0xmanual"},
+            {"verification_id": foreign.id, "status": "approved"},
+            {"verification_id": approved.id, "status": "rejected"},
+            {"verification_id": "missing", "status": "approved"},
+        ]}, headers=HEADERS)
+    finally:
+        event.remove(TestingSessionLocal, "after_commit", listener)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [r["status_code"] for r in body["results"]] == [200, 200, 200, 403, 400, 404]
+    assert (body["succeeded"], body["failed"], body["queued_chain_writes"]) == (3, 3, 1)
+    assert body["results"][1]["verification"]["notes"] == "证件过期"
+    assert len(commits) == 1
+
+    method, args, tx_count = manager.submitted[0]
+    assert (method, tx_count) == ("issue_credentials_batch", 1)
+    assert [credential["user_id"] for credential in args[0]] == [approved.user_id]
+
+    db.expire_all()
+    assert db.get(Verification, approved.id).transaction_hash == f"0xbatch_{approved.user_id}"
+    assert db.get(Verification, manual.id).transaction_hash == "0xmanual"
+    assert db.get(Verification, foreign.id).status == "pending"
+
+
+def test_batch_update_respects_work_queue_leases(client, session):
+    """
+    测试提供 lease_id 时，被其他工作进程领取的验证请求返回409，自己领取的可以更新
+    """
+    db, verifier, (first, second, _, _), _ = session
+    lease_id, _, claimed = claim_verifications(db, verifier.id, worker_id="w1", limit=2)
+    assert {v.id for v in claimed} == {first.id, second.id}
+
+    decisions = {"decisions": [{"verification_id": first.id, "status": "rejected"}]}
+    response = client.put("/api/verifications/batch", json=decisions, headers={**HEADERS, "lease-id": "other"})
+    assert response.json()["results"][0]["status_code"] == 409
+
+    decisions = {"decisions": [{"verification_id": second.id, "status": "rejected"}]}
+    response = client.put("/api/verifications/batch", json=decisions, headers={**HEADERS, "lease-id": lease_id})
+    assert response.json()["results"][0]["status_code"] == 200
+    db.expire_all()
+    assert db.get(Verification, second.id).lease_id is None
+    assert db.get(Verification, first.id).status == "pending"
@@ -0,0 +1,76 @@
+import pytest
+
+from backend.app.core.bloom import AvailabilityIndex, BloomFilter, availability_checks
+from .conftest import TestingSessionLocal, make_user
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """
+    测试布隆过滤器
+    1. 加入的值都能查到
+    2. 未加入的值误判率接近目标值
+    """
+    bloom = BloomFilter(capacity=10000, error_rate=0.01)
+    for i in range(10000):
+        bloom.add(f"user{i}")
+    assert all(f"user{i}" in bloom for i in range(10000))
+
+    false_positives = sum(f"other{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+@pytest.fixture(scope="function")
+def session(db_session):
+    make_user(db_session, "alice")
+    db_session.commit()
+    return db_session
+
+
+def test_availability_consults_db_only_on_possible_hit(session):
+    """
+    测试可用性索引：过滤器未命中时直接判为可用，命中时查询数据库确认
+    """
+    index = AvailabilityIndex(min_capacity=1000, rebuild_seconds=0)
+    assert index.check(session, username="alice") == {"username": False}
+
+    assert index.rebuild(TestingSessionLocal) == 1
+    before = availability_checks.get("username", "filter_negative")
+    assert index.check(session, username="bob", email="alice@example.com") == {"username": True, "email": False}
+    assert availability_checks.get("username", "filter_negative") == before + 1
+
+    index.add("bob", "bob@example.com")
+    assert index.check(session, username="bob") == {"username": True}
+    assert availability_checks.get("username", "false_positive") >= 1
+
+
+def test_availability_endpoint_and_duplicate_registration(client):
+    """
+    测试可用性接口，以及注册重复用户名时在计算密码哈希前失败
+    """
+    response = client.get("/api/users/availability", params={"username": "carol", "email": "carol@example.com"})
+    assert response.status_code == 200
+    assert response.json() == {"username": True, "email": True}
+
+    user_data = {
+        "username": "carol",
+        "email": "carol@example.com",
+        "password": "secure_password_123",
+        "full_name": "Carol",
+        "blockchain_address": "0x" + "d" * 40
+    }
+    assert client.post("/api/users/register", json=user_data).status_code == 201
+
+    response = client.get("/api/users/availability", params={"username": "carol"})
+    assert response.json() == {"username": False}
+    assert client.get("/api/users/availability").status_code == 400
+
+    duplicate = dict(user_data, email="other@example.com", blockchain_address="0x" + "e" * 40)
+    response = client.post("/api/users/register", json=duplicate)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "用户名或邮箱已存在"
+
+    # 唯一约束拦截未被可用性检查发现的冲突
+    duplicate = dict(user_data, username="dave", email="dave@example.com")
+    response = client.post("/api/users/register", json=duplicate)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "区块链地址或证件号已被使用"
@@ -0,0 +1,149 @@
+import threading
+import time
+
+import pytest
+
+from backend.app.core.blockchain import (
+    BlockchainManager, ChainTransactionScheduler, PriorityClass, PRIORITY_BULK, PRIORITY_CRITICAL, PRIORITY_NORMAL
+)
+
+
+class FakeEth:
+    def __init__(self):
+        self.block_number = 1
+
+
+class FakeManager:
+    """记录调用顺序的区块链管理器替身，只实现 BlockchainManager 中真实存在的方法"""
+
+    def __init__(self):
+        self.web3 = type("FakeWeb3", (), {})()
+        self.web3.eth = FakeEth()
+        self.calls = []
+
+    def register_identity(self, user_id, address):
+        self.calls.append(("register_identity", user_id))
+        return f"0xtx_{user_id}"
+
+    def issue_credentials_batch(self, credentials):
+        self.calls.extend(("issue_credentials_batch", c["user_id"]) for c in credentials)
+        return [{"transaction_hash": f"0xtx_{c['user_id']}", "error": None} for c in credentials]
+
+
+def credential(user_id):
+    return {"owner": "0x0", "user_id": user_id, "verification_type": "KYC", "credential_hash": "0x0", "expires_at": 0}
+
+
+def test_fake_manager_matches_blockchain_manager():
+    """
+    测试替身的方法在 BlockchainManager 中都存在，避免测试调用生产环境中不存在的方法
+    """
+    methods = [name for name in vars(FakeManager) if not name.startswith("_")]
+    assert [name for name in methods if not callable(getattr(BlockchainManager, name, None))] == []
+
+
+def make_scheduler(manager):
+    classes = [
+        PriorityClass(PRIORITY_CRITICAL, weight=6, max_tx_per_block=10, max_gas_per_block=1000),
+        PriorityClass(PRIORITY_NORMAL, weight=3, max_tx_per_block=10, max_gas_per_block=1000),
+        PriorityClass(PRIORITY_BULK, weight=1, max_tx_per_block=2, max_gas_per_block=1000),
+    ]
+    return ChainTransactionScheduler(manager, classes=classes, gas_ceiling=1000, autostart=False)
+
+
+def drain(scheduler):
+    """执行当前区块预算内可执行的全部作业"""
+    scheduler._roll_block()
+    while True:
+        job = scheduler._next_job()
+        if job is None:
+            return
+        scheduler._execute(job)
+
+
+def test_critical_jobs_are_not_starved_by_bulk_backlog():
+    """
+    测试优先级调度
+    1. 批量作业受每区块交易预算限制
+    2. 批量积压时关键作业仍在同一区块内执行
+    """
+    manager = FakeManager()
+    scheduler = make_scheduler(manager)
+    bulk = [scheduler.submit(PRIORITY_BULK, "register_identity", (f"bulk{i}", "0x0"), gas=10) for i in range(5)]
+    critical = scheduler.submit(PRIORITY_CRITICAL, "issue_credentials_batch", ([credential("kyc")],), gas=10)
+
+    drain(scheduler)
+    assert critical.result(timeout=0)[0]["transaction_hash"] == "0xtx_kyc"
+    assert sum(1 for f in bulk if f.done()) == 2
+
+    # 下一个区块继续处理积压的批量作业
+    manager.web3.eth.block_number = 2
+    scheduler._block_checked_at = 0
+    drain(scheduler)
+    assert sum(1 for f in bulk if f.done()) == 4
+
+    metrics = scheduler.metrics()
+    assert metrics["classes"][PRIORITY_BULK]["queue_depth"] == 1
+    assert metrics["classes"][PRIORITY_CRITICAL]["completed"] == 1
+
+
+def test_gas_ceiling_is_shared_across_classes():
+    """
+    测试所有类别共享每区块gas上限，失败的作业通过Future返回异常
+    """
+    manager = FakeManager()
+    scheduler = make_scheduler(manager)
+    first = scheduler.submit(PRIORITY_NORMAL, "register_identity", ("a", "0x0"), gas=800)
+    second = scheduler.submit(PRIORITY_CRITICAL, "register_identity", ("b", "0x0"), gas=800)
+    failing = scheduler.submit(PRIORITY_CRITICAL, "missing_method", (), gas=10)
+
+    drain(scheduler)
+    assert first.done() != second.done()
+
+    with pytest.raises(AttributeError):
+        failing.result(timeout=0)
+    assert scheduler.metrics()["classes"][PRIORITY_CRITICAL]["failed"] == 1
+
+    with pytest.raises(ValueError):
+        scheduler.submit("urgent", "register_identity", ())
+
+
+class SlowEth:
+    """读取区块高度很慢的节点"""
+
+    def __init__(self, release):
+        self.release = release
+
+    @property
+    def block_number(self):
+        self.release.wait(timeout=5)
+        return 1
+
+
+def test_worker_does_not_block_submitters_or_wait_for_receipts():
+    """
+    测试调度线程
+    1. 读取区块高度时不持有锁，慢节点不阻塞提交
+    2. 不等待正在执行的作业完成，后提交的关键作业不被先执行的批量作业推迟
+    """
+    manager = FakeManager()
+    node = threading.Event()
+    manager.web3.eth = SlowEth(node)
+    scheduler = make_scheduler(manager)
+    scheduler.start()
+    try:
+        started = time.monotonic()
+        scheduler.submit(PRIORITY_NORMAL, "register_identity", ("a", "0x0"), gas=10)
+        assert time.monotonic() - started < 1
+        node.set()
+
+        receipt = threading.Event()
+        manager.register_identity = lambda user_id, address: receipt.wait(timeout=5) and user_id
+        slow = scheduler.submit(PRIORITY_BULK, "register_identity", ("bulk", "0x0"), gas=10)
+        critical = scheduler.submit(PRIORITY_CRITICAL, "issue_credentials_batch", ([credential("kyc")],), gas=10)
+        assert critical.result(timeout=2)[0]["transaction_hash"] == "0xtx_kyc"
+        assert not slow.done()
+        receipt.set()
+        assert slow.result(timeout=2) == "bulk"
+    finally:
+        scheduler.stop()
@@ -0,0 +1,184 @@
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+from backend.app.api import verification_routes
+from backend.app.models.models import IssuerKey, Verification
+from backend.app.core.credentials import CREDENTIAL_ISSUER, IssuerKeyring, issue_credential, issuer_keys, verify_credentials
+from backend.app.core.status_list import assign_status_indexes, publish_status_list
+from .conftest import make_user, make_verifier
+
+
+@pytest.fixture(scope="function")
+def session(db_session):
+    user = make_user(db_session, "holder")
+    verifier = make_verifier(db_session, "Credential Bank", "credential_key")
+    db_session.commit()
+    return db_session, user, verifier
+
+
+def approve(db, user, verifier, expires_at=None):
+    verification = Verification(
+        user_id=user.id, verifier_id=verifier.id, verification_type="KYC", status="approved",
+        expires_at=expires_at or datetime.utcnow() + timedelta(days=30)
+    )
+    db.add(verification)
+    db.flush()
+    assign_status_indexes(db, [verification])
+    issue_credential(db, verification)
+    db.commit()
+    return verification
+
+
+def test_verify_credentials_without_chain(session):
+    """
+    测试批量验证链下凭证
+    1. 有效凭证通过，结果按输入顺序返回
+    2. 篡改、过期、未知密钥的凭证不通过
+    3. 状态列表重新发布后，撤销的凭证不通过
+    """
+    db, user, verifier = session
+    valid = approve(db, user, verifier)
+    revoked = approve(db, user, verifier)
+    expired = approve(db, user, verifier, expires_at=datetime.utcnow() - timedelta(minutes=1))
+    publish_status_list(db)
+
+    header, payload, signature = valid.credential.split(".")
+    tampered = ".".join([header, payload, signature[:-2] + ("AA" if signature[-2:] != "AA" else "BB")])
+    stranger = jwt.encode(
+        {"iss": CREDENTIAL_ISSUER, "sub": user.id, "jti": "x"}, Ed25519PrivateKey.generate(),
+        algorithm="EdDSA", headers={"kid": "unknown"}
+    )
+    results = verify_credentials(db, [valid.credential, tampered, expired.credential, stranger, "garbage"])
+    assert [r["valid"] for r in results] == [True, False, False, False, False]
+    assert results[0]["verification_id"] == valid.id
+    assert results[0]["status_index"] == valid.status_index
+    assert results[2]["error"] == "凭证已过期"
+    assert results[3]["error"] == "未知的签发密钥"
+
+    revoked.status = "rejected"
+    db.commit()
+    assert verify_credentials(db, [revoked.credential])[0]["valid"] is True
+    publish_status_list(db)
+    assert verify_credentials(db, [revoked.credential])[0]["error"] == "凭证已撤销"
+    assert verify_credentials(db, [revoked.credential], check_status=False)[0]["valid"] is True
+
+
+def test_keys_from_other_replicas_are_loaded_once(session):
+    """
+    测试其他副本登记的签发公钥在首次遇到时从数据库加载并缓存
+    """
+    db, user, _ = session
+    other = IssuerKeyring(Ed25519PrivateKey.generate())
+    other.register(db)
+    db.commit()
+    token = jwt.encode(
+        {"iss": CREDENTIAL_ISSUER, "sub": user.id, "jti": "from-other-replica"}, other.signing_key,
+        algorithm="EdDSA", headers={"kid": other.kid}
+    )
+    assert verify_credentials(db, [token], check_status=False)[0]["valid"] is True
+    assert other.kid in issuer_keys.public_keys(db, {other.kid})
+
+
+def test_approval_issues_credential(client, session):
+    """
+    测试批准验证时签发凭证，并通过验证接口和JWKS接口验证
+    """
+    db, user, verifier = session
+    verification = Verification(
+        user_id=user.id, verifier_id=verifier.id, verification_type="AML", status="pending"
+    )
+    db.add(verification)
+    db.commit()
+    response = client.put(
+        f"/api/verifications/{verification.id}",
+        json={"status": "approved", "transaction_hash": "0xmanual"},
+        headers={"api-key": "credential_key"}
+    )
+    credential = response.json()["credential"]
+    assert jwt.get_unverified_header(credential)["kid"] == issuer_keys.kid
+
+    jwks = client.get("/api/credentials/jwks.json").json()
+    assert issuer_keys.kid in [key["kid"] for key in jwks["keys"]]
+
+    assert client.post("/api/credentials/verify", json={"credentials": [credential]}).status_code == 422
+    response = client.post(
+        "/api/credentials/verify", json={"credentials": [credential]}, headers={"api-key": "credential_key"}
+    )
+    assert response.json()["results"][0]["error"] == "无法确认凭证状态"
+
+    # 状态列表发布后可以确认
+    client.get("/api/credentials/status-list")
+    response = client.post(
+        "/api/credentials/verify",
+        json={"credentials": [credential, "garbage"]},
+        headers={"api-key": "credential_key"}
+    )
+    body = response.json()
+    assert (body["valid"], body["invalid"]) == (1, 1)
+    assert body["results"][0]["verification_type"] == "AML"
+
+
+def test_single_approval_writes_credential_on_chain(client, session, monkeypatch):
+    """
+    测试单个批准以一个凭证的批量提交写入区块链，链上过期时间与数据库一致；
+    客户端提供交易哈希时不再写入
+    """
+    db, user, verifier = session
+    user.blockchain_address = "0x" + "8" * 40
+    first, second = (
+        Verification(user_id=user.id, verifier_id=verifier.id, verification_type=kind, status="pending")
+        for kind in ("KYC", "AML")
+    )
+    db.add_all([first, second])
+    db.commit()
+
+    submitted = []
+
+    def submit_transaction(priority, method, credentials, **kwargs):
+        submitted.append((method, credentials, kwargs))
+        future = Future()
+        future.set_result([{"transaction_hash": "0xchain", "error": None}])
+        return future
+
+    monkeypatch.setattr(verification_routes.blockchain, "submit_transaction", submit_transaction)
+    response = client.put(
+        f"/api/verifications/{first.id}", json={"status": "approved"}, headers={"api-key": "credential_key"}
+    )
+    assert response.status_code == 200
+    assert response.json()["transaction_hash"] == "0xchain"
+    method, credentials, kwargs = submitted[0]
+    assert method == "issue_credentials_batch"
+    assert kwargs["tx_count"] == 1
+    assert credentials[0]["owner"] == user.blockchain_address
+    db.refresh(first)
+    assert credentials[0]["expires_at"] == int(first.expires_at.replace(tzinfo=timezone.utc).timestamp())
+
+    response = client.put(
+        f"/api/verifications/{second.id}",
+        json={"status": "approved", "transaction_hash": "0xmanual"},
+        headers={"api-key": "credential_key"}
+    )
+    assert response.json()["transaction_hash"] == "0xmanual"
+    assert len(submitted) == 1
+
+
+def test_key_registration_is_kept_only_after_commit(session):
+    """
+    测试登记公钥的事务回滚后，下次签发时重新登记
+    """
+    db, user, verifier = session
+    keyring = IssuerKeyring(Ed25519PrivateKey.generate())
+    keyring.register(db)
+    db.rollback()
+    db.commit()
+    assert keyring._registered is False
+
+    keyring.register(db)
+    assert keyring._registered is False
+    db.commit()
+    assert keyring._registered is True
+    assert db.get(IssuerKey, keyring.kid) is not None
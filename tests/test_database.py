@@ -0,0 +1,121 @@
+from concurrent.futures import Future
+
+from sqlalchemy import text
+
+from backend.app import database
+from backend.app.api import verification_routes
+from backend.app.database import ReplicaRouter, client_key
+from backend.app.models.models import User, Verification, Verifier
+from .conftest import TestingSessionLocal
+
+
+class FakeRequest:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+def make_router(tmp_path, count=2, **kwargs):
+    urls = [f"sqlite:///{tmp_path}/replica{i}.db" for i in range(count)]
+    return ReplicaRouter(urls, **kwargs)
+
+
+def test_reads_round_robin_across_replicas(tmp_path):
+    """
+    测试读请求在健康的副本之间轮询，副本会话可以执行查询
+    """
+    router = make_router(tmp_path)
+    first = router.route(None)
+    second = router.route(None)
+    assert {first["name"], second["name"]} == {r["name"] for r in router.replicas}
+
+    session = first["sessionmaker"]()
+    assert session.execute(text("SELECT 1")).scalar() == 1
+    session.close()
+    assert router.status()["routed"]["replica"] == 2
+
+
+def test_read_your_writes_sticks_to_primary(tmp_path):
+    """
+    测试客户端写入后在粘滞时间内读主库，其他客户端不受影响
+    """
+    router = make_router(tmp_path, sticky_seconds=60)
+    writer = client_key(FakeRequest({"authorization": "Bearer writer"}))
+    reader = client_key(FakeRequest({"api-key": "reader"}))
+
+    router.mark_write(writer)
+    assert router.route(writer) is None
+    assert router.route(reader) is not None
+    assert router.status()["routed"]["sticky"] == 1
+
+    router.sticky_seconds = -1
+    router.mark_write(writer)
+    assert router.route(writer) is not None
+
+
+def test_lagging_replicas_fall_back_to_primary(tmp_path):
+    """
+    测试延迟超过上限或无法连接的副本不被使用，全部不可用时回退到主库
+    """
+    router = make_router(tmp_path, max_lag=5, check_interval=0)
+    lags = {router.replicas[0]["name"]: 30.0, router.replicas[1]["name"]: 1.0}
+    router.measure_lag = lambda replica: lags[replica["name"]]
+
+    for _ in range(4):
+        assert router.route(None)["name"] == router.replicas[1]["name"]
+
+    def unreachable(replica):
+        raise ConnectionError("connection refused")
+
+    router.measure_lag = unreachable
+    assert router.route(None) is None
+    status = router.status()
+    assert status["routed"]["fallback"] == 1
+    assert all(not r["healthy"] and r["error"] for r in status["replicas"])
+
+
+def test_no_replicas_routes_to_primary():
+    """
+    测试未配置副本时读请求使用主库
+    """
+    router = ReplicaRouter([])
+    router.mark_write("client")
+    assert router.route("client") is None
+
+
+def test_write_is_marked_before_background_tasks_finish(client, tmp_path, monkeypatch):
+    """
+    测试写入在提交时即记录：响应后的后台任务（等待链上交易）运行期间，
+    该客户端的读请求已经走主库
+    """
+    router = make_router(tmp_path, sticky_seconds=60)
+    monkeypatch.setattr(database, "replica_router", router)
+    db = TestingSessionLocal()
+    user = User(username="sticky", email="sticky@example.com", hashed_password="x", blockchain_address="0x" + "3" * 40)
+    verifier = Verifier(name="Sticky Bank", blockchain_address="0x" + "4" * 40, api_key="sticky_key")
+    db.add_all([user, verifier])
+    db.flush()
+    verification = Verification(user_id=user.id, verifier_id=verifier.id, verification_type="KYC", status="pending")
+    db.add(verification)
+    db.commit()
+    verification_id = verification.id
+    db.close()
+
+    headers = {"api-key": "sticky_key"}
+    writer = client_key(FakeRequest(headers))
+    sticky_during_chain_write = []
+
+    def submit_transaction(priority, method, credentials, **kwargs):
+        sticky_during_chain_write.append(router.is_sticky(writer))
+        future = Future()
+        future.set_result([{"transaction_hash": "0xsticky", "error": None}])
+        return future
+
+    monkeypatch.setattr(verification_routes.blockchain, "submit_transaction", submit_transaction)
+    response = client.put("/api/verifications/batch", json={"decisions": [
+        {"verification_id": verification_id, "status": "approved"}
+    ]}, headers=headers)
+    assert response.json()["queued_chain_writes"] == 1
+    assert sticky_during_chain_write == [True]
+
+    assert client.get("/api/verifications/pending", headers=headers).status_code == 200
+    assert router.status()["routed"]["sticky"] == 1
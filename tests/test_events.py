@@ -0,0 +1,52 @@
+import asyncio
+
+from backend.app.core.events import EventBus
+
+
+def test_subscriber_receives_matching_events():
+    """
+    测试订阅者只收到匹配的事件
+    1. 订阅某个用户的事件
+    2. 从其他线程发布多个用户的事件
+    3. 只收到该用户的事件
+    """
+    async def scenario():
+        bus = EventBus()
+        subscription, backlog, gap = bus.subscribe(lambda e: e.user_id == "u1")
+        assert backlog == [] and gap is False
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, bus.publish, "verification.updated", {"status": "approved"}, "u1")
+        await loop.run_in_executor(None, bus.publish, "verification.updated", {"status": "approved"}, "u2")
+
+        event = await asyncio.wait_for(subscription.queue.get(), timeout=1)
+        assert event.user_id == "u1"
+        assert event.to_sse().startswith(f"id: {event.id}\nevent: verification.updated\n")
+        assert subscription.queue.empty()
+        bus.unsubscribe(subscription)
+
+    asyncio.run(scenario())
+
+
+def test_resume_from_last_event_id():
+    """
+    测试断线续传
+    1. 发布多个事件
+    2. 使用最后收到的事件ID重新订阅
+    3. 补发之后的事件
+    """
+    async def scenario():
+        bus = EventBus(history_size=3)
+        for i in range(5):
+            bus.publish("verification.updated", {"n": i}, user_id="u1")
+
+        _, backlog, gap = bus.subscribe(lambda e: True, last_event_id=3)
+        assert [e.id for e in backlog] == [4, 5]
+        assert gap is False
+
+        # 事件1已被淘汰，续传存在缺口
+        _, backlog, gap = bus.subscribe(lambda e: True, last_event_id=0)
+        assert [e.id for e in backlog] == [3, 4, 5]
+        assert gap is True
+
+    asyncio.run(scenario())
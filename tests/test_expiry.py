@@ -0,0 +1,119 @@
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend.app.api import verification_routes
+from backend.app.models.models import User, Verification
+from backend.app.core.analytics import rebuild_counters, summarize
+from backend.app.core.blockchain import CREDENTIAL_VALIDITY_DAYS, PRIORITY_BULK, REVOKE_CREDENTIAL_GAS
+from backend.app.core.expiry import sweep_expired
+from backend.app.core.reuse import find_reusable_for_user
+from .conftest import make_user, make_verifier
+
+
+class RecordingManager:
+    """记录提交的链上写操作的区块链管理器替身"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit_transaction(self, priority, method, *args, gas=0, tx_count=1):
+        self.submitted.append((priority, method, args, gas, tx_count))
+        future = Future()
+        future.set_result([{"transaction_hash": "0xrevoked", "error": None} for _ in args[0]])
+        return future
+
+
+@pytest.fixture(scope="function")
+def session(db_session):
+    users = [
+        make_user(db_session, f"expiring{i}", blockchain_address="0x" + str(i) * 40, is_verified=True)
+        for i in range(3)
+    ]
+    verifiers = [make_verifier(db_session, f"Expiry Bank {i}", f"expiry_key_{i}") for i in range(2)]
+    db_session.commit()
+    return db_session, users, verifiers
+
+
+def approve(db, user, verifier, expires_at, verification_type="KYC"):
+    verification = Verification(
+        user_id=user.id, verifier_id=verifier.id, verification_type=verification_type,
+        status="approved", transaction_hash="0xissued", expires_at=expires_at
+    )
+    db.add(verification)
+    db.commit()
+    return verification
+
+
+def test_sweep_expires_due_approvals_and_revokes_credentials(session):
+    """
+    测试过期清理
+    1. 到期的批准标记为 expired，行版本号递增，统计计数同步更新
+    2. 没有其他有效批准的用户取消已验证标记
+    3. 链上撤销合并为一笔低优先级批量，仍有有效批准的凭证不撤销
+    """
+    db, users, verifiers = session
+    now = datetime.utcnow()
+    due = approve(db, users[0], verifiers[0], now - timedelta(days=1))
+    approve(db, users[1], verifiers[0], now - timedelta(hours=1))
+    # 同一用户同一类型在另一机构仍有有效批准，链上凭证不撤销
+    approve(db, users[2], verifiers[0], now - timedelta(hours=1))
+    renewed = approve(db, users[2], verifiers[1], now + timedelta(days=30))
+    rebuild_counters(db)
+    version = due.version_id
+
+    manager = RecordingManager()
+    assert sweep_expired(db, manager, now=now, batch_size=2) == 3
+
+    db.expire_all()
+    assert db.get(Verification, due.id).status == "expired"
+    assert db.get(Verification, due.id).version_id == version + 1
+    assert db.get(Verification, renewed.id).status == "approved"
+    assert [db.get(User, u.id).is_verified for u in users] == [False, False, True]
+    assert summarize(db)["by_status"] == {"expired": 3, "approved": 1}
+    assert find_reusable_for_user(db, users[0].id, "KYC") == []
+
+    revoked = [c["user_id"] for _, _, args, _, _ in manager.submitted for c in args[0]]
+    assert sorted(revoked) == sorted([users[0].id, users[1].id])
+    priority, method, args, gas, tx_count = manager.submitted[0]
+    assert (priority, method) == (PRIORITY_BULK, "revoke_credentials_batch")
+    assert gas == REVOKE_CREDENTIAL_GAS * tx_count
+
+    # 没有新的到期验证时不做任何事
+    assert sweep_expired(db, manager, now=now) == 0
+
+
+def test_approval_sets_expiry(client, session, monkeypatch):
+    """
+    测试批准验证时写入过期时间，写入链上的凭证使用同一个过期时间
+    """
+    db, users, verifiers = session
+    manual, on_chain = (
+        Verification(user_id=users[0].id, verifier_id=verifiers[0].id, verification_type=kind, status="pending")
+        for kind in ("AML", "KYC")
+    )
+    db.add_all([manual, on_chain])
+    db.commit()
+
+    response = client.put(
+        f"/api/verifications/{manual.id}",
+        json={"status": "approved", "transaction_hash": "0xmanual"},
+        headers={"api-key": "expiry_key_0"}
+    )
+    assert response.status_code == 200
+    db.expire_all()
+    validity = timedelta(days=CREDENTIAL_VALIDITY_DAYS)
+    assert db.get(Verification, manual.id).expires_at > datetime.utcnow() + validity - timedelta(minutes=1)
+
+    manager = RecordingManager()
+    monkeypatch.setattr(verification_routes.blockchain, "submit_transaction", manager.submit_transaction)
+    response = client.put(
+        f"/api/verifications/{on_chain.id}", json={"status": "approved"}, headers={"api-key": "expiry_key_0"}
+    )
+    assert response.status_code == 200
+    db.expire_all()
+    expires_at = db.get(Verification, on_chain.id).expires_at
+    _, method, args, _, _ = manager.submitted[0]
+    assert method == "issue_credentials_batch"
+    assert args[0][0]["expires_at"] == int(expires_at.replace(tzinfo=timezone.utc).timestamp())
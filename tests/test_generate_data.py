@@ -0,0 +1,61 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from backend.app.database import Base
+from backend.app.models.models import Document, User, Verification, Verifier
+from backend.scripts.generate_data import DataGenerator, bulk_insert
+from .conftest import TestingSessionLocal, engine
+
+NOW = datetime(2026, 1, 1)
+
+
+@pytest.fixture(scope="function")
+def tables():
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def generate(seed, users=200, batch_size=50):
+    """用给定种子生成数据写入内存数据库，返回各表行数和验证记录ID"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    generator = DataGenerator(seed, users, verifiers=10, days=365, password_hash="x", now=NOW)
+    db = TestingSessionLocal()
+    try:
+        bulk_insert(db, Verifier, generator.verifiers(), batch_size)
+        for start in range(0, users, batch_size):
+            user_rows, verification_rows, document_rows = generator.user_batch(start, batch_size)
+            bulk_insert(db, User, user_rows, batch_size)
+            bulk_insert(db, Verification, verification_rows, batch_size)
+            bulk_insert(db, Document, document_rows, batch_size)
+        db.commit()
+        counts = {
+            model.__tablename__: db.execute(select(func.count()).select_from(model)).scalar()
+            for model in (User, Verifier, Verification, Document)
+        }
+        ids = [row.id for row in db.execute(select(Verification.id).order_by(Verification.id))]
+        return counts, ids
+    finally:
+        db.close()
+
+
+def test_same_seed_generates_same_rows(tables):
+    """
+    测试相同种子生成相同的数据，写入的行可以按模型读取
+    """
+    counts, ids = generate(seed=7)
+    assert counts["users"] == 200
+    assert counts["verifiers"] == 10
+    assert counts["verifications"] > 0 and counts["documents"] > 0
+
+    assert generate(seed=7) == (counts, ids)
+    assert generate(seed=8)[1] != ids
+
+    db = TestingSessionLocal()
+    approved = db.query(Verification).filter(Verification.status == "approved").first()
+    assert approved.expires_at > approved.verification_date.replace(tzinfo=None)
+    assert approved.transaction_hash.startswith("0x")
+    db.close()
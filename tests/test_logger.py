@@ -0,0 +1,72 @@
+import io
+import json
+import logging
+import queue
+from logging.handlers import QueueListener
+
+from backend.app.core.logger import ErrorSampler, JsonFormatter, NonBlockingQueueHandler, get_logger, parse_levels
+
+
+def make_logger(name, sampler=None):
+    """创建写入内存的队列日志记录器"""
+    stream = io.StringIO()
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter())
+    log_queue = queue.Queue()
+    handler = NonBlockingQueueHandler(log_queue)
+    if sampler:
+        handler.addFilter(sampler)
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    listener = QueueListener(log_queue, output)
+    listener.start()
+    return logger, listener, stream
+
+
+def test_json_lines_with_fields_and_exception():
+    """
+    测试日志以单行JSON输出，并包含结构化字段和异常堆栈
+    """
+    logger, listener, stream = make_logger("test.logger.json")
+    logger.info("身份注册成功", extra={"user_id": "u1"})
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("注册身份时出错")
+    listener.stop()
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert lines[0]["message"] == "身份注册成功"
+    assert lines[0]["user_id"] == "u1"
+    assert lines[1]["level"] == "ERROR"
+    assert "ValueError: boom" in lines[1]["exception"]
+
+
+def test_repeated_errors_are_sampled():
+    """
+    测试同一错误在时间窗口内超过上限后被丢弃，其他错误不受影响
+    """
+    logger, listener, stream = make_logger("test.logger.sampled", ErrorSampler(window=60, burst=2))
+    for i in range(10):
+        logger.error("链上写入失败: %s", i)
+    logger.error("另一个错误")
+    logger.info("普通日志不采样")
+    logger.info("普通日志不采样")
+    listener.stop()
+
+    messages = [json.loads(line)["message"] for line in stream.getvalue().splitlines()]
+    assert messages == ["链上写入失败: 0", "链上写入失败: 1", "另一个错误", "普通日志不采样", "普通日志不采样"]
+
+
+def test_module_names_and_levels():
+    """
+    测试模块名统一和按模块级别配置的解析
+    """
+    assert get_logger("backend.app.core.blockchain").name == "app.core.blockchain"
+    assert get_logger("app.api.user_routes").name == "app.api.user_routes"
+    assert parse_levels("app.core.blockchain=debug, app.api=WARNING,bad,x=NOPE") == {
+        "app.core.blockchain": "DEBUG",
+        "app.api": "WARNING",
+    }
@@ -0,0 +1,51 @@
+from backend.app.core.metrics import MetricsRegistry, statement_fingerprint, web3_metrics_middleware, blockchain_rpc_duration
+
+
+def test_histogram_renders_cumulative_buckets():
+    """
+    测试直方图按文本暴露格式输出累积分桶
+    """
+    registry = MetricsRegistry()
+    histogram = registry.histogram("demo_seconds", "示例", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5.0, "/a")
+
+    text = registry.render()
+    assert "# TYPE demo_seconds histogram" in text
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{route="/a",le="1.0"} 2' in text
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{route="/a"} 3' in text
+
+
+def test_statement_fingerprint_strips_literals():
+    """
+    测试SQL指纹去掉字面量并合并IN列表
+    """
+    first = statement_fingerprint("SELECT * FROM users WHERE id = 'abc' AND age > 30")
+    second = statement_fingerprint("SELECT *  FROM users\nWHERE id = 'xyz' AND age > 41")
+    assert first == second == "SELECT * FROM users WHERE id = ? AND age > ?"
+    assert statement_fingerprint("SELECT id FROM t WHERE id IN (?, ?, ?)") == "SELECT id FROM t WHERE id IN (...)"
+
+
+def test_web3_middleware_times_rpc_by_method():
+    """
+    测试web3中间件按RPC方法计时
+    """
+    before = blockchain_rpc_duration.count("eth_blockNumber")
+    middleware = web3_metrics_middleware(lambda method, params: {"result": "0x1"}, None)
+    assert middleware("eth_blockNumber", []) == {"result": "0x1"}
+    assert blockchain_rpc_duration.count("eth_blockNumber") == before + 1
+
+
+def test_metrics_endpoint(client):
+    """
+    测试 /metrics 端点输出按路由模板统计的请求时间和SQL计时
+    """
+    client.get("/api/users/does-not-exist")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'route="/api/users/{user_id}"' in response.text
+    assert "db_query_duration_seconds_bucket" in response.text
@@ -0,0 +1,65 @@
+import os
+import time
+
+from backend.app.api import admin_routes
+from backend.app.core.profiler import SamplingProfiler
+
+
+def busy_endpoint(seconds):
+    """模拟耗时的路由处理函数"""
+    deadline = time.monotonic() + seconds
+    total = 0
+    while time.monotonic() < deadline:
+        total += sum(range(100))
+    return total
+
+
+class FakeRoute:
+    endpoint = staticmethod(busy_endpoint)
+
+
+def test_samples_are_aggregated_per_endpoint(tmp_path):
+    """
+    测试采样器只记录开启采样的路由，并写出折叠栈文件
+    """
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.register_endpoints([FakeRoute()])
+    assert profiler.available_endpoints() == ["busy_endpoint"]
+
+    # 未开启时不采样
+    busy_endpoint(0.05)
+    assert profiler.collapsed("busy_endpoint") == ""
+
+    profiler.enable(["busy_endpoint"], duration=5)
+    busy_endpoint(0.3)
+    profiler.disable()
+
+    collapsed = profiler.collapsed("busy_endpoint")
+    assert collapsed.startswith("busy_endpoint (test_profiler.py:")
+    assert profiler.status()["samples"]["busy_endpoint"] > 0
+
+    paths = profiler.write_flamegraphs(str(tmp_path))
+    assert len(paths) == 1 and os.path.basename(paths[0]).startswith("busy_endpoint-")
+
+
+def test_admin_profiler_requires_token(client, monkeypatch):
+    """
+    测试采样管理接口需要管理令牌，并拒绝未知路由
+    """
+    assert client.get("/api/admin/profiler").status_code == 403
+
+    monkeypatch.setattr(admin_routes, "ADMIN_TOKEN", "admin_secret")
+    assert client.get("/api/admin/profiler", headers={"admin-token": "wrong"}).status_code == 401
+
+    headers = {"admin-token": "admin_secret"}
+    response = client.get("/api/admin/profiler", headers=headers)
+    assert response.status_code == 200
+    assert "register_user" in response.json()["available"]
+
+    response = client.post("/api/admin/profiler/start", json={"routes": ["no_such_route"]}, headers=headers)
+    assert response.status_code == 400
+
+    response = client.post("/api/admin/profiler/start", json={"routes": ["register_user"], "duration_seconds": 5}, headers=headers)
+    assert response.json()["enabled"] == ["register_user"]
+    response = client.post("/api/admin/profiler/stop", headers=headers)
+    assert response.json()["enabled"] == []
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.app.models.models import Document, Verification
+from .conftest import make_user, make_verifier
+
+HEADERS = {"api-key": "reuse_key"}
+
+
+@pytest.fixture(scope="function")
+def session(db_session):
+    """用户在其他机构有一条有效批准和一条过期批准，在本机构有一条批准和一条待处理请求"""
+    db = db_session
+    user = make_user(db, "reused")
+    verifier = make_verifier(db, "Reuse Bank", "reuse_key")
+    source_bank = make_verifier(db, "Source Bank", "source_key")
+    now = datetime.utcnow()
+    valid = Verification(user_id=user.id, verifier_id=source_bank.id, verification_type="KYC", status="approved",
+                         transaction_hash="0xsource", expires_at=now + timedelta(days=30))
+    expired = Verification(user_id=user.id, verifier_id=source_bank.id, verification_type="AML", status="approved",
+                           transaction_hash="0xexpired", expires_at=now - timedelta(days=1))
+    own = Verification(user_id=user.id, verifier_id=verifier.id, verification_type="KYC", status="approved",
+                       transaction_hash="0xown", expires_at=now + timedelta(days=30))
+    pending = Verification(user_id=user.id, verifier_id=verifier.id, verification_type="KYC", status="pending")
+    db.add_all([valid, expired, own, pending, Document(user_id=user.id, document_type="passport", document_hash="0xdoc")])
+    db.commit()
+    return db, user, {"valid": valid, "expired": expired, "own": own, "pending": pending}
+
+
+def test_list_reusable_verifications(client, session):
+    """
+    测试按用户和类型、按文档哈希查找其他机构的有效批准，不包含本机构和已过期的批准
+    """
+    db, user, rows = session
+    response = client.get("/api/verifications/reuse", params={"user_id": user.id, "verification_type": "KYC"},
+                          headers=HEADERS)
+    assert response.status_code == 200
+    assert [v["id"] for v in response.json()] == [rows["valid"].id]
+    assert response.json()[0]["transaction_hash"] == "0xsource"
+
+    response = client.get("/api/verifications/reuse", params={"document_hash": "0xdoc"}, headers=HEADERS)
+    assert [v["id"] for v in response.json()] == [rows["valid"].id]
+
+    assert client.get("/api/verifications/reuse", params={"user_id": user.id}, headers=HEADERS).status_code == 400
+
+
+def test_accept_reusable_verification(client, session):
+    """
+    测试采信其他机构的批准：本机构的待处理请求直接批准，沿用源验证的交易和过期时间
+    """
+    db, _, rows = session
+    response = client.post(f"/api/verifications/reuse/{rows['valid'].id}/accept", headers=HEADERS)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["id"] == rows["pending"].id
+    assert body["status"] == "approved"
+    assert body["transaction_hash"] == "0xsource"
+    assert body["credential"]
+
+    db.expire_all()
+    assert db.get(Verification, rows["pending"].id).expires_at == db.get(Verification, rows["valid"].id).expires_at
+
+
+def test_accept_rejects_expired_missing_and_own_sources(client, session):
+    """
+    测试不能采信已过期的、不存在的和本机构自己的验证
+    """
+    db, _, rows = session
+    response = client.post(f"/api/verifications/reuse/{rows['expired'].id}/accept", headers=HEADERS)
+    assert response.status_code == 400
+    assert client.post("/api/verifications/reuse/missing/accept", headers=HEADERS).status_code == 404
+    response = client.post(f"/api/verifications/reuse/{rows['own'].id}/accept", headers=HEADERS)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "不能采信本机构自己的验证"
+
+    db.expire_all()
+    assert db.get(Verification, rows["pending"].id).status == "pending"
@@ -0,0 +1,178 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.app.database import Base
+from backend.app.models.models import ChainWriteRequest, SignerLease
+from backend.app.core.blockchain import PRIORITY_BULK, PRIORITY_CRITICAL
+from backend.app.core import signer
+from backend.app.core.signer import ChainWriteCoordinator, ChainWriteError, LeaderLease
+from .conftest import TestingSessionLocal, engine
+from .test_chain_scheduler import FakeManager, credential, drain, make_scheduler
+
+
+@pytest.fixture(scope="function")
+def tables():
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def make_replica(replica_id, manager=None):
+    manager = manager or FakeManager()
+    lease = LeaderLease(TestingSessionLocal, replica_id=replica_id, lease_seconds=30)
+    return ChainWriteCoordinator(TestingSessionLocal, manager, lease=lease, scheduler=make_scheduler(manager))
+
+
+def expire_lease():
+    db = TestingSessionLocal()
+    db.query(SignerLease).update({SignerLease.lease_expires_at: datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+    db.close()
+
+
+def test_only_one_replica_holds_the_lease(tables):
+    """
+    测试同一时间只有一个副本持有签名租约，租约过期后其他副本接管且代数递增
+    """
+    a = LeaderLease(TestingSessionLocal, replica_id="a", lease_seconds=30)
+    b = LeaderLease(TestingSessionLocal, replica_id="b", lease_seconds=30)
+
+    assert a.acquire() is True
+    assert b.acquire() is False
+    assert a.acquire() is True
+    assert a.epoch == 1
+
+    expire_lease()
+    assert b.acquire() is True
+    assert b.epoch == 2
+    assert a.acquire() is False
+    assert not a.held()
+
+    b.release()
+    assert a.acquire() is True
+    assert a.epoch == 3
+
+
+def test_follower_writes_are_signed_by_leader(tables):
+    """
+    测试非签名副本提交的写操作由签名副本执行，并把交易哈希返回给提交方
+    """
+    leader_manager = FakeManager()
+    leader = make_replica("leader", leader_manager)
+    follower = make_replica("follower")
+    leader.renew_lease()
+    assert follower.renew_lease() is False
+
+    remote = follower.submit(PRIORITY_BULK, "register_identity", ("u1", "0x0"), gas=10)
+    local = leader.submit(PRIORITY_CRITICAL, "issue_credentials_batch", ([credential("u2")],), gas=10)
+
+    follower.run_once()
+    assert follower.collect_results() == 0
+    assert leader.dispatch_pending() == 2
+    drain(leader.scheduler)
+
+    # 签名副本自己的请求在执行后立即完成
+    assert local.result(timeout=0)[0]["transaction_hash"] == "0xtx_u2"
+    follower.collect_results()
+    assert remote.result(timeout=0) == "0xtx_u1"
+    assert sorted(call[1] for call in leader_manager.calls) == ["u1", "u2"]
+    assert follower.manager.calls == []
+
+
+def test_failed_write_is_reported_to_submitter(tables):
+    """
+    测试签名副本执行失败时提交方得到异常
+    """
+    leader = make_replica("leader")
+    follower = make_replica("follower")
+    leader.renew_lease()
+
+    future = follower.submit(PRIORITY_BULK, "missing_method", (), gas=10)
+    leader.dispatch_pending()
+    drain(leader.scheduler)
+    follower.collect_results()
+    with pytest.raises(ChainWriteError):
+        future.result(timeout=0)
+
+
+def test_failover_requeues_unfinished_writes(tables):
+    """
+    测试换主
+    1. 旧签名副本领取请求后失去租约，调度器中的请求不会执行
+    2. 新签名副本接管后重新执行未完成的请求
+    """
+    old_manager, new_manager = FakeManager(), FakeManager()
+    old = make_replica("old", old_manager)
+    new = make_replica("new", new_manager)
+    old.renew_lease()
+    future = new.submit(PRIORITY_BULK, "register_identity", ("u1", "0x0"), gas=10)
+    old.dispatch_pending()
+
+    expire_lease()
+    assert new.renew_lease(force=True) is True
+    assert old.renew_lease(force=True) is False
+    drain(old.scheduler)
+    assert old_manager.calls == []
+
+    db = TestingSessionLocal()
+    assert db.query(ChainWriteRequest).one().status == "pending"
+    db.close()
+
+    new.dispatch_pending()
+    drain(new.scheduler)
+    assert future.result(timeout=0) == "0xtx_u1"
+    assert new_manager.calls == [("register_identity", "u1")]
+
+
+def test_pending_writes_are_claimed_by_priority(tables, monkeypatch):
+    """
+    测试容量不足时先领取高优先级的请求，同一优先级按提交顺序
+    """
+    monkeypatch.setattr(signer, "CHAIN_WRITE_MAX_IN_FLIGHT", 2)
+    manager = FakeManager()
+    leader = make_replica("leader", manager)
+    leader.renew_lease()
+    leader.submit(PRIORITY_BULK, "register_identity", ("bulk", "0x0"), gas=10)
+    leader.submit(PRIORITY_CRITICAL, "issue_credentials_batch", ([credential("first")],), gas=10)
+    leader.submit(PRIORITY_CRITICAL, "issue_credentials_batch", ([credential("second")],), gas=10)
+
+    assert leader.dispatch_pending() == 2
+    drain(leader.scheduler)
+    assert [call[1] for call in manager.calls] == ["first", "second"]
+
+
+def test_failover_does_not_replay_writes_that_may_have_been_sent(tables):
+    """
+    测试换主时旧签名副本已开始发送的请求
+    1. 身份注册重新执行（合约拒绝重复注册）
+    2. 凭证颁发标记为失败，不会重复上链
+    3. 已领取但未开始发送的凭证颁发重新执行
+    """
+    new_manager = FakeManager()
+    old = make_replica("old")
+    new = make_replica("new", new_manager)
+    old.renew_lease()
+    registration = new.submit(PRIORITY_BULK, "register_identity", ("u1", "0x0"), gas=10)
+    sent = new.submit(PRIORITY_CRITICAL, "issue_credentials_batch", ([credential("u2")],), gas=10)
+    claimed = new.submit(PRIORITY_CRITICAL, "issue_credentials_batch", ([credential("u3")],), gas=10)
+    old.dispatch_pending()
+
+    # 旧签名副本在发送前两个请求时失去响应
+    db = TestingSessionLocal()
+    db.query(ChainWriteRequest).filter(ChainWriteRequest.args.notlike("%u3%")).update(
+        {ChainWriteRequest.status: "sending"}, synchronize_session=False
+    )
+    db.commit()
+    db.close()
+
+    expire_lease()
+    assert new.renew_lease(force=True) is True
+    new.dispatch_pending()
+    drain(new.scheduler)
+    new.collect_results()
+    assert registration.result(timeout=0) == "0xtx_u1"
+    assert claimed.result(timeout=0)[0]["transaction_hash"] == "0xtx_u3"
+    with pytest.raises(ChainWriteError):
+        sent.result(timeout=0)
+    assert sorted(call[1] for call in new_manager.calls) == ["u1", "u3"]
@@ -0,0 +1,84 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.app.api import verification_routes
+from backend.app.models.models import Verification
+from backend.app.core.status_batch import stream_status
+from .conftest import engine, make_user, make_verifier
+
+HEADERS = {"api-key": "batch_status_key"}
+
+
+@pytest.fixture(scope="function")
+def session(db_session):
+    db = db_session
+    users = [make_user(db, f"checked{i}") for i in range(3)]
+    verifier = make_verifier(db, "Status Bank", "batch_status_key")
+    now = datetime.utcnow()
+    db.add_all([
+        # 同一用户两条有效批准，使用最新的一条
+        Verification(user_id=users[0].id, verifier_id=verifier.id, verification_type="KYC", status="approved",
+                     transaction_hash="0xold", verification_date=now - timedelta(days=2),
+                     expires_at=now + timedelta(days=10)),
+        Verification(user_id=users[0].id, verifier_id=verifier.id, verification_type="KYC", status="approved",
+                     transaction_hash="0xnew", verification_date=now - timedelta(days=1),
+                     expires_at=now + timedelta(days=10), status_index=7),
+        Verification(user_id=users[1].id, verifier_id=verifier.id, verification_type="KYC", status="approved",
+                     expires_at=now - timedelta(days=1)),
+        Verification(user_id=users[2].id, verifier_id=verifier.id, verification_type="AML", status="rejected"),
+        Verification(user_id=users[2].id, verifier_id=verifier.id, verification_type="KYC", status="approved",
+                     expires_at=now + timedelta(days=1)),
+    ])
+    db.commit()
+    return db, users
+
+
+def test_stream_status_keeps_request_order(session):
+    """
+    测试批量状态查询：结果按请求顺序分块输出，重复和不存在的用户也各有一行
+    """
+    db, users = session
+    pairs = [
+        (users[2].id, "AML"), (users[0].id, "KYC"), ("missing", "KYC"),
+        (users[1].id, "KYC"), (users[2].id, "KYC"), (users[0].id, "KYC"),
+    ]
+    chunks = list(stream_status(engine, pairs, chunk_size=4))
+    assert len(chunks) == 2
+    results = [json.loads(line) for line in b"".join(chunks).decode("utf-8").splitlines()]
+    assert [(r["user_id"], r["verification_type"]) for r in results] == pairs
+    assert [r["is_verified"] for r in results] == [False, True, False, False, True, True]
+    assert "transaction_hash" not in results[1]
+
+
+def test_status_batch_endpoint(client, session, monkeypatch):
+    """
+    测试批量状态接口：需要验证者API密钥，可附带证明，签名凭证只返回本机构签发的，超过上限时拒绝
+    """
+    db, users = session
+    db.query(Verification).filter(Verification.transaction_hash == "0xnew").update({"credential": "own.jwt"})
+    other = make_verifier(db, "Other Status Bank", "other_status_key")
+    db.add(Verification(user_id=users[1].id, verifier_id=other.id, verification_type="AML", status="approved",
+                        transaction_hash="0xother", status_index=8, credential="other.jwt",
+                        expires_at=datetime.utcnow() + timedelta(days=1)))
+    db.commit()
+    body = {"queries": [{"user_id": users[0].id, "verification_type": "KYC"}], "include_proofs": True}
+    assert client.post("/api/verifications/status:batch", json=body).status_code == 422
+
+    response = client.post("/api/verifications/status:batch", json=body, headers=HEADERS)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    result = json.loads(response.text)
+    assert result["is_verified"] is True
+    assert (result["transaction_hash"], result["status_index"], result["credential"]) == ("0xnew", 7, "own.jwt")
+
+    body["queries"] = [{"user_id": users[1].id, "verification_type": "AML"}]
+    result = json.loads(client.post("/api/verifications/status:batch", json=body, headers=HEADERS).text)
+    assert (result["transaction_hash"], result["status_index"]) == ("0xother", 8)
+    assert "credential" not in result
+    body["queries"] = [{"user_id": users[0].id, "verification_type": "KYC"}]
+
+    monkeypatch.setattr(verification_routes, "STATUS_BATCH_MAX_PAIRS", 1)
+    body["queries"] *= 2
+    assert client.post("/api/verifications/status:batch", json=body, headers=HEADERS).status_code == 400
@@ -0,0 +1,133 @@
+import gzip
+import hashlib
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.app.models.models import CredentialStatusList, Verification
+from backend.app.core.status_list import (
+    STATUS_LIST_ID, STATUS_LIST_MIN_SIZE, allocate_indexes, anchor_status_list, assign_status_indexes,
+    bit_is_set, build_bitmap, publish_status_list
+)
+from .conftest import make_user, make_verifier
+
+
+class AnchorManager:
+    """记录存证交易的区块链管理器替身"""
+
+    def __init__(self):
+        self.anchored = []
+
+    def submit_transaction(self, priority, method, *args, gas=0, tx_count=1):
+        self.anchored.append(args[0])
+        future = Future()
+        future.set_result("0xanchor")
+        return future
+
+
+@pytest.fixture(scope="function")
+def session(db_session):
+    user = make_user(db_session, "listed")
+    verifier = make_verifier(db_session, "List Bank", "list_key")
+    db_session.commit()
+    return db_session, user, verifier
+
+
+def approved(db, user, verifier, count, expires_at=None):
+    verifications = [
+        Verification(
+            user_id=user.id, verifier_id=verifier.id, verification_type="KYC", status="approved",
+            expires_at=expires_at or datetime.utcnow() + timedelta(days=30)
+        )
+        for _ in range(count)
+    ]
+    db.add_all(verifications)
+    assign_status_indexes(db, verifications)
+    db.commit()
+    return verifications
+
+
+def test_bitmap_marks_invalid_credentials(session):
+    """
+    测试状态位图
+    1. 位置连续分配，重新批准沿用原位置
+    2. 有效凭证对应的位为0，拒绝、过期的凭证为1
+    3. 位图不小于最小长度
+    """
+    db, user, verifier = session
+    valid, rejected, reapproved = approved(db, user, verifier, 3)
+    expired = approved(db, user, verifier, 1, expires_at=datetime.utcnow() - timedelta(seconds=1))[0]
+    assert [v.status_index for v in (valid, rejected, reapproved, expired)] == [0, 1, 2, 3]
+
+    rejected.status = "rejected"
+    reapproved.status = "rejected"
+    db.commit()
+    reapproved.status = "approved"
+    assign_status_indexes(db, [reapproved])
+    db.commit()
+    assert reapproved.status_index == 2
+    assert allocate_indexes(db, 2) == 4
+
+    bitmap, size = build_bitmap(db)
+    assert size == STATUS_LIST_MIN_SIZE
+    assert [bit_is_set(bitmap, i) for i in range(7)] == [False, True, False, True, True, True, False]
+
+
+def test_publish_and_anchor(session):
+    """
+    测试发布与存证：内容不变时摘要不变，同一摘要只上链一次
+    """
+    db, user, verifier = session
+    approved(db, user, verifier, 2)
+    status_list = publish_status_list(db)
+    assert status_list.digest == "0x" + hashlib.sha256(status_list.encoded).hexdigest()
+    first_digest = status_list.digest
+    assert publish_status_list(db).digest == first_digest
+
+    manager = AnchorManager()
+    assert anchor_status_list(db, manager) is not None
+    assert anchor_status_list(db, manager) is None
+    assert manager.anchored == [first_digest]
+    db.expire_all()
+    assert db.get(CredentialStatusList, STATUS_LIST_ID).anchor_tx_hash == "0xanchor"
+
+
+def test_status_list_endpoint(client, session):
+    """
+    测试状态列表接口：单个和批量批准共用同一个位置分配，返回可缓存的gzip位图，支持条件请求
+    """
+    db, user, verifier = session
+    verification, batched = (
+        Verification(user_id=user.id, verifier_id=verifier.id, verification_type=kind, status="pending")
+        for kind in ("AML", "KYC")
+    )
+    db.add_all([verification, batched])
+    db.commit()
+    response = client.put(
+        f"/api/verifications/{verification.id}",
+        json={"status": "approved", "transaction_hash": "0xmanual"},
+        headers={"api-key": "list_key"}
+    )
+    assert response.status_code == 200
+    index = response.json()["status_index"]
+    assert index == 0
+    response = client.put(
+        "/api/verifications/batch",
+        json={"decisions": [
+            {"verification_id": batched.id, "status": "approved", "transaction_hash": "0xmanual"}
+        ]},
+        headers={"api-key": "list_key"}
+    )
+    assert response.json()["results"][0]["verification"]["status_index"] == 1
+
+    response = client.get("/api/credentials/status-list")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    assert response.headers["cache-control"].startswith("public, max-age=")
+    bitmap = gzip.decompress(response.content)
+    assert len(bitmap) * 8 == int(response.headers["x-status-list-size"])
+    assert not bit_is_set(bitmap, index)
+
+    etag = response.headers["etag"]
+    assert client.get("/api/credentials/status-list", headers={"If-None-Match": etag}).status_code == 304
@@ -0,0 +1,79 @@
+from sqlalchemy import text
+
+from backend.app.core.tracing import Span, TracingMiddleware, parse_traceparent, start_span, start_trace, to_otlp, traced
+from .conftest import engine
+
+
+class MemoryExporter:
+    """收集导出链路的替身"""
+
+    def __init__(self):
+        self.traces = []
+
+    def export(self, spans):
+        self.traces.append(spans)
+
+
+def test_spans_nest_and_export_with_root():
+    """
+    测试子span继承链路ID和父span，并在根span结束时与SQL span一起导出
+    """
+    exporter = MemoryExporter()
+
+    @traced("blockchain.register_identity")
+    def register():
+        with start_span("blockchain.sign_transaction"):
+            pass
+
+    with start_trace("POST /api/users/register", exporter=exporter) as root:
+        register()
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    assert len(exporter.traces) == 1
+    spans = {span.name: span for span in exporter.traces[0]}
+    assert {s.trace_id for s in spans.values()} == {root.trace_id}
+    assert spans["blockchain.register_identity"].parent_id == root.span_id
+    assert spans["blockchain.sign_transaction"].parent_id == spans["blockchain.register_identity"].span_id
+    assert spans["db.query"].attributes["db.statement"] == "SELECT ?"
+
+    otlp = to_otlp(exporter.traces)
+    assert len(otlp["resourceSpans"][0]["scopeSpans"][0]["spans"]) == 4
+
+
+def test_unsampled_code_creates_no_spans():
+    """
+    测试不在采样链路中时不创建span
+    """
+    assert not isinstance(start_span("bcrypt.hash"), Span)
+
+
+def test_traceparent_parsing():
+    """
+    测试W3C traceparent请求头解析
+    """
+    header = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+    assert parse_traceparent(header) == ("4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7", True)
+    assert parse_traceparent("garbage") is None
+
+
+def test_middleware_names_root_span_by_route(client):
+    """
+    测试采样请求的根span使用路由模板命名，响应返回链路ID
+    """
+    exporter = MemoryExporter()
+    middleware = next(m for m in client.app.user_middleware if m.cls is TracingMiddleware)
+    middleware.options.update(sample_rate=1.0, exporter=exporter)
+    client.app.middleware_stack = client.app.build_middleware_stack()
+    try:
+        response = client.get("/api/users/unknown-user")
+    finally:
+        middleware.options.update(sample_rate=0.0, exporter=None)
+        client.app.middleware_stack = client.app.build_middleware_stack()
+
+    trace_id = response.headers["x-trace-id"]
+    root = next(span for spans in exporter.traces for span in spans if span.parent_id is None)
+    assert root.trace_id == trace_id
+    assert root.name == "GET /api/users/{user_id}"
+    assert root.attributes["http.status_code"] == 404
+    assert any(span.name == "db.query" for spans in exporter.traces for span in spans)
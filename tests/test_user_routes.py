@@ -1,6 +1,9 @@
 from fastapi import status
 import pytest
 
+from backend.app.models.models import User
+from .conftest import TestingSessionLocal
+
 def test_user_registration(client):
     """
     测试用户注册流程
@@ -113,4 +116,126 @@ def test_login_invalid_credentials(client):
         "password": "wrong_password"
     }
     response2 = client.post("/api/users/login", json=invalid_login2)
-    assert response2.status_code == status.HTTP_401_UNAUTHORIZED
\ No newline at end of file
+    assert response2.status_code == status.HTTP_401_UNAUTHORIZED
+
+def test_user_conditional_get(client):
+    """
+    测试用户信息的条件GET
+    1. 首次获取返回ETag
+    2. 携带If-None-Match再次获取返回304
+    3. 更新用户信息后ETag变化
+    """
+    register_data = {
+        "username": "etaguser",
+        "email": "etag@example.com",
+        "password": "etag_password_123",
+        "full_name": "ETag User",
+        "blockchain_address": "0x1234567890123456789012345678901234567890"
+    }
+    register_response = client.post("/api/users/register", json=register_data)
+    user_id = register_response.json()["id"]
+
+    response1 = client.get(f"/api/users/{user_id}")
+    assert response1.status_code == status.HTTP_200_OK
+    etag = response1.headers["etag"]
+    assert "last-modified" in response1.headers
+
+    response2 = client.get(f"/api/users/{user_id}", headers={"If-None-Match": etag})
+    assert response2.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response2.headers["etag"] == etag
+
+    # 更新用户信息
+    login_response = client.post("/api/users/login", json={
+        "username": "etaguser",
+        "password": "etag_password_123"
+    })
+    access_token = login_response.json()["access_token"]
+    client.put(
+        "/api/users/update",
+        json={"full_name": "Renamed User"},
+        headers={"Authorization": f"Bearer {access_token}"}
+    )
+
+    response3 = client.get(f"/api/users/{user_id}", headers={"If-None-Match": etag})
+    assert response3.status_code == status.HTTP_200_OK
+    assert response3.headers["etag"] != etag
+    assert response3.json()["full_name"] == "Renamed User"
+
+
+def test_concurrent_updates_bump_version(client):
+    """
+    测试两个会话先后更新同一用户时都能提交，版本号各递增一次
+    """
+    register_response = client.post("/api/users/register", json={
+        "username": "racer",
+        "email": "racer@example.com",
+        "password": "racer_password_123",
+        "full_name": "Racer",
+        "blockchain_address": "0x" + "7" * 40
+    })
+    user_id = register_response.json()["id"]
+
+    first, second = TestingSessionLocal(), TestingSessionLocal()
+    try:
+        # 两个会话都读到版本1，之后先后写入
+        first_user, second_user = first.get(User, user_id), second.get(User, user_id)
+        assert first_user.version_id == second_user.version_id == 1
+        first_user.full_name = "First"
+        first.commit()
+        second_user.is_verified = True
+        second.commit()
+
+        assert second_user.version_id == 3
+        assert (second_user.full_name, second_user.is_verified) == ("First", True)
+    finally:
+        first.close()
+        second.close()
+
+
+def test_streaming_document_upload(client, tmp_path, monkeypatch):
+    """
+    测试流式上传文档
+    1. 上传文件，服务端计算SHA-256
+    2. 相同内容重复上传返回已有记录，存储中只有一份
+    """
+    import hashlib
+    from backend.app.core.document_store import document_store
+
+    monkeypatch.setattr(document_store, "root", str(tmp_path))
+
+    register_data = {
+        "username": "uploaduser",
+        "email": "upload@example.com",
+        "password": "upload_password_123",
+        "full_name": "Upload User",
+        "blockchain_address": "0x1234567890123456789012345678901234567890"
+    }
+    client.post("/api/users/register", json=register_data)
+    login_response = client.post("/api/users/login", json={
+        "username": "uploaduser",
+        "password": "upload_password_123"
+    })
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+    content = b"passport scan " * 100000
+    response1 = client.post(
+        "/api/users/documents/upload",
+        data={"document_type": "passport"},
+        files={"file": ("passport.pdf", content, "application/pdf")},
+        headers=headers
+    )
+    assert response1.status_code == status.HTTP_201_CREATED
+    document = response1.json()
+    assert document["document_hash"] == hashlib.sha256(content).hexdigest()
+    assert document["size_bytes"] == len(content)
+    assert document_store.exists(document["document_hash"])
+
+    response2 = client.post(
+        "/api/users/documents/upload",
+        data={"document_type": "passport"},
+        files={"file": ("copy.pdf", content, "application/pdf")},
+        headers=headers
+    )
+    assert response2.status_code == status.HTTP_200_OK
+    assert response2.json()["id"] == document["id"]
+    assert len(list(tmp_path.glob("*/*/*"))) == 1
@@ -0,0 +1,146 @@
+import json
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from backend.app.models.models import Verification, WebhookDelivery
+from backend.app.core import webhooks
+from backend.app.core.webhooks import WebhookDispatcher, enqueue_assignment, verify_signature
+from .conftest import TestingSessionLocal, make_verifier
+
+WEBHOOK_SECRET = "test_webhook_secret"
+
+
+class WebhookStandIn:
+    """本地HTTP通知接收端，记录收到的请求并按预设返回状态码"""
+
+    def __init__(self, responses=None):
+        self.requests = []
+        self.responses = list(responses or [])
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                stand_in.requests.append((dict(self.headers), body))
+                self.send_response(stand_in.responses.pop(0) if stand_in.responses else 200)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/hooks"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture(scope="function")
+def webhook_setup(db_session):
+    """创建本地接收端和配置了通知地址的验证者"""
+    stand_in = WebhookStandIn(responses=[500])
+    verifier = make_verifier(db_session, "Webhook Bank", "webhook_key",
+                             webhook_url=stand_in.url, webhook_secret=WEBHOOK_SECRET)
+    db_session.commit()
+    yield db_session, verifier, stand_in
+    stand_in.close()
+
+
+def test_assignments_are_batched_signed_and_retried(webhook_setup):
+    """
+    测试通知投递
+    1. 多个新分配合并为一次投递
+    2. 投递失败后按退避时间重试
+    3. 请求携带有效签名
+    """
+    db, verifier, stand_in = webhook_setup
+    for _ in range(3):
+        verification = Verification(verifier_id=verifier.id, verification_type="KYC", status="pending")
+        db.add(verification)
+        db.flush()
+        enqueue_assignment(db, verifier, verification)
+    db.commit()
+
+    dispatcher = WebhookDispatcher(TestingSessionLocal)
+    now = datetime.utcnow() + timedelta(minutes=1)
+
+    # 第一次投递返回500
+    assert dispatcher.run_once(now=now, wait=True) == 1
+    delivery = db.query(WebhookDelivery).one()
+    db.refresh(delivery)
+    assert delivery.status == "pending"
+    assert delivery.attempts == 1
+    assert delivery.next_attempt_at > now
+
+    # 退避时间未到不会重试
+    assert dispatcher.run_once(now=now, wait=True) == 0
+
+    # 退避时间到后重试成功
+    assert dispatcher.run_once(now=now + timedelta(minutes=5), wait=True) == 1
+    db.refresh(delivery)
+    assert delivery.status == "delivered"
+
+    assert len(stand_in.requests) == 2
+    headers, body = stand_in.requests[-1]
+    assert verify_signature(WEBHOOK_SECRET, headers["X-Webhook-Timestamp"], body, headers["X-Webhook-Signature"])
+    payload = json.loads(body)
+    assert payload["delivery_id"] == delivery.id
+    assert len(payload["events"]) == 3
+    assert {e["type"] for e in payload["events"]} == {"verification.assigned"}
+    dispatcher.stop()
+
+
+def test_verifier_without_webhook_is_skipped(webhook_setup):
+    """
+    测试未配置通知地址的验证者不产生通知事件
+    """
+    db, verifier, _ = webhook_setup
+    verifier.webhook_url = None
+    verification = Verification(verifier_id=verifier.id, verification_type="KYC", status="pending")
+    db.add(verification)
+    db.flush()
+
+    assert enqueue_assignment(db, verifier, verification) is None
+
+
+def test_busy_endpoint_does_not_starve_other_verifiers(webhook_setup, monkeypatch):
+    """
+    测试领取到期批次
+    1. 并发名额已满的批次推迟到下一轮，其他验证者的批次在下一轮被领取
+    2. 验证者取消通知地址后，未投递的批次标记为失败
+    """
+    monkeypatch.setattr(webhooks, "WEBHOOK_MAX_CONCURRENCY_PER_ENDPOINT", 1)
+    db, busy, _ = webhook_setup
+    busy.webhook_url = "http://busy.example/hooks"
+    quiet = make_verifier(db, "Quiet Bank", "quiet_key", webhook_url="http://quiet.example/hooks")
+    orphan = make_verifier(db, "Orphan Bank", "orphan_key")
+    now = datetime.utcnow()
+    for i in range(101):
+        db.add(WebhookDelivery(verifier_id=busy.id, status="pending", attempts=0,
+                               next_attempt_at=now - timedelta(seconds=200 - i)))
+    db.add(WebhookDelivery(verifier_id=orphan.id, status="pending", attempts=0,
+                           next_attempt_at=now - timedelta(seconds=300)))
+    db.add(WebhookDelivery(verifier_id=quiet.id, status="pending", attempts=0, next_attempt_at=now))
+    db.commit()
+
+    dispatcher = WebhookDispatcher(TestingSessionLocal, interval=5)
+    first = dispatcher._claim_due(now)
+    second = dispatcher._claim_due(now)
+    assert [job[1] for job in first] == [busy.webhook_url]
+    assert [job[1] for job in second] == [quiet.webhook_url]
+    for job in first + second:
+        job[3].release()
+
+    db.expire_all()
+    deferred = db.query(WebhookDelivery).filter(
+        WebhookDelivery.verifier_id == busy.id, WebhookDelivery.next_attempt_at == now + timedelta(seconds=5)
+    ).count()
+    assert deferred == 100
+    failed = db.query(WebhookDelivery).filter(WebhookDelivery.verifier_id == orphan.id).one()
+    assert failed.status == "failed"
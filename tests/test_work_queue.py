@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.app.models.models import Verification
+from backend.app.core.work_queue import claim_verifications, release_lease
+from .conftest import make_verifier
+
+
+@pytest.fixture(scope="function")
+def session(db_session):
+    """创建带有一个验证者的数据库会话"""
+    verifier = make_verifier(db_session, "Queue Bank", "queue_key")
+    db_session.commit()
+    return db_session, verifier
+
+
+def add_pending(db, verifier, count, priority=0):
+    ids = []
+    now = datetime.utcnow()
+    for i in range(count):
+        verification = Verification(
+            verifier_id=verifier.id,
+            verification_type="KYC",
+            status="pending",
+            priority=priority,
+            # 不同的提交时间，同一优先级内的领取顺序是确定的
+            verification_date=now - timedelta(minutes=count - i)
+        )
+        db.add(verification)
+        db.commit()
+        ids.append(verification.id)
+    return ids
+
+
+def test_claims_are_disjoint(session):
+    """
+    测试多个工作进程领取的请求互不重叠
+    """
+    db, verifier = session
+    add_pending(db, verifier, 10)
+
+    _, _, first = claim_verifications(db, verifier.id, worker_id="w1", limit=4)
+    _, _, second = claim_verifications(db, verifier.id, worker_id="w2", limit=4)
+    _, _, third = claim_verifications(db, verifier.id, worker_id="w3", limit=4)
+
+    first_ids = {v.id for v in first}
+    second_ids = {v.id for v in second}
+    third_ids = {v.id for v in third}
+    assert len(first_ids) == 4 and len(second_ids) == 4 and len(third_ids) == 2
+    assert not first_ids & second_ids
+    assert not (first_ids | second_ids) & third_ids
+
+
+def test_claim_orders_by_priority(session):
+    """
+    测试优先级高的请求先被领取
+    """
+    db, verifier = session
+    add_pending(db, verifier, 3)
+    urgent = add_pending(db, verifier, 2, priority=5)
+
+    _, _, claimed = claim_verifications(db, verifier.id, limit=2)
+
+    assert [v.id for v in claimed] == urgent
+
+
+def test_expired_and_released_leases_are_reclaimable(session):
+    """
+    测试租约过期或归还后请求可以被重新领取
+    """
+    db, verifier = session
+    add_pending(db, verifier, 2)
+
+    lease_id, _, claimed = claim_verifications(db, verifier.id, limit=1)
+    assert len(claimed) == 1
+
+    # 模拟租约过期
+    claimed[0].lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    _, _, reclaimed = claim_verifications(db, verifier.id, limit=2)
+    assert len(reclaimed) == 2
+
+    assert release_lease(db, verifier.id, reclaimed[0].lease_id) == 2
+    _, _, after_release = claim_verifications(db, verifier.id, limit=2)
+    assert len(after_release) == 2